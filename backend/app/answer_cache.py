@@ -0,0 +1,156 @@
+"""
+问答结果缓存
+第一层按规范化后的问题精确匹配，第二层（可选）按问题向量的余弦相似度近邻匹配
+条目带过期时间和LRU淘汰，引用文档发生变化时失效
+每次失效递增版本号：查询在检索前记下版本号，写入时版本已变化说明检索期间文档有变更，放弃缓存该回答
+"""
+import re
+import threading
+import time
+import unicodedata
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "?？!！。.,，;；~～ "
+
+
+def normalize_question(question: str) -> str:
+    """规范化问题：全半角统一、小写、合并空白、去掉结尾标点"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+class _CacheEntry:
+    """缓存条目"""
+
+    __slots__ = ("result", "filenames", "expires_at", "embedding")
+
+    def __init__(self, result: Dict[str, Any], filenames: Iterable[str],
+                 expires_at: float, embedding: Optional[np.ndarray]):
+        self.result = result
+        self.filenames = frozenset(filenames)
+        self.expires_at = expires_at
+        self.embedding = embedding
+
+
+class AnswerCache:
+    """两级问答缓存，线程安全"""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, Hashable], _CacheEntry]" = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """失效版本号，每次 invalidate_files / clear 后递增"""
+        with self._lock:
+            return self._version
+
+    @property
+    def semantic_enabled(self) -> bool:
+        """是否启用向量近邻匹配"""
+        return self.similarity_threshold is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, question: str, params: Hashable,
+            embedding: Optional[List[float]] = None) -> Optional[Dict[str, Any]]:
+        """查找缓存：先精确匹配，未命中且提供问题向量时再做近邻匹配"""
+        key = (normalize_question(question), params)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    return entry.result
+                del self._entries[key]
+
+            if embedding is None or not self.semantic_enabled:
+                return None
+            return self._nearest_locked(params, self._unit(embedding), now)
+
+    def _nearest_locked(self, params: Hashable, query: np.ndarray,
+                        now: float) -> Optional[Dict[str, Any]]:
+        """在参数相同的未过期条目中查找最相似的问题"""
+        best_key = None
+        best_score = self.similarity_threshold
+        for key, entry in self._entries.items():
+            if key[1] != params or entry.embedding is None or entry.expires_at <= now:
+                continue
+            score = float(np.dot(entry.embedding, query))
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        logger.debug(f"问答缓存近邻命中，相似度: {best_score:.3f}")
+        return self._entries[best_key].result
+
+    def put(self, question: str, params: Hashable, result: Dict[str, Any],
+            filenames: Iterable[str], embedding: Optional[List[float]] = None,
+            version: Optional[int] = None) -> bool:
+        """
+        写入缓存，超出容量时淘汰最久未使用的条目
+        version 为检索前读取的版本号，之后发生过失效时不写入（回答可能基于旧文档），返回是否写入
+        """
+        key = (normalize_question(question), params)
+        entry = _CacheEntry(
+            result=result,
+            filenames=filenames,
+            expires_at=time.time() + self.ttl_seconds,
+            embedding=self._unit(embedding) if embedding is not None else None
+        )
+        with self._lock:
+            if version is not None and version != self._version:
+                logger.debug("检索期间文档已变更，不缓存本次回答")
+                return False
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def invalidate_files(self, filenames: Iterable[str]) -> int:
+        """使引用了指定文件的缓存条目失效，返回失效数量"""
+        filenames = set(filenames)
+        if not filenames:
+            return 0
+        with self._lock:
+            self._version += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry.filenames & filenames
+            ]
+            for key in stale:
+                del self._entries[key]
+        if stale:
+            logger.info(f"问答缓存失效 {len(stale)} 条")
+        return len(stale)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        """归一化为单位向量"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,81 @@
+"""
+ChromaDB客户端工厂
+- embedded：在进程内打开持久化目录，每个进程各自把向量索引加载到内存
+- http：连接本地运行的Chroma服务，多个工作进程和维护脚本共享服务端常驻的同一份索引
+同一进程内复用同一个客户端；http 模式下所有线程共享该客户端的keep-alive连接池
+embedded 模式刷新后，旧客户端由调用方在不再使用时通过 close_chroma_client 关闭
+"""
+import threading
+import logging
+from typing import Dict, Optional
+
+import chromadb
+from chromadb.api import ClientAPI
+from chromadb.api.client import SharedSystemClient
+from chromadb.config import System
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHROMA_MODES = ("embedded", "http")
+
+_client: Optional[ClientAPI] = None
+_client_lock = threading.Lock()
+# embedded 客户端 → 其Chroma实例；客户端的 _system 属性按路径查全局缓存，清除缓存后会指向新实例
+_systems: Dict[int, System] = {}
+
+
+def get_chroma_client(refresh: bool = False) -> ClientAPI:
+    """
+    返回进程内共享的Chroma客户端
+    refresh 为真时在 embedded 模式下重新打开持久化目录（用于加载其他进程的写入）；
+    http 模式下数据由服务端统一维护，始终复用现有连接
+    """
+    global _client
+    with _client_lock:
+        if _client is not None and not (refresh and settings.chroma_mode == "embedded"):
+            return _client
+        _client = _create_client(refresh)
+        return _client
+
+
+def _create_client(refresh: bool) -> ClientAPI:
+    if settings.chroma_mode == "http":
+        client = chromadb.HttpClient(
+            host=settings.chroma_server_host,
+            port=settings.chroma_server_port,
+            ssl=settings.chroma_server_ssl
+        )
+        # 启动时确认服务可用，避免第一次查询时才发现连接失败
+        client.heartbeat()
+        logger.info(
+            f"已连接Chroma服务: {settings.chroma_server_host}:{settings.chroma_server_port}"
+        )
+        return client
+
+    if settings.chroma_mode != "embedded":
+        raise ValueError(
+            f"不支持的CHROMA_MODE: {settings.chroma_mode}（可选: {', '.join(CHROMA_MODES)}）"
+        )
+    if refresh:
+        # Chroma按路径缓存进程内实例，清除后才会重新从磁盘加载；
+        # 旧实例此处不关闭，进行中的查询可以继续使用，由调用方之后关闭
+        SharedSystemClient.clear_system_cache()
+    client = chromadb.PersistentClient(path=settings.chroma_persist_directory)
+    _systems[id(client)] = SharedSystemClient._identifier_to_system[client._identifier]
+    return client
+
+
+def close_chroma_client(client: ClientAPI):
+    """
+    关闭已被替换的 embedded 客户端的Chroma实例，释放其向量索引内存和文件句柄
+    调用前需确认没有查询仍在使用该客户端；http 客户端无需关闭
+    """
+    with _client_lock:
+        if client is _client:
+            return
+        system = _systems.pop(id(client), None)
+    if system is not None:
+        system.stop()
+        logger.info("已关闭旧的Chroma实例")
@@ -0,0 +1,144 @@
+"""
+上下文打包
+将检索到的文档块在生成回答前整理为不超过词元预算的上下文：
+- 同一文件中重叠（共享 chunk_overlap）或首尾相接的块按字符位置合并为一段，重叠部分只保留一次
+- 合并后的段落按相关度从高到低装入预算，最后一段放不下时截断
+配合单次调用的合成器，每个回答只调用一次LLM
+"""
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llama_index.core.schema import MetadataMode, NodeWithScore, TextNode
+
+logger = logging.getLogger(__name__)
+
+# 剩余预算低于该词元数时不再截断装入
+MIN_PASSAGE_TOKENS = 32
+# 分块时块之间被去掉的空白（如段落间的换行）不超过该字符数时，视为首尾相接
+MAX_GAP_CHARS = 2
+
+
+class _Passage:
+    """同一文件中连续的一段文本"""
+
+    def __init__(self, node_with_score: NodeWithScore):
+        node = node_with_score.node
+        self.template = node
+        self.text = node.get_content(metadata_mode=MetadataMode.NONE)
+        self.start: Optional[int] = node.start_char_idx
+        self.end: Optional[int] = node.end_char_idx
+        self.score = node_with_score.score or 0.0
+        self.rank = 0
+
+    def try_merge(self, other: "_Passage") -> bool:
+        """other 与本段重叠或相接时并入本段（other 的起始位置不早于本段）"""
+        if None in (self.start, self.end, other.start, other.end):
+            return False
+        gap = other.start - self.end
+        if gap > MAX_GAP_CHARS:
+            return False
+        if gap > 0:
+            # 间隔中的空白已在分块时去掉，用换行代替（合并后的文本在间隔处与原文不逐字对应）
+            self.text += "\n" + other.text
+            self.end = other.end
+        elif other.end > self.end:
+            self.text += other.text[self.end - other.start:]
+            self.end = other.end
+        self.score = max(self.score, other.score)
+        self.rank = min(self.rank, other.rank)
+        return True
+
+    def to_node(self, text: str) -> NodeWithScore:
+        template = self.template
+        # 截断时按前缀长度估算结束位置
+        end = self.end
+        if self.start is not None and len(text) < len(self.text):
+            end = self.start + len(text)
+        node = TextNode(
+            text=text,
+            metadata=dict(template.metadata),
+            excluded_embed_metadata_keys=list(template.excluded_embed_metadata_keys),
+            excluded_llm_metadata_keys=list(template.excluded_llm_metadata_keys),
+            start_char_idx=self.start,
+            end_char_idx=end
+        )
+        return NodeWithScore(node=node, score=self.score)
+
+
+def merge_passages(nodes: List[NodeWithScore]) -> List[_Passage]:
+    """按文件分组，合并重叠/相接的块并去除重复块，返回按相关度排序的段落"""
+    by_file: Dict[str, List[_Passage]] = {}
+    for rank, node_with_score in enumerate(nodes):
+        passage = _Passage(node_with_score)
+        passage.rank = rank
+        by_file.setdefault(node_with_score.node.metadata.get("filename", ""), []).append(passage)
+
+    merged: List[_Passage] = []
+    for passages in by_file.values():
+        # 没有位置信息的块只按文本去重
+        positioned = sorted(
+            (p for p in passages if p.start is not None and p.end is not None),
+            key=lambda p: (p.start, p.end)
+        )
+        seen_texts = set()
+        for passage in passages:
+            if (passage.start is None or passage.end is None) and passage.text not in seen_texts:
+                seen_texts.add(passage.text)
+                merged.append(passage)
+
+        current: Optional[_Passage] = None
+        for passage in positioned:
+            if current is None or not current.try_merge(passage):
+                current = passage
+                merged.append(current)
+
+    # 分数相同时保持检索顺序
+    merged.sort(key=lambda p: (-p.score, p.rank))
+    return merged
+
+
+def pack_context(
+    nodes: List[NodeWithScore], token_budget: int, tokenizer: Callable[[str], List]
+) -> List[NodeWithScore]:
+    """
+    将检索结果打包为总词元数（含提供给LLM的元数据）不超过 token_budget 的段落
+    """
+    packed: List[NodeWithScore] = []
+    remaining = token_budget
+    for passage in merge_passages(nodes):
+        candidate = passage.to_node(passage.text)
+        tokens = len(tokenizer(candidate.node.get_content(metadata_mode=MetadataMode.LLM)))
+        if tokens <= remaining:
+            packed.append(candidate)
+            remaining -= tokens
+            continue
+        if remaining >= MIN_PASSAGE_TOKENS:
+            truncated = _truncate(passage, remaining, tokenizer)
+            if truncated is not None:
+                packed.append(truncated[0])
+                remaining -= truncated[1]
+        break
+
+    logger.debug(
+        f"上下文打包: {len(nodes)} 个块 -> {len(packed)} 段，"
+        f"使用 {token_budget - remaining}/{token_budget} 词元"
+    )
+    return packed
+
+
+def _truncate(
+    passage: _Passage, budget: int, tokenizer: Callable[[str], List]
+) -> Optional[Tuple[NodeWithScore, int]]:
+    """二分查找能装入预算的最长前缀，返回 (节点, 词元数)"""
+    low, high = 0, len(passage.text)
+    best: Optional[Tuple[NodeWithScore, int]] = None
+    while low < high:
+        middle = (low + high + 1) // 2
+        candidate = passage.to_node(passage.text[:middle])
+        tokens = len(tokenizer(candidate.node.get_content(metadata_mode=MetadataMode.LLM)))
+        if tokens <= budget:
+            best = (candidate, tokens)
+            low = middle
+        else:
+            high = middle - 1
+    return best
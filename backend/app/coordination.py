@@ -0,0 +1,89 @@
+"""
+多工作进程写入协调
+多个工作进程共享同一存储目录时：
+- 写操作通过存储目录下的文件锁（fcntl.flock）在进程之间串行执行
+- 每次写操作完成后递增代数文件中的计数，其他进程发现代数变化后重新加载存储并使缓存失效
+"""
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class WriteCoordinator:
+    """跨进程写锁和存储代数计数"""
+
+    def __init__(self, directory: str, lock_file: str = "write.lock",
+                 generation_file: str = "generation"):
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self.lock_path = path / lock_file
+        self.generation_path = path / generation_file
+        self._thread_lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._depth = 0
+        if fcntl is None:
+            logger.warning("当前平台不支持文件锁，只能以单工作进程运行")
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        """写锁：同一进程内的线程之间和不同进程之间都互斥，同一线程可重入"""
+        with self._thread_lock:
+            if self._depth == 0:
+                self._acquire()
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+
+    def _acquire(self):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            start = time.perf_counter()
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(fd)
+                raise
+            waited = time.perf_counter() - start
+            if waited > 1.0:
+                logger.info(f"等待其他工作进程的写操作 {waited:.1f} 秒")
+        self._fd = fd
+
+    def _release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def generation(self) -> int:
+        """当前存储代数，文件不存在时为0"""
+        try:
+            return int(self.generation_path.read_text(encoding="utf-8").strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def bump(self) -> int:
+        """递增存储代数并返回新值（需持有写锁）；先写临时文件再替换，读取方不会读到半个值"""
+        generation = self.generation() + 1
+        temp_path = self.generation_path.with_name(self.generation_path.name + ".tmp")
+        temp_path.write_text(str(generation), encoding="utf-8")
+        os.replace(temp_path, self.generation_path)
+        return generation
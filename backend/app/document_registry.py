@@ -0,0 +1,283 @@
+"""
+文档注册表
+在SQLite中记录每个文件的块ID、内容哈希、大小和修改时间，随每次写入同步更新，
+按文件查找、替换和删除只需主键范围查询，不再扫描Chroma元数据
+"""
+import sqlite3
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 注册表中的文档字段
+DOCUMENT_FIELDS = ("filename", "file_path", "file_size", "file_modified", "file_hash", "chunks_count")
+
+# 文档列表可用的排序字段
+SORT_COLUMNS = {
+    "name": "filename",
+    "size": "file_size",
+    "mtime": "CAST(file_modified AS REAL)",
+    "chunks": "chunks_count",
+}
+
+
+class DocumentRegistry:
+    """文件名 → 文档块ID 的持久化注册表"""
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                filename TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL DEFAULT '',
+                file_size INTEGER NOT NULL DEFAULT 0,
+                file_modified TEXT NOT NULL DEFAULT '',
+                file_hash TEXT NOT NULL DEFAULT '',
+                chunks_count INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                filename TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (filename, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_documents_size ON documents(file_size);
+            CREATE INDEX IF NOT EXISTS idx_documents_mtime ON documents(CAST(file_modified AS REAL));
+            CREATE INDEX IF NOT EXISTS idx_documents_chunks ON documents(chunks_count);
+            """
+        )
+
+    def document_count(self) -> int:
+        """已登记的文件数量"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def chunk_count(self) -> int:
+        """已登记的文档块总数"""
+        with self._lock:
+            row = self._conn.execute("SELECT SUM(chunks_count) FROM documents").fetchone()
+        return row[0] or 0
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """查询单个文件的登记信息"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(DOCUMENT_FIELDS)} FROM documents WHERE filename = ?",
+                (filename,),
+            ).fetchone()
+        return dict(zip(DOCUMENT_FIELDS, row)) if row else None
+
+    def all_documents(self) -> Dict[str, Dict[str, Any]]:
+        """全部文件的登记信息（不含块ID）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(DOCUMENT_FIELDS)} FROM documents"
+            ).fetchall()
+        return {row[0]: dict(zip(DOCUMENT_FIELDS, row)) for row in rows}
+
+    def list_documents(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        sort: str = "name",
+        order: str = "asc",
+        prefix: str = ""
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        分页查询文件列表，按 name/size/mtime/chunks 排序，可按文件名前缀过滤
+        返回 (当前页文件列表, 符合条件的文件总数)
+        """
+        column = SORT_COLUMNS.get(sort)
+        if column is None:
+            raise ValueError(f"不支持的排序字段: {sort}")
+        direction = "DESC" if order == "desc" else "ASC"
+
+        where = ""
+        params: List[Any] = []
+        if prefix:
+            # 前缀范围查询，可利用主键索引
+            where = "WHERE filename >= ? AND filename < ?"
+            params = [prefix, prefix + "\U0010ffff"]
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM documents {where}", params
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(DOCUMENT_FIELDS)} FROM documents {where} "
+                f"ORDER BY {column} {direction}, filename {direction} LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+        return [dict(zip(DOCUMENT_FIELDS, row)) for row in rows], total
+
+    def match(self, pattern: str) -> List[str]:
+        """按通配符（* ? [...]，区分大小写）匹配已登记的文件名"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename FROM documents WHERE filename GLOB ? ORDER BY filename",
+                (pattern,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def filter_filenames(
+        self,
+        filenames: Optional[Sequence[str]] = None,
+        prefix: str = "",
+        modified_after: Optional[float] = None,
+        modified_before: Optional[float] = None
+    ) -> List[str]:
+        """
+        按文件名列表、文件名前缀和修改时间范围（时间戳，闭区间）筛选已登记的文件名，
+        各条件之间为“且”
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if filenames is not None:
+            if not filenames:
+                return []
+            clauses.append(f"filename IN ({', '.join('?' * len(filenames))})")
+            params.extend(filenames)
+        if prefix:
+            clauses.append("filename >= ? AND filename < ?")
+            params.extend([prefix, prefix + "\U0010ffff"])
+        # 与索引表达式一致，可利用修改时间索引
+        if modified_after is not None:
+            clauses.append("CAST(file_modified AS REAL) >= ?")
+            params.append(modified_after)
+        if modified_before is not None:
+            clauses.append("CAST(file_modified AS REAL) <= ?")
+            params.append(modified_before)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT filename FROM documents {where} ORDER BY filename", params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_chunk_ids(self, filename: str) -> List[str]:
+        """查询文件的全部块ID"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE filename = ?", (filename,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add_chunks(self, entries: Iterable[Tuple[str, Dict[str, Any]]], record_stat: bool = True):
+        """
+        登记一批已写入的文档块
+        entries: (chunk_id, 块元数据) 序列，元数据中的文件信息用于更新文件记录
+        record_stat 为假时只登记块，不写入文件的大小、修改时间和哈希：写入管线在文件的最后一批
+        写入后再调用 update_stat，中途失败或进程退出时文件记录不完整，下次同步会重新处理该文件
+        """
+        by_file: Dict[str, Tuple[Dict[str, Any], List[str]]] = {}
+        for chunk_id, metadata in entries:
+            filename = metadata.get("filename", "")
+            by_file.setdefault(filename, (metadata, []))[1].append(chunk_id)
+        if not by_file:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for filename, (metadata, chunk_ids) in by_file.items():
+                    added = 0
+                    for chunk_id in chunk_ids:
+                        added += self._conn.execute(
+                            "INSERT OR IGNORE INTO chunks (filename, chunk_id) VALUES (?, ?)",
+                            (filename, chunk_id),
+                        ).rowcount
+                    if record_stat:
+                        stat_update = (
+                            "file_size = excluded.file_size, file_modified = excluded.file_modified, "
+                            "file_hash = excluded.file_hash, "
+                        )
+                        stat = (
+                            int(metadata.get("file_size") or 0),
+                            str(metadata.get("file_modified") or ""),
+                            str(metadata.get("file_hash") or ""),
+                        )
+                    else:
+                        stat_update = ""
+                        stat = (0, "", "")
+                    self._conn.execute(
+                        "INSERT INTO documents (filename, file_path, file_size, file_modified, "
+                        "file_hash, chunks_count, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(filename) DO UPDATE SET file_path = excluded.file_path, "
+                        f"{stat_update}"
+                        "chunks_count = chunks_count + excluded.chunks_count, "
+                        "updated_at = excluded.updated_at",
+                        (filename, str(metadata.get("file_path") or ""), *stat, added, now),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update_stat(self, filename: str, file_size: int, file_modified: str,
+                    file_hash: Optional[str] = None):
+        """
+        更新文件的大小、修改时间和（可选的）内容哈希：文件全部写入后，或内容哈希未变时调用，
+        之后的增量同步可以直接按大小和修改时间跳过，不必再计算哈希
+        """
+        assignments = "file_size = ?, file_modified = ?, updated_at = ?"
+        params: List[Any] = [file_size, file_modified, time.time()]
+        if file_hash is not None:
+            assignments += ", file_hash = ?"
+            params.append(file_hash)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE documents SET {assignments} WHERE filename = ?", (*params, filename)
+            )
+
+    def remove(self, filenames: Sequence[str]) -> List[str]:
+        """删除文件的登记信息，返回被删除的块ID"""
+        removed: List[str] = []
+        if not filenames:
+            return removed
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for filename in filenames:
+                    removed.extend(
+                        row[0] for row in self._conn.execute(
+                            "SELECT chunk_id FROM chunks WHERE filename = ?", (filename,)
+                        )
+                    )
+                    self._conn.execute("DELETE FROM chunks WHERE filename = ?", (filename,))
+                    self._conn.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def clear(self):
+        """清空注册表"""
+        with self._lock:
+            self._conn.executescript(
+                """
+                BEGIN;
+                DELETE FROM chunks;
+                DELETE FROM documents;
+                COMMIT;
+                """
+            )
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,121 @@
+"""
+嵌入向量缓存
+以 (嵌入模型, 文本哈希) 为键持久化到SQLite，超出容量时按最近最少使用淘汰
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+from array import array
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    """文本内容哈希"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """磁盘嵌入缓存，带容量上限和LRU淘汰"""
+
+    def __init__(self, db_path: str, max_entries: int = 200000):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used);
+            """
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def __len__(self) -> int:
+        """最近一次写入时的条目数（包括其他工作进程写入的条目）"""
+        return self._size
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """批量查询缓存，未命中的位置返回None，命中项刷新最近使用时间"""
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            # 分段查询，避免超出SQLite参数数量上限
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    ((now, model, h) for h in found),
+                )
+
+        return [
+            array("f", found[h]).tolist() if h in found else None
+            for h in hashes
+        ]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[List[float]]):
+        """批量写入缓存，超出容量时淘汰最久未使用的条目"""
+        if not texts:
+            return
+
+        now = time.time()
+        rows = [
+            (model, text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            # IMMEDIATE 事务在插入前就取得SQLite写锁，其他工作进程的写入与本次计数、淘汰互斥
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                # 多个工作进程共享缓存，进程内计数会偏离实际条目数，淘汰前在写锁内重新计数
+                size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                overflow = size - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE (model, text_hash) IN ("
+                        "SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (overflow,),
+                    )
+                    size -= overflow
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._size = size
+        if overflow > 0:
+            logger.info(f"嵌入缓存淘汰 {overflow} 条")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,112 @@
+"""
+离线模拟后端
+不访问任何外部接口的嵌入模型和LLM，用于离线压测和可复现的性能测试：
+- HashEmbedding: 基于词项特征哈希的确定性向量，相同文本在任何机器上得到相同结果，
+  共享词项越多的文本余弦相似度越高
+- FakeLLM: 按配置的首字延迟和每秒词元数输出固定回答，支持流式
+"""
+import hashlib
+import time
+from typing import Any, List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.types import (
+    CompletionResponse,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+
+from backend.app.keyword_index import tokenize
+
+# 模拟回答的内容，按词元（单个字符）循环输出
+CANNED_ANSWER = "这是离线模拟后端生成的回答，用于在不调用外部接口的情况下测试检索与生成链路的性能。"
+
+
+class HashEmbedding(BaseEmbedding):
+    """确定性的特征哈希嵌入模型"""
+
+    embed_dim: int = Field(default=1536, gt=0, description="向量维度")
+
+    def __init__(self, embed_dim: int = 1536, **kwargs: Any):
+        kwargs.setdefault("model_name", f"fake-hash-{embed_dim}")
+        super().__init__(embed_dim=embed_dim, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _embed(self, text: str) -> List[float]:
+        """每个词项哈希到一个维度并带随机符号，累加后归一化"""
+        vector = np.zeros(self.embed_dim, dtype=np.float32)
+        for token in tokenize(text) or [text]:
+            digest = int.from_bytes(
+                hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            vector[digest % self.embed_dim] += 1.0 if (digest >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+
+class FakeLLM(CustomLLM):
+    """按固定速率输出模拟回答的LLM"""
+
+    latency_ms: float = Field(default=200.0, ge=0, description="首个词元前的延迟（毫秒）")
+    tokens_per_second: float = Field(default=50.0, gt=0, description="每秒输出的词元数")
+    response_tokens: int = Field(default=100, ge=1, description="回答的词元数")
+    context_window: int = Field(default=128000, description="上下文窗口大小")
+    num_output: int = Field(default=1024, description="最大输出词元数")
+    model_name: str = Field(default="fake-llm", description="模型名称")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.num_output,
+            model_name=self.model_name,
+        )
+
+    def _tokens(self) -> List[str]:
+        return [CANNED_ANSWER[i % len(CANNED_ANSWER)] for i in range(self.response_tokens)]
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        tokens = self._tokens()
+        time.sleep(self.latency_ms / 1000 + len(tokens) / self.tokens_per_second)
+        return CompletionResponse(text="".join(tokens))
+
+    @llm_completion_callback()
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        def gen() -> CompletionResponseGen:
+            time.sleep(self.latency_ms / 1000)
+            text = ""
+            interval = 1.0 / self.tokens_per_second
+            for token in self._tokens():
+                time.sleep(interval)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
@@ -0,0 +1,523 @@
+"""
+批量写入管线
+按固定大小的文本窗口流式读取文件并分块，按批并发调用嵌入接口，每批一次性upsert到Chroma
+内存占用只与窗口大小、批大小和并发数有关，与文件大小无关
+批量加载较大的语料时，读取和分块在进程池中并行执行，文档块经有界队列交给嵌入和写入阶段
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.node_parser import TextSplitter
+from llama_index.core.schema import (
+    BaseNode,
+    MetadataMode,
+    NodeRelationship,
+    RelatedNodeInfo,
+    TextNode,
+)
+from llama_index.core.utils import get_tokenizer
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+from backend.app import metrics
+from backend.app.document_registry import DocumentRegistry
+from backend.app.embedding_cache import EmbeddingCache
+from backend.app.keyword_index import KeywordIndex
+
+logger = logging.getLogger(__name__)
+
+# 不参与向量化的易变元数据（修改时间等变化不应影响文本向量）
+EXCLUDED_EMBED_METADATA_KEYS = ["file_path", "file_size", "file_modified", "file_hash"]
+# 不提供给LLM的元数据
+EXCLUDED_LLM_METADATA_KEYS = ["file_hash"]
+
+
+# 进度回调：progress(filename, update)
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def _report(progress: Optional[ProgressCallback], filename: str, **update):
+    """调用进度回调，回调自身的异常不影响写入"""
+    if progress is None:
+        return
+    try:
+        progress(filename, update)
+    except Exception as e:
+        logger.warning(f"进度回调失败: {e}")
+
+
+def file_sha256(file_path: Path, block_size: int = 1024 * 1024) -> str:
+    """分块读取计算文件内容哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_text_chunks(
+    file_path: Path, text_splitter: TextSplitter, window_chars: int = 1000000
+) -> Iterator[Tuple[str, int, int]]:
+    """按窗口流式读取文本文件并分块，产出 (块文本, 起始字符位置, 结束字符位置)"""
+    for chunks in iter_text_windows(file_path, text_splitter, window_chars):
+        yield from chunks
+
+
+def iter_text_windows(
+    file_path: Path, text_splitter: TextSplitter, window_chars: int = 1000000
+) -> Iterator[List[Tuple[str, int, int]]]:
+    """
+    按窗口流式读取文本文件并分块，每个窗口产出一组 (块文本, 起始字符位置, 结束字符位置)
+    每个窗口的最后一块不直接产出，而是与下一个窗口拼接后重新切分，保证块边界连续
+    """
+    carry = ""
+    carry_start = 0
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            window = f.read(window_chars)
+            at_eof = not window
+            text = carry + window
+            if not text.strip():
+                return
+
+            with metrics.stage_timer("chunking"):
+                spans = chunk_spans(text_splitter, text)
+            if not at_eof and len(spans) > 1:
+                emit, tail = spans[:-1], spans[-1]
+            elif at_eof:
+                emit, tail = spans, None
+            else:
+                # 窗口内只有一块，继续读取
+                carry = text
+                continue
+
+            if emit:
+                yield [(text[start:end], carry_start + start, carry_start + end) for start, end in emit]
+
+            if tail is None:
+                return
+            carry = text[tail[0]:]
+            carry_start += tail[0]
+
+
+def chunk_spans(text_splitter: TextSplitter, text: str) -> List[Tuple[int, int]]:
+    """
+    切分文本，返回各块的 (起始位置, 结束位置)
+    分块器提供 split_spans 时直接使用，否则按块文本在原文中查找位置
+    """
+    split_spans = getattr(text_splitter, "split_spans", None)
+    if split_spans is not None:
+        return split_spans(text)
+
+    spans: List[Tuple[int, int]] = []
+    search_from = 0
+    for chunk in text_splitter.split_text(text):
+        position = text.find(chunk, search_from)
+        if position < 0:
+            position = search_from
+        search_from = position + 1
+        spans.append((position, position + len(chunk)))
+    return spans
+
+
+def file_metadata(file_path: Path, filename: str) -> Dict[str, Any]:
+    """文档块携带的文件级元数据"""
+    stat = file_path.stat()
+    return {
+        "filename": filename,
+        "file_path": str(file_path),
+        "file_size": stat.st_size,
+        "file_modified": str(stat.st_mtime),
+        "file_hash": file_sha256(file_path)
+    }
+
+
+def _make_node(
+    text: str, start: int, end: int, metadata: Dict[str, Any], source: RelatedNodeInfo
+) -> TextNode:
+    return TextNode(
+        text=text,
+        metadata=dict(metadata),
+        excluded_embed_metadata_keys=list(EXCLUDED_EMBED_METADATA_KEYS),
+        excluded_llm_metadata_keys=list(EXCLUDED_LLM_METADATA_KEYS),
+        start_char_idx=start,
+        end_char_idx=end,
+        relationships={NodeRelationship.SOURCE: source}
+    )
+
+
+# 分块进程的结果队列和取消标志，由进程池的初始化函数设置
+_chunk_queue = None
+_chunk_stop = None
+
+
+class _ChunkingCancelled(Exception):
+    """主进程已停止接收分块结果"""
+
+
+def _init_chunk_process(chunk_queue, stop):
+    global _chunk_queue, _chunk_stop
+    _chunk_queue = chunk_queue
+    _chunk_stop = stop
+    # 取消时队列中未取走的数据可以丢弃，不阻塞进程退出
+    chunk_queue.cancel_join_thread()
+    # 先按LlamaIndex的方式（使用其自带的编码缓存）加载分词器，
+    # 之后反序列化分块器中的tiktoken编码时直接复用，不需要联网下载
+    get_tokenizer()
+
+
+def _put_chunk_message(message: Tuple):
+    """放入结果队列，队列满时等待（背压），主进程取消时放弃"""
+    while True:
+        try:
+            _chunk_queue.put(message, timeout=0.5)
+            return
+        except queue.Full:
+            if _chunk_stop.is_set():
+                raise _ChunkingCancelled()
+
+
+def _chunk_file_in_process(
+    index: int, file_path: Path, filename: str, text_splitter: TextSplitter, window_chars: int
+):
+    """
+    在分块进程中读取并切分单个文件，依次放入结果队列：
+    (index, "metadata", 元数据, 0)、每个窗口的 (index, "chunks", 文档块, 耗时秒数)、
+    最后是 (index, "done", None, 0) 或 (index, "error", 错误信息, 0)
+    """
+    try:
+        _put_chunk_message((index, "metadata", file_metadata(file_path, filename), 0.0))
+        windows = iter_text_windows(file_path, text_splitter, window_chars)
+        while True:
+            start = time.perf_counter()
+            chunks = next(windows, None)
+            if chunks is None:
+                break
+            _put_chunk_message((index, "chunks", chunks, time.perf_counter() - start))
+        _put_chunk_message((index, "done", None, 0.0))
+    except _ChunkingCancelled:
+        return
+    except Exception as e:
+        try:
+            _put_chunk_message((index, "error", str(e), 0.0))
+        except _ChunkingCancelled:
+            return
+
+
+class IngestionPipeline:
+    """文档写入管线：分块 → 批量并发嵌入 → 批量写入Chroma、关键词索引和文档注册表"""
+
+    def __init__(
+        self,
+        collection,
+        keyword_index: KeywordIndex,
+        embed_model: BaseEmbedding,
+        text_splitter: TextSplitter,
+        batch_size: int = 256,
+        concurrency: int = 4,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        window_chars: int = 1000000,
+        registry: Optional[DocumentRegistry] = None,
+        chunk_processes: int = 1,
+        parallel_min_bytes: int = 16 * 1024 * 1024
+    ):
+        """
+        chunk_processes: 批量处理多个文件时的分块进程数，0 表示CPU核数，1 表示在当前线程中分块
+        parallel_min_bytes: 一批文件总大小达到该字节数时才启用分块进程
+        """
+        self.collection = collection
+        self.keyword_index = keyword_index
+        self.embed_model = embed_model
+        self.text_splitter = text_splitter
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.embedding_cache = embedding_cache
+        self.window_chars = window_chars
+        self.registry = registry
+        self.chunk_processes = max(0, chunk_processes)
+        self.parallel_min_bytes = parallel_min_bytes
+
+    def run(
+        self,
+        files: Sequence[Tuple[Path, str]],
+        progress: Optional[ProgressCallback] = None,
+        text_splitter: Optional[TextSplitter] = None
+    ) -> Dict[str, int]:
+        """
+        处理一批文件
+        files: (文件路径, 入库文件名) 序列
+        progress: 进度回调 progress(filename, update)，update 为 status/chunks/error 字段的增量
+        text_splitter: 本批文件使用的分块器，未指定时使用管线默认分块器
+        返回每个成功处理的文件名生成的文档块数量；读取失败的文件通过回调报告并跳过
+        """
+        chunk_counts: Dict[str, int] = {filename: 0 for _, filename in files}
+        # 各文件的文件级元数据（大小、修改时间、哈希），文件全部写入后登记到注册表
+        file_stats: Dict[str, Dict[str, Any]] = {}
+        failed: List[str] = []
+        total_chunks = 0
+
+        # 嵌入请求并发执行，同时在途的批次不超过并发数；写入按批次顺序在当前线程完成
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = deque()
+            text_splitter = text_splitter or self.text_splitter
+            processes = self._chunk_process_count(files)
+            if processes > 1:
+                batches = self._iter_batches_parallel(files, failed, progress, text_splitter, processes)
+            else:
+                batches = self._iter_batches(files, failed, progress, text_splitter)
+            for batch, finished in batches:
+                in_flight.append((batch, finished, executor.submit(self._embed_batch, batch)))
+                if len(in_flight) >= self.concurrency:
+                    total_chunks += self._write_next(in_flight, chunk_counts, file_stats, progress)
+            while in_flight:
+                total_chunks += self._write_next(in_flight, chunk_counts, file_stats, progress)
+
+        for filename in failed:
+            chunk_counts.pop(filename, None)
+
+        logger.info(f"写入完成: {len(chunk_counts)} 个文件，{total_chunks} 个文档块")
+        return chunk_counts
+
+    def _write_next(
+        self,
+        in_flight: deque,
+        chunk_counts: Dict[str, int],
+        file_stats: Dict[str, Dict[str, Any]],
+        progress: Optional[ProgressCallback]
+    ) -> int:
+        """
+        等待最早提交的批次嵌入完成并写入，随后报告进度
+        批次按顺序写入，finished 中的文件此时已全部写入，才在注册表中登记其大小、修改时间和哈希
+        """
+        batch, finished, future = in_flight.popleft()
+        self._write_batch(batch, future.result())
+
+        written: Dict[str, int] = {}
+        for node in batch:
+            filename = node.metadata["filename"]
+            written[filename] = written.get(filename, 0) + 1
+            file_stats.setdefault(filename, node.metadata)
+        for filename, count in written.items():
+            chunk_counts[filename] += count
+            _report(progress, filename, chunks=chunk_counts[filename])
+        for filename in finished:
+            stat = file_stats.pop(filename, None)
+            if self.registry is not None and stat is not None:
+                self.registry.update_stat(
+                    filename, int(stat.get("file_size") or 0),
+                    str(stat.get("file_modified") or ""), str(stat.get("file_hash") or "")
+                )
+            _report(progress, filename, status="done", chunks=chunk_counts[filename])
+        return len(batch)
+
+    def _iter_batches(
+        self,
+        files: Sequence[Tuple[Path, str]],
+        failed: List[str],
+        progress: Optional[ProgressCallback],
+        text_splitter: TextSplitter
+    ) -> Iterator[Tuple[List[BaseNode], List[str]]]:
+        """
+        将所有文件的文档块按批大小分组产出 (批次, 已全部进入该批次及之前批次的文件)
+        """
+        batch: List[BaseNode] = []
+        finished: List[str] = []
+        for file_path, filename in files:
+            _report(progress, filename, status="processing")
+            try:
+                for node in self._iter_nodes(file_path, filename, text_splitter):
+                    batch.append(node)
+                    if len(batch) >= self.batch_size:
+                        yield batch, finished
+                        batch, finished = [], []
+            except Exception as e:
+                self._fail_file((file_path, filename), e, failed, progress)
+                continue
+            finished.append(filename)
+        if batch or finished:
+            yield batch, finished
+
+    def _iter_nodes(
+        self, file_path: Path, filename: str, text_splitter: TextSplitter
+    ) -> Iterator[BaseNode]:
+        """流式读取单个文件并生成文档块节点"""
+        metadata = file_metadata(file_path, filename)
+        source = RelatedNodeInfo(node_id=str(uuid.uuid4()))
+
+        produced = False
+        for text, start, end in iter_text_chunks(file_path, text_splitter, self.window_chars):
+            produced = True
+            yield _make_node(text, start, end, metadata, source)
+
+        if not produced:
+            logger.warning(f"文件为空或读取失败: {file_path}")
+
+    def _chunk_process_count(self, files: Sequence[Tuple[Path, str]]) -> int:
+        """本批文件使用的分块进程数，1 表示在当前线程中分块"""
+        if self.chunk_processes == 1 or len(files) < 2:
+            return 1
+        total_bytes = 0
+        for file_path, _ in files:
+            try:
+                total_bytes += file_path.stat().st_size
+            except OSError:
+                continue
+        if total_bytes < self.parallel_min_bytes:
+            return 1
+        processes = self.chunk_processes or os.cpu_count() or 1
+        return max(1, min(processes, len(files)))
+
+    def _iter_batches_parallel(
+        self,
+        files: Sequence[Tuple[Path, str]],
+        failed: List[str],
+        progress: Optional[ProgressCallback],
+        text_splitter: TextSplitter,
+        processes: int
+    ) -> Iterator[Tuple[List[BaseNode], List[str]]]:
+        """
+        与 _iter_batches 相同，但文件在进程池中并行读取和分块
+        每个文件的块按顺序到达，不同文件的块可能交错；结果队列有界，
+        嵌入和写入跟不上时分块进程等待，内存占用不随语料大小增长
+        """
+        # 服务进程中有多个线程，使用spawn避免fork带来的锁状态问题
+        context = multiprocessing.get_context("spawn")
+        chunk_queue = context.Queue(maxsize=processes * 2)
+        stop = context.Event()
+        executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=_init_chunk_process,
+            initargs=(chunk_queue, stop)
+        )
+        logger.info(f"并行分块: {len(files)} 个文件，{processes} 个进程")
+
+        batch: List[BaseNode] = []
+        finished: List[str] = []
+        try:
+            futures = {
+                executor.submit(
+                    _chunk_file_in_process, index, file_path, filename,
+                    text_splitter, self.window_chars
+                ): index
+                for index, (file_path, filename) in enumerate(files)
+            }
+            pending = set(range(len(files)))
+            file_nodes: Dict[int, Tuple[Dict[str, Any], RelatedNodeInfo]] = {}
+            produced = set()
+
+            while pending:
+                try:
+                    index, kind, payload, seconds = chunk_queue.get(timeout=1.0)
+                except queue.Empty:
+                    # 分块进程异常退出时不会再有结果
+                    for future, index in futures.items():
+                        if index in pending and future.done() and future.exception() is not None:
+                            pending.discard(index)
+                            self._fail_file(files[index], future.exception(), failed, progress)
+                    continue
+                if index not in pending:
+                    continue
+
+                file_path, filename = files[index]
+                if kind == "metadata":
+                    _report(progress, filename, status="processing")
+                    file_nodes[index] = (payload, RelatedNodeInfo(node_id=str(uuid.uuid4())))
+                elif kind == "chunks":
+                    metrics.STAGE_SECONDS.observe(seconds, stage="chunking")
+                    produced.add(index)
+                    metadata, source = file_nodes[index]
+                    for text, start, end in payload:
+                        batch.append(_make_node(text, start, end, metadata, source))
+                        if len(batch) >= self.batch_size:
+                            yield batch, finished
+                            batch, finished = [], []
+                elif kind == "done":
+                    pending.discard(index)
+                    file_nodes.pop(index, None)
+                    if index not in produced:
+                        logger.warning(f"文件为空或读取失败: {file_path}")
+                    finished.append(filename)
+                else:
+                    pending.discard(index)
+                    file_nodes.pop(index, None)
+                    self._fail_file(files[index], payload, failed, progress)
+
+            if batch or finished:
+                yield batch, finished
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _fail_file(
+        file: Tuple[Path, str], error: Any, failed: List[str], progress: Optional[ProgressCallback]
+    ):
+        file_path, filename = file
+        logger.error(f"处理文件失败 {file_path}: {error}")
+        failed.append(filename)
+        _report(progress, filename, status="failed", error=str(error))
+
+    def _embed_batch(self, batch: List[BaseNode]) -> List[List[float]]:
+        """对一批文档块调用嵌入接口，缓存命中的文本块不再请求"""
+        if not batch:
+            return []
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+        if self.embedding_cache is None:
+            with metrics.stage_timer("embedding_batch"):
+                return self.embed_model.get_text_embedding_batch(texts)
+
+        model_name = self.embed_model.model_name
+        embeddings = self.embedding_cache.get_many(model_name, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        metrics.record_cache("embedding", True, len(texts) - len(missing))
+        metrics.record_cache("embedding", False, len(missing))
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            with metrics.stage_timer("embedding_batch"):
+                new_embeddings = self.embed_model.get_text_embedding_batch(missing_texts)
+            self.embedding_cache.put_many(model_name, missing_texts, new_embeddings)
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = embedding
+
+        logger.debug(f"嵌入缓存命中 {len(texts) - len(missing)}/{len(texts)}")
+        return embeddings
+
+    def _write_batch(self, batch: List[BaseNode], embeddings: List[List[float]]):
+        """一次upsert写入一批文档块，并同步关键词索引和文档注册表"""
+        if not batch:
+            return
+        ids = []
+        metadatas = []
+        documents = []
+        for node in batch:
+            metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=True)
+            for key, value in metadata.items():
+                if value is None:
+                    metadata[key] = ""
+            ids.append(node.node_id)
+            metadatas.append(metadata)
+            documents.append(node.get_content(metadata_mode=MetadataMode.NONE))
+
+        with metrics.stage_timer("chroma_write"):
+            self.collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                documents=documents
+            )
+        self.keyword_index.add(
+            (node.node_id, node.metadata.get("filename", ""), text)
+            for node, text in zip(batch, documents)
+        )
+        if self.registry is not None:
+            self.registry.add_chunks(zip(ids, metadatas), record_stat=False)
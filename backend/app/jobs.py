@@ -0,0 +1,263 @@
+"""
+后台写入任务队列
+上传和加载请求只负责提交任务并立即返回任务ID，由固定数量的工作线程依次执行，
+执行过程中逐文件记录状态、文档块数量和错误，供 /api/jobs/{id} 查询
+任务状态同时写入存储目录下的SQLite表，多工作进程部署时任一进程都能查询其他进程提交的任务；
+逐文件的进度更新按时间间隔节流写入，任务状态变化和结束时总会写入
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from backend.app.ingestion import ProgressCallback
+
+logger = logging.getLogger(__name__)
+
+# 任务函数：接收进度回调，返回结果字典（包含 success/message）
+JobFunction = Callable[[ProgressCallback], Dict[str, Any]]
+
+
+class IngestionJob:
+    """单个写入任务及其逐文件进度"""
+
+    def __init__(self, kind: str, func: JobFunction, store: Optional["JobStore"] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.status = "queued"  # queued / running / succeeded / failed
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._store = store
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    def update_file(self, filename: str, update: Dict[str, Any]):
+        """进度回调：合并单个文件的状态更新，按任务表的写入间隔节流保存"""
+        with self._lock:
+            entry = self.files.setdefault(
+                filename, {"status": "queued", "chunks": 0, "error": None}
+            )
+            entry.update(update)
+        self.save(throttle=True)
+
+    def save(self, throttle: bool = False):
+        """
+        将当前状态写入共享的任务表（未配置时跳过）
+        每次写入都要序列化整个任务（含全部文件），throttle 为真时距上次写入不足
+        store.progress_interval 秒则跳过，避免文件很多时进度回调的写入开销随文件数平方增长
+        """
+        if self._store is None:
+            return
+        now = time.monotonic()
+        if throttle and now - self._saved_at < self._store.progress_interval:
+            return
+        self._saved_at = now
+        try:
+            self._store.save(self.to_dict())
+        except Exception as e:
+            logger.warning(f"保存任务状态失败 {self.id}: {e}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务状态快照"""
+        with self._lock:
+            files = [{"filename": name, **entry} for name, entry in self.files.items()]
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "files_total": len(files),
+            "files_done": sum(1 for f in files if f["status"] == "done"),
+            "files_failed": sum(1 for f in files if f["status"] == "failed"),
+            "chunks": sum(f["chunks"] for f in files),
+            "files": files,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """
+    任务状态表（SQLite），各工作进程共享
+    记录提交任务的进程号：进程退出后未完成的任务按失败返回，不会一直显示为执行中
+    progress_interval: 执行中逐文件进度的最短写入间隔（秒），其他进程查询到的进度最多滞后这么久
+    """
+
+    def __init__(self, db_path: str, max_finished: int = 200, progress_interval: float = 0.5):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_finished = max_finished
+        self.progress_interval = progress_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                pid INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                state TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at);
+            """
+        )
+
+    def save(self, state: Dict[str, Any]):
+        """写入任务状态快照；任务结束时顺带清理超出保留数量的已完成任务"""
+        finished = state["status"] in ("succeeded", "failed")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, pid, status, created_at, finished_at, state) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (state["job_id"], os.getpid(), state["status"], state["created_at"],
+                 state["finished_at"], json.dumps(state, ensure_ascii=False))
+            )
+            if finished:
+                self._conn.execute(
+                    "DELETE FROM jobs WHERE finished_at IS NOT NULL AND job_id NOT IN ("
+                    "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL "
+                    "ORDER BY finished_at DESC LIMIT ?)",
+                    (self.max_finished,)
+                )
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """按ID读取任务状态快照"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pid, state FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        pid, state = row[0], json.loads(row[1])
+        if state["status"] in ("queued", "running") and not _process_alive(pid):
+            state["status"] = "failed"
+            state["error"] = "任务所在的工作进程已退出"
+        return state
+
+
+def _process_alive(pid: int) -> bool:
+    """进程是否仍在运行"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 无权限发送信号等情况视为进程存在
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    固定工作线程数的任务队列，保留最近完成的任务供查询
+    配置 store 后任务状态同步写入共享任务表，查询本进程没有的任务时从表中读取
+    """
+
+    def __init__(self, workers: int = 1, max_finished: int = 200,
+                 store: Optional[JobStore] = None):
+        self.max_finished = max_finished
+        self.store = store
+        self._queue: "queue.Queue[Optional[IngestionJob]]" = queue.Queue()
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, kind: str, func: JobFunction) -> IngestionJob:
+        """提交任务，立即返回任务对象"""
+        job = IngestionJob(kind, func, self.store)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_locked()
+        job.save()
+        self._queue.put(job)
+        logger.info(f"已提交后台任务 {job.id} ({kind})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """按ID查询任务状态快照；本进程没有时从共享任务表读取（可能由其他工作进程提交）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store is not None:
+            return self.store.load(job_id)
+        return None
+
+    def pending_count(self) -> int:
+        """排队中的任务数量"""
+        return self._queue.qsize()
+
+    def shutdown(self):
+        """停止工作线程（正在执行的任务会先完成）"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: IngestionJob):
+        job.status = "running"
+        job.started_at = time.time()
+        job.save()
+        try:
+            result = job.func(job.update_file)
+            job.result = result
+            job.status = "succeeded" if result.get("success", True) else "failed"
+            if job.status == "failed":
+                job.error = result.get("message")
+        except Exception as e:
+            logger.error(f"后台任务失败 {job.id}: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.func = None
+            job.save()
+        logger.info(f"后台任务 {job.id} 结束: {job.status}")
+
+    def _prune_locked(self):
+        """超出保留数量时丢弃最早完成的任务"""
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in ("succeeded", "failed")
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
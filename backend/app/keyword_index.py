@@ -0,0 +1,248 @@
+"""
+持久化BM25关键词索引
+基于SQLite倒排表，随文档写入增量更新，支持中日韩文本分词
+"""
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符（汉字、假名、韩文）连续片段
+_CJK_RUN = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+)
+# 拉丁字母与数字组成的词
+_WORD = re.compile(r"[a-z0-9]+(?:[._\-][a-z0-9]+)*")
+
+
+def tokenize(text: str, unigrams: bool = False) -> List[str]:
+    """
+    分词：中日韩片段切分为二元组（单字片段保留单字），
+    其余部分按字母数字词切分并转为小写
+    unigrams 为真时同时输出片段中的每个单字（建索引时使用，单字查询也能命中）
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens: List[str] = []
+    last_end = 0
+    for match in _CJK_RUN.finditer(text):
+        tokens.extend(_WORD.findall(text, last_end, match.start()))
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            if unigrams:
+                tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        last_end = match.end()
+    tokens.extend(_WORD.findall(text, last_end))
+    return tokens
+
+
+class KeywordIndex:
+    """
+    BM25倒排索引，存储在Chroma持久化目录旁的SQLite文件中
+    中日韩文本按单字和二元组建索引；查询时多字片段只用二元组，单字片段用单字
+    """
+
+    k1 = 1.5
+    b = 0.75
+    # 建索引的分词方式版本，变化后需要重建（2：增加单字）
+    TOKENIZER_VERSION = 2
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        """创建索引表结构"""
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    length INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, chunk_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id);
+                CREATE TABLE IF NOT EXISTS stats (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO stats (key, value) VALUES ('total_chunks', 0);
+                INSERT OR IGNORE INTO stats (key, value) VALUES ('total_length', 0);
+                INSERT OR IGNORE INTO stats (key, value) VALUES ('tokenizer_version', 1);
+                """
+            )
+            # 空索引直接采用当前分词方式
+            self._conn.execute(
+                "UPDATE stats SET value = ? WHERE key = 'tokenizer_version' AND "
+                "(SELECT value FROM stats WHERE key = 'total_chunks') = 0",
+                (self.TOKENIZER_VERSION,),
+            )
+
+    def tokenizer_current(self) -> bool:
+        """索引是否按当前分词方式建立（旧版本的索引需要重建）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM stats WHERE key = 'tokenizer_version'"
+            ).fetchone()
+        return row is not None and row[0] == self.TOKENIZER_VERSION
+
+    def count(self) -> int:
+        """索引中的文档块数量"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM stats WHERE key = 'total_chunks'"
+            ).fetchone()
+        return row[0] if row else 0
+
+    def add(self, entries: Iterable[Tuple[str, str, str]]):
+        """
+        批量添加文档块
+        entries: (chunk_id, filename, text) 元组序列，已存在的块会被覆盖
+        """
+        entries = list(entries)
+        if not entries:
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._delete_locked([chunk_id for chunk_id, _, _ in entries])
+                total_length = 0
+                for chunk_id, filename, text in entries:
+                    term_counts = Counter(tokenize(text, unigrams=True))
+                    length = sum(term_counts.values())
+                    total_length += length
+                    self._conn.execute(
+                        "INSERT INTO chunks (chunk_id, filename, length) VALUES (?, ?, ?)",
+                        (chunk_id, filename, length),
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                        ((term, chunk_id, tf) for term, tf in term_counts.items()),
+                    )
+                self._bump_stats(len(entries), total_length)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, chunk_ids: Sequence[str]):
+        """按块ID删除"""
+        if not chunk_ids:
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._delete_locked(chunk_ids)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete_locked(self, chunk_ids: Sequence[str]):
+        """在已持有锁的事务中删除块及其倒排项"""
+        removed_chunks = 0
+        removed_length = 0
+        for chunk_id in chunk_ids:
+            row = self._conn.execute(
+                "SELECT length FROM chunks WHERE chunk_id = ?", (chunk_id,)
+            ).fetchone()
+            if row is None:
+                continue
+            self._conn.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM chunks WHERE chunk_id = ?", (chunk_id,))
+            removed_chunks += 1
+            removed_length += row[0]
+        if removed_chunks:
+            self._bump_stats(-removed_chunks, -removed_length)
+
+    def _bump_stats(self, chunks_delta: int, length_delta: int):
+        """增量更新全局统计"""
+        self._conn.execute(
+            "UPDATE stats SET value = value + ? WHERE key = 'total_chunks'",
+            (chunks_delta,),
+        )
+        self._conn.execute(
+            "UPDATE stats SET value = value + ? WHERE key = 'total_length'",
+            (length_delta,),
+        )
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._conn.executescript(
+                f"""
+                BEGIN;
+                DELETE FROM postings;
+                DELETE FROM chunks;
+                UPDATE stats SET value = 0;
+                UPDATE stats SET value = {self.TOKENIZER_VERSION} WHERE key = 'tokenizer_version';
+                COMMIT;
+                """
+            )
+
+    def search(
+        self, query: str, top_k: int = 5, filenames: Optional[Collection[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        BM25检索，返回按分数降序排列的 (chunk_id, score)
+        filenames 非空时只对这些文件中的块计分，IDF仍按全部文档计算
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            stats = dict(self._conn.execute("SELECT key, value FROM stats").fetchall())
+            total_chunks = stats.get("total_chunks", 0)
+            if total_chunks <= 0:
+                return []
+            avg_length = stats.get("total_length", 0) / total_chunks or 1.0
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.chunk_id, p.tf, c.length, c.filename FROM postings p "
+                    "JOIN chunks c ON c.chunk_id = p.chunk_id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                df = len(rows)
+                idf = math.log(1 + (total_chunks - df + 0.5) / (df + 0.5))
+                for chunk_id, tf, length, filename in rows:
+                    if filenames is not None and filename not in filenames:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -2,12 +2,20 @@
 FastAPI主应用
 提供RAG聊天服务的API接口
 """
+import codecs
+import json
 import logging
+import tempfile
 import time
-from typing import Dict, Any
-from fastapi import FastAPI, HTTPException, Request, UploadFile, File
+from contextlib import aclosing
+from datetime import datetime
+from pathlib import Path
+from functools import partial
+from typing import Dict, Any, List, Literal, Optional
+import anyio
+from fastapi import FastAPI, HTTPException, Query, Request, UploadFile, File
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
@@ -17,6 +25,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from backend.config import settings
 from backend.app.rag_service import RAGService
+from backend.app import metrics
+from backend.app.jobs import JobQueue, JobStore
+from backend.app.uploads import extract_archive, is_archive
 
 # 配置日志
 logging.basicConfig(
@@ -44,14 +55,114 @@ app.add_middleware(
 # 全局RAG服务实例
 rag_service: RAGService = None
 
+# 阻塞任务线程池容量限制
+worker_limiter: anyio.CapacityLimiter = None
+
+# 后台写入任务队列
+job_queue: JobQueue = None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """在有界线程池中执行阻塞调用，避免阻塞事件循环"""
+    return await anyio.to_thread.run_sync(
+        partial(func, *args, **kwargs),
+        limiter=worker_limiter
+    )
+
+
+async def iterate_blocking(iterator):
+    """
+    在有界线程池中逐项驱动阻塞迭代器，转换为异步迭代器
+    提前结束（客户端断开、被取消）时关闭底层生成器，使其跨 yield 持有的资源（如LLM并发额度）得到释放
+    """
+    sentinel = object()
+    try:
+        while True:
+            item = await run_blocking(next, iterator, sentinel)
+            if item is sentinel:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            # 取消后仍需等待关闭完成
+            with anyio.CancelScope(shield=True):
+                await run_blocking(close)
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    流式响应结束后总是关闭响应体生成器：
+    ASGI 2.4 下客户端断开时 Starlette 只抛出 ClientDisconnect，不会关闭生成器
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+
+async def save_upload_to_temp(file: UploadFile) -> Path:
+    """
+    将上传文件按块流式写入data目录下的临时文件，内存中只保留一个块
+    文件不是合法UTF-8文本时删除临时文件并返回400
+    """
+    data_path = Path(settings.data_dir)
+    data_path.mkdir(exist_ok=True)
+    temp_file = tempfile.NamedTemporaryFile(
+        dir=data_path, prefix=".upload-", suffix=".part", delete=False
+    )
+    temp_path = Path(temp_file.name)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with temp_file:
+            while True:
+                chunk = await file.read(settings.upload_chunk_bytes)
+                if not chunk:
+                    break
+                decoder.decode(chunk)
+                await run_blocking(temp_file.write, chunk)
+            decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        temp_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="文件不是有效的UTF-8文本")
+    except Exception:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return temp_path
+
+
+def upload_text_splitter(
+    chunk_profile: Optional[str], chunk_size: Optional[int], chunk_overlap: Optional[int]
+):
+    """按上传参数创建分块器，均未指定时返回None（使用默认分块器）；参数无效时返回400"""
+    if chunk_profile is None and chunk_size is None and chunk_overlap is None:
+        return None
+    try:
+        return rag_service.make_text_splitter(chunk_profile, chunk_size, chunk_overlap)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"分块参数无效: {e}")
+
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时初始化RAG服务"""
-    global rag_service
+    global rag_service, worker_limiter, job_queue
     try:
+        worker_limiter = anyio.CapacityLimiter(settings.worker_threads)
         logger.info("正在初始化RAG服务...")
-        rag_service = RAGService()
+        rag_service = await run_blocking(RAGService)
+        job_queue = JobQueue(
+            workers=settings.ingest_workers,
+            max_finished=settings.max_finished_jobs,
+            store=JobStore(
+                str(Path(settings.storage_dir) / settings.job_store_file),
+                max_finished=settings.max_finished_jobs,
+                progress_interval=settings.job_progress_save_interval_ms / 1000
+            )
+        )
+        metrics.INGEST_QUEUE_DEPTH.set_function(job_queue.pending_count)
         logger.info("RAG服务初始化完成")
     except Exception as e:
         logger.error(f"RAG服务初始化失败: {e}")
@@ -59,10 +170,30 @@ async def startup_event():
 
 
 # 请求模型
+class QueryFilters(BaseModel):
+    filenames: Optional[List[str]] = Field(None, description="只在这些文件中检索", max_length=1000)
+    filename_prefix: Optional[str] = Field(None, description="只在文件名以此开头的文件中检索")
+    modified_after: Optional[datetime] = Field(None, description="只检索此时间之后（含）修改的文件")
+    modified_before: Optional[datetime] = Field(None, description="只检索此时间之前（含）修改的文件")
+
+    def to_service(self) -> Dict[str, Any]:
+        """转换为RAGService使用的筛选条件（修改时间转为时间戳）"""
+        return {
+            "filenames": self.filenames or None,
+            "filename_prefix": self.filename_prefix or None,
+            "modified_after": self.modified_after.timestamp() if self.modified_after else None,
+            "modified_before": self.modified_before.timestamp() if self.modified_before else None,
+        }
+
+
 class QueryRequest(BaseModel):
     query: str = Field(..., description="用户问题", min_length=1, max_length=1000)
     max_results: int = Field(5, description="最大返回结果数", ge=1, le=20)
-    similarity_threshold: float = Field(0.7, description="相似度阈值", ge=0.0, le=1.0)
+    similarity_threshold: Optional[float] = Field(
+        None, description="向量相似度阈值，不传时使用服务端配置", ge=0.0, le=1.0
+    )
+    filters: Optional[QueryFilters] = Field(None, description="元数据筛选条件，各条件之间为“且”")
+    debug_timings: bool = Field(False, description="是否在响应中返回各阶段耗时明细")
 
 
 class QueryResponse(BaseModel):
@@ -70,6 +201,8 @@ class QueryResponse(BaseModel):
     sources: list = Field(..., description="相关文档片段")
     processing_time: float = Field(..., description="处理时间（秒）")
     total_sources: int = Field(..., description="源文档数量")
+    cached: bool = Field(default=False, description="是否命中问答缓存")
+    debug_timings: Optional[Dict[str, Any]] = Field(default=None, description="各阶段耗时明细（嵌套的计时区间）")
 
 
 class LoadDocumentsResponse(BaseModel):
@@ -78,13 +211,20 @@ class LoadDocumentsResponse(BaseModel):
     documents_processed: int = Field(..., description="处理的文档数量")
     replaced_files: list = Field(default=[], description="被替换的文件列表")
     new_files: list = Field(default=[], description="新增的文件列表")
+    removed_files: list = Field(default=[], description="已从磁盘删除、被移出索引的文件列表")
+    unchanged_files: int = Field(default=0, description="未变化而跳过的文件数量")
+    mode: str = Field(default="sync", description="加载模式（sync/full）")
+    total_chunks: int = Field(default=0, description="总文档块数量")
     processing_time: float = Field(..., description="处理时间（秒）")
 
 
 class StatusResponse(BaseModel):
     status: str = Field(..., description="系统状态")
-    documents_count: int = Field(..., description="文档数量")
+    documents_count: int = Field(..., description="文档块数量")
+    files_count: int = Field(default=0, description="文件数量")
     storage_size: str = Field(..., description="存储大小")
+    storage_bytes: int = Field(default=0, description="存储大小（字节，后台定期统计）")
+    last_updated: Optional[str] = Field(default=None, description="存储大小统计时间")
     collection_name: str = Field(..., description="集合名称")
     data_directory: str = Field(..., description="数据目录")
 
@@ -100,7 +240,10 @@ class DocumentInfo(BaseModel):
 class DocumentsListResponse(BaseModel):
     success: bool = Field(..., description="是否成功")
     message: str = Field(..., description="响应消息")
-    documents: list[DocumentInfo] = Field(..., description="文档列表")
+    documents: list[DocumentInfo] = Field(..., description="当前页文档列表")
+    total: int = Field(..., description="符合条件的文档总数")
+    offset: int = Field(..., description="分页起始位置")
+    limit: int = Field(..., description="每页数量")
     total_chunks: int = Field(..., description="总文档块数量")
 
 
@@ -114,6 +257,45 @@ class UploadDocumentResponse(BaseModel):
     total_chunks: int = Field(..., description="总文档块数量")
 
 
+class BatchUploadResponse(BaseModel):
+    success: bool = Field(..., description="是否成功")
+    message: str = Field(..., description="响应消息")
+    uploaded: list = Field(..., description="成功上传的文件（filename/replaced/old_chunks/new_chunks）")
+    failed: list = Field(default=[], description="被跳过或处理失败的文件（filename/error）")
+    total_chunks: int = Field(default=0, description="总文档块数量")
+
+
+class BulkDeleteRequest(BaseModel):
+    filenames: List[str] = Field(default=[], description="要删除的文件名列表")
+    pattern: Optional[str] = Field(default=None, description="文件名通配符，如 2023-*.txt")
+
+
+class BulkDeleteResponse(BaseModel):
+    success: bool = Field(..., description="是否成功")
+    message: str = Field(..., description="响应消息")
+    deleted_files: list = Field(..., description="已删除的文件列表")
+    missing_files: list = Field(default=[], description="不存在的文件列表")
+    deleted_chunks: int = Field(default=0, description="删除的文档块数量")
+    total_chunks: int = Field(default=0, description="总文档块数量")
+
+
+class JobResponse(BaseModel):
+    job_id: str = Field(..., description="任务ID")
+    kind: str = Field(..., description="任务类型（load/upload）")
+    status: str = Field(..., description="任务状态（queued/running/succeeded/failed）")
+    created_at: float = Field(..., description="提交时间")
+    started_at: Optional[float] = Field(default=None, description="开始时间")
+    finished_at: Optional[float] = Field(default=None, description="结束时间")
+    elapsed: float = Field(..., description="已执行时间（秒）")
+    files_total: int = Field(..., description="已开始处理的文件数量")
+    files_done: int = Field(..., description="处理完成的文件数量")
+    files_failed: int = Field(..., description="处理失败的文件数量")
+    chunks: int = Field(..., description="已写入的文档块数量")
+    files: list = Field(..., description="逐文件进度（status/chunks/error）")
+    result: Optional[dict] = Field(default=None, description="任务完成后的处理结果")
+    error: Optional[str] = Field(default=None, description="错误信息")
+
+
 class DeleteDocumentResponse(BaseModel):
     success: bool = Field(..., description="是否成功")
     message: str = Field(..., description="响应消息")
@@ -154,6 +336,21 @@ async def documents_page():
         )
 
 
+@app.get("/api/health")
+async def health_check():
+    """存活探针：不做任何I/O"""
+    return {"status": "ok", "ready": rag_service is not None}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus文本格式的运行指标"""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/api/status", response_model=StatusResponse)
 async def get_status():
     """获取系统状态"""
@@ -161,23 +358,40 @@ async def get_status():
         if not rag_service:
             raise HTTPException(status_code=503, detail="RAG服务未初始化")
         
-        status = rag_service.get_status()
+        # 其他工作进程写入后需读取代数文件并重新统计注册表，放入线程池避免阻塞事件循环
+        status = await run_blocking(rag_service.get_status)
         return StatusResponse(**status)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取状态失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取状态失败: {str(e)}")
 
 
+def job_accepted(job) -> JSONResponse:
+    """后台任务已提交，返回202和任务状态（已写入共享任务表，任一工作进程都可查询）"""
+    return JSONResponse(status_code=202, content=JobResponse(**job.to_dict()).model_dump())
+
+
 @app.post("/api/load-documents", response_model=LoadDocumentsResponse)
-async def load_documents():
-    """重新加载文档"""
+async def load_documents(mode: Literal["sync", "full"] = "sync", background: bool = False):
+    """
+    重新加载文档（sync: 增量同步，full: 全量重建）
+    background=true 时提交后台任务并立即返回任务ID
+    """
     try:
         if not rag_service:
             raise HTTPException(status_code=503, detail="RAG服务未初始化")
+
+        if background:
+            job = job_queue.submit(
+                "load", lambda progress: rag_service.load_documents(mode=mode, progress=progress)
+            )
+            return job_accepted(job)
         
         start_time = time.time()
-        result = rag_service.load_documents()
+        result = await run_blocking(rag_service.load_documents, mode=mode)
         processing_time = time.time() - start_time
         
         if not result["success"]:
@@ -205,9 +419,13 @@ async def query_documents(request: QueryRequest):
             raise HTTPException(status_code=503, detail="RAG服务未初始化")
 
         start_time = time.time()
-        result = rag_service.query(
+        result = await run_blocking(
+            rag_service.query,
             question=request.query,
-            max_results=request.max_results
+            max_results=request.max_results,
+            similarity_threshold=request.similarity_threshold,
+            filters=request.filters.to_service() if request.filters else None,
+            debug_timings=request.debug_timings
         )
         processing_time = time.time() - start_time
 
@@ -218,7 +436,9 @@ async def query_documents(request: QueryRequest):
             "answer": result["answer"],
             "sources": result["sources"],
             "processing_time": processing_time,
-            "total_sources": result["total_sources"]
+            "total_sources": result["total_sources"],
+            "cached": result.get("cached", False),
+            "debug_timings": result.get("debug_timings")
         }
 
         return QueryResponse(**response_data)
@@ -230,15 +450,59 @@ async def query_documents(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
 
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """流式查询问答（Server-Sent Events）：先推送来源，再逐段推送回答"""
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG服务未初始化")
+
+    start_time = time.time()
+    events = rag_service.stream_query(
+        question=request.query,
+        max_results=request.max_results,
+        similarity_threshold=request.similarity_threshold,
+        filters=request.filters.to_service() if request.filters else None,
+        debug_timings=request.debug_timings
+    )
+
+    async def event_stream():
+        # 提前结束时 aclosing 确保内层迭代器也被关闭，进而关闭 stream_query 生成器
+        async with aclosing(iterate_blocking(events)) as stream:
+            async for event in stream:
+                data = event["data"]
+                if event["event"] == "done":
+                    data["processing_time"] = time.time() - start_time
+                yield f"event: {event['event']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return ClosingStreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # 文档管理API接口
 @app.get("/api/documents", response_model=DocumentsListResponse)
-async def get_documents_list():
-    """获取文档列表"""
+async def get_documents_list(
+    offset: int = Query(0, ge=0, description="分页起始位置"),
+    limit: int = Query(50, ge=1, le=500, description="每页数量"),
+    sort: Literal["name", "size", "mtime", "chunks"] = Query("name", description="排序字段"),
+    order: Literal["asc", "desc"] = Query("asc", description="排序方向"),
+    prefix: str = Query("", description="文件名前缀过滤")
+):
+    """分页获取文档列表"""
     try:
         if not rag_service:
             raise HTTPException(status_code=503, detail="RAG服务未初始化")
 
-        result = rag_service.get_documents_list()
+        result = await run_blocking(
+            rag_service.get_documents_list,
+            offset=offset,
+            limit=limit,
+            sort=sort,
+            order=order,
+            prefix=prefix
+        )
 
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["message"])
@@ -253,8 +517,17 @@ async def get_documents_list():
 
 
 @app.post("/api/documents/upload", response_model=UploadDocumentResponse)
-async def upload_document(file: UploadFile = File(...)):
-    """上传文档"""
+async def upload_document(
+    file: UploadFile = File(...),
+    background: bool = False,
+    chunk_profile: Optional[str] = Query(None, description="分块方案名称（见 chunk_profiles 配置）"),
+    chunk_size: Optional[int] = Query(None, ge=1, description="块大小（词元数），覆盖分块方案"),
+    chunk_overlap: Optional[int] = Query(None, ge=0, description="块重叠（词元数），覆盖分块方案")
+):
+    """
+    上传文档（background=true 时文件写入磁盘后提交后台任务并立即返回任务ID）
+    可通过 chunk_profile / chunk_size / chunk_overlap 指定本次上传的分块方式
+    """
     try:
         if not rag_service:
             raise HTTPException(status_code=503, detail="RAG服务未初始化")
@@ -263,12 +536,27 @@ async def upload_document(file: UploadFile = File(...)):
         if not file.filename.endswith('.txt'):
             raise HTTPException(status_code=400, detail="只支持TXT文件格式")
 
-        # 读取文件内容
-        content = await file.read()
-        file_content = content.decode('utf-8')
+        text_splitter = upload_text_splitter(chunk_profile, chunk_size, chunk_overlap)
+
+        # 分块流式写入data目录下的临时文件，同时校验UTF-8编码
+        temp_path = await save_upload_to_temp(file)
+
+        if background:
+            def run_upload(progress, filename=file.filename):
+                try:
+                    return rag_service.upload_file(temp_path, filename, progress, text_splitter)
+                finally:
+                    temp_path.unlink(missing_ok=True)
+
+            return job_accepted(job_queue.submit("upload", run_upload))
 
         # 上传文档
-        result = rag_service.upload_document(file_content, file.filename)
+        try:
+            result = await run_blocking(
+                rag_service.upload_file, temp_path, file.filename, text_splitter=text_splitter
+            )
+        finally:
+            temp_path.unlink(missing_ok=True)
 
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["message"])
@@ -282,6 +570,115 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"上传文档失败: {str(e)}")
 
 
+@app.post("/api/documents/upload-batch", response_model=BatchUploadResponse)
+async def upload_documents_batch(
+    files: List[UploadFile] = File(...),
+    background: bool = False,
+    chunk_profile: Optional[str] = Query(None, description="分块方案名称（见 chunk_profiles 配置）"),
+    chunk_size: Optional[int] = Query(None, ge=1, description="块大小（词元数），覆盖分块方案"),
+    chunk_overlap: Optional[int] = Query(None, ge=0, description="块重叠（词元数），覆盖分块方案")
+):
+    """
+    批量上传文档：支持多个TXT文件和zip/tar压缩包（流式解压），
+    所有文件在一次批量写入中处理；background=true 时提交后台任务并立即返回任务ID
+    分块参数同单文件上传，对本批所有文件生效
+    """
+    try:
+        if not rag_service:
+            raise HTTPException(status_code=503, detail="RAG服务未初始化")
+
+        text_splitter = upload_text_splitter(chunk_profile, chunk_size, chunk_overlap)
+
+        data_path = Path(settings.data_dir)
+        data_path.mkdir(exist_ok=True)
+        staged = []
+        skipped = []
+        try:
+            for file in files:
+                name = Path(file.filename or "").name
+                if is_archive(name):
+                    extracted, errors = await run_blocking(
+                        extract_archive, file.file, name, data_path, settings.upload_chunk_bytes,
+                        max_members=settings.archive_max_members,
+                        max_member_bytes=settings.archive_max_member_bytes,
+                        max_total_bytes=settings.archive_max_total_bytes
+                    )
+                    staged.extend(extracted)
+                    skipped.extend(errors)
+                elif name.endswith(".txt"):
+                    try:
+                        staged.append((await save_upload_to_temp(file), name))
+                    except HTTPException as e:
+                        skipped.append({"filename": name, "error": e.detail})
+                else:
+                    skipped.append({"filename": name, "error": "只支持TXT文件或zip/tar压缩包"})
+        except Exception:
+            for temp_path, _ in staged:
+                temp_path.unlink(missing_ok=True)
+            raise
+
+        if not staged:
+            raise HTTPException(status_code=400, detail="没有可上传的TXT文件")
+
+        def run_upload(progress=None):
+            try:
+                result = rag_service.upload_files(staged, progress, text_splitter)
+            finally:
+                for temp_path, _ in staged:
+                    temp_path.unlink(missing_ok=True)
+            if result["success"]:
+                result["failed"] = skipped + result["failed"]
+                result["message"] = (
+                    f"批量上传完成: 成功 {len(result['uploaded'])} 个，"
+                    f"失败 {len(result['failed'])} 个"
+                )
+            return result
+
+        if background:
+            return job_accepted(job_queue.submit("upload", run_upload))
+
+        result = await run_blocking(run_upload)
+
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["message"])
+
+        return BatchUploadResponse(**result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量上传失败: {e}")
+        raise HTTPException(status_code=500, detail=f"批量上传失败: {str(e)}")
+
+
+@app.post("/api/documents/bulk-delete", response_model=BulkDeleteResponse)
+async def bulk_delete_documents(request: BulkDeleteRequest):
+    """批量删除文档（文件名列表和/或通配符）"""
+    try:
+        if not rag_service:
+            raise HTTPException(status_code=503, detail="RAG服务未初始化")
+
+        if not request.filenames and not request.pattern:
+            raise HTTPException(status_code=400, detail="请提供文件名列表或通配符")
+
+        result = await run_blocking(
+            rag_service.delete_documents,
+            filenames=request.filenames,
+            pattern=request.pattern
+        )
+
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["message"])
+
+        return BulkDeleteResponse(**result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量删除失败: {e}")
+        raise HTTPException(status_code=500, detail=f"批量删除失败: {str(e)}")
+
+
 @app.delete("/api/documents/{filename}", response_model=DeleteDocumentResponse)
 async def delete_document(filename: str):
     """删除文档"""
@@ -289,7 +686,7 @@ async def delete_document(filename: str):
         if not rag_service:
             raise HTTPException(status_code=503, detail="RAG服务未初始化")
 
-        result = rag_service.delete_document(filename)
+        result = await run_blocking(rag_service.delete_document, filename)
 
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["message"])
@@ -303,6 +700,19 @@ async def delete_document(filename: str):
         raise HTTPException(status_code=500, detail=f"删除文档失败: {str(e)}")
 
 
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """查询后台任务状态和逐文件进度"""
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="RAG服务未初始化")
+
+    # 本进程没有该任务时需要读取共享任务表
+    job = await run_blocking(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    return JobResponse(**job)
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """请求日志中间件"""
@@ -311,6 +721,14 @@ async def log_requests(request: Request, call_next):
     response = await call_next(request)
     
     process_time = time.time() - start_time
+    # 按路由模板统计，避免路径参数导致标签数量膨胀
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        process_time,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code)
+    )
     logger.info(
         f"{request.method} {request.url.path} - "
         f"Status: {response.status_code} - "
@@ -0,0 +1,321 @@
+"""
+Prometheus文本格式的运行指标
+各阶段延迟直方图（查询嵌入、向量检索、关键词检索、LLM生成、分块、嵌入批次、Chroma写入）、
+词元数、缓存命中、写入任务队列深度和进行中的LLM调用数，由 /metrics 接口输出
+"""
+import math
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMCompletionEndEvent,
+)
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶（秒），覆盖从本地检索的毫秒级到LLM生成的数十秒
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """指标基类"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值；也可以绑定取值函数，在输出时读取"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    @contextmanager
+    def track_in_progress(self) -> Iterator[None]:
+        """进入时加一，退出时减一"""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def _samples(self) -> List[str]:
+        value = self._value
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                logger.warning(f"读取指标 {self.name} 失败: {e}")
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 标签值 → (各桶计数, 总和, 样本数)
+        self._series: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._series[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """统计代码块耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total, count)
+                      for key, (counts, total, count) in self._series.items()]
+        lines = []
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """输出Prometheus文本格式"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_stage_duration_seconds",
+    "各处理阶段耗时（query_embedding/vector_retrieval/keyword_retrieval/llm_synthesis/"
+    "chunking/embedding_batch/chroma_write）",
+    labelnames=("stage",),
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP请求耗时",
+    labelnames=("method", "route", "status"),
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "rag_llm_tokens_total",
+    "LLM输入/输出词元数（接口未返回用量时按分词器估算）",
+    labelnames=("direction",),
+))
+LLM_CALLS = REGISTRY.register(Counter(
+    "rag_llm_calls_total",
+    "LLM调用次数",
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "rag_cache_requests_total",
+    "缓存查询次数",
+    labelnames=("cache", "result"),
+))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "rag_llm_in_flight",
+    "进行中的LLM生成数量",
+))
+INGEST_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "rag_ingest_queue_depth",
+    "排队中的后台写入任务数量",
+))
+
+
+def stage_timer(stage: str):
+    """统计单个处理阶段的耗时"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    """记录缓存命中/未命中"""
+    if count > 0:
+        CACHE_REQUESTS.inc(count, cache=cache, result="hit" if hit else "miss")
+
+
+def _usage_tokens(raw) -> Tuple[Optional[int], Optional[int]]:
+    """从OpenAI兼容接口的原始响应中读取词元用量"""
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+class LLMTokenHandler(BaseEventHandler):
+    """
+    监听LlamaIndex的LLM结束事件，统计调用次数和词元数
+    聊天模型只统计chat事件，补全模型只统计completion事件，避免包装调用重复计数
+    """
+
+    chat_model: bool = True
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMTokenHandler"
+
+    def handle(self, event: BaseEvent, **kwargs):
+        if self.chat_model and isinstance(event, LLMChatEndEvent):
+            prompt = "\n".join(str(message.content or "") for message in event.messages)
+            response = event.response
+        elif not self.chat_model and isinstance(event, LLMCompletionEndEvent):
+            prompt = event.prompt
+            response = event.response
+        else:
+            return
+        if response is None:
+            return
+
+        prompt_tokens, completion_tokens = _usage_tokens(getattr(response, "raw", None))
+        if prompt_tokens is None or completion_tokens is None:
+            from llama_index.core.utils import get_tokenizer
+            tokenizer = get_tokenizer()
+            if prompt_tokens is None:
+                prompt_tokens = len(tokenizer(prompt))
+            if completion_tokens is None:
+                text = getattr(getattr(response, "message", None), "content", None)
+                if text is None:
+                    text = getattr(response, "text", "")
+                completion_tokens = len(tokenizer(text or ""))
+
+        LLM_CALLS.inc()
+        LLM_TOKENS.inc(prompt_tokens, direction="in")
+        LLM_TOKENS.inc(completion_tokens, direction="out")
+
+
+_token_handler: Optional[LLMTokenHandler] = None
+
+
+def install_llm_token_handler(chat_model: bool):
+    """在LlamaIndex根调度器上注册词元统计（每个进程只注册一次）"""
+    global _token_handler
+    if _token_handler is None:
+        _token_handler = LLMTokenHandler(chat_model=chat_model)
+        get_dispatcher().add_event_handler(_token_handler)
+    else:
+        _token_handler.chat_model = chat_model
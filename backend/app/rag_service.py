@@ -4,27 +4,68 @@ RAG服务核心类
 """
 import os
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable
 from pathlib import Path
-import chromadb
 from llama_index.core import VectorStoreIndex, StorageContext, Settings
-from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.node_parser import TextSplitter
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
-from llama_index.core import SimpleDirectoryReader
-from llama_index.core.retrievers import QueryFusionRetriever
-from llama_index.retrievers.bm25 import BM25Retriever
+from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
 from llama_index.core.query_engine import RetrieverQueryEngine
-from llama_index.core.response_synthesizers import CompactAndRefine
+from llama_index.core.response_synthesizers import BaseSynthesizer, CompactAndRefine, SimpleSummarize
+from llama_index.core.utils import get_tokenizer
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from backend.config import settings
+from backend.app.keyword_index import KeywordIndex
+from backend.app.document_registry import DocumentRegistry
+from backend.app.retrievers import (
+    AdaptiveTopKRetriever, KeywordRetriever, HybridRetriever, SimilarityCutoffRetriever,
+    TimedRetriever
+)
+from backend.app import metrics, tracing
+from backend.app.ingestion import IngestionPipeline, ProgressCallback, file_sha256
+from backend.app.embedding_cache import EmbeddingCache
+from backend.app.answer_cache import AnswerCache
+from backend.app.chunker import make_splitter
+from backend.app.context_packing import pack_context
+from backend.app.storage_monitor import StorageMonitor
+from backend.app.coordination import WriteCoordinator
+from backend.app.chroma_client import close_chroma_client, get_chroma_client
+from backend.app.fake_backend import FakeLLM, HashEmbedding
 
 logger = logging.getLogger(__name__)
 
+# 没有检索到任何片段（如筛选条件不匹配任何文件）时的回答，不调用LLM
+NO_CONTEXT_ANSWER = "没有检索到与问题相关的文档内容。"
+
+
+def write_operation(func):
+    """
+    写操作装饰器：写操作在进程内和多个工作进程之间串行执行，
+    开始前加载其他工作进程的写入，完成后递增存储代数并刷新状态计数
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.coordinator.write_lock():
+            self._sync_generation()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                with self._reload_lock:
+                    self._generation = self.coordinator.bump()
+                self._refresh_counters()
+    return wrapper
+
 
 class RAGService:
     """RAG服务类，实现文档加载、索引构建和混合检索"""
@@ -32,20 +73,104 @@ class RAGService:
     def __init__(self):
         self.index: Optional[VectorStoreIndex] = None
         self.query_engine = None
+        self.streaming_synthesizer = None
         self.chroma_client = None
         self.collection = None
+        self.keyword_index: Optional[KeywordIndex] = None
+        self.registry: Optional[DocumentRegistry] = None
+        self.ingestion: Optional[IngestionPipeline] = None
+        self.answer_cache: Optional[AnswerCache] = None
+        self.storage_monitor: Optional[StorageMonitor] = None
+        
+        # 状态计数（写操作后刷新，状态接口直接读取）
+        self._counters = {"chunks": 0, "files": 0}
+        
+        # 跨工作进程的写锁和存储代数，LLM并发限制
+        self.coordinator = WriteCoordinator(
+            settings.chroma_persist_directory,
+            lock_file=settings.write_lock_file,
+            generation_file=settings.generation_file
+        )
+        self._generation = 0
+        self._counters_generation = 0
+        self._reload_lock = threading.Lock()
+        # 各Chroma客户端上进行中的查询数，以及重新加载后等待这些查询结束再关闭的旧客户端
+        self._client_leases: Dict[int, int] = {}
+        self._retired_clients: Dict[int, Any] = {}
+        self._llm_semaphore = threading.BoundedSemaphore(settings.max_concurrent_llm_calls)
         
         # 初始化LlamaIndex设置
         self._setup_llama_index()
         
-        # 初始化ChromaDB
-        self._setup_chroma()
+        # LLM词元数统计和查询追踪
+        metrics.install_llm_token_handler(Settings.llm.metadata.is_chat_model)
+        tracing.install_event_handler(Settings.llm.metadata.is_chat_model)
+        tracing.configure(settings.trace_export_file)
+        
+        # 初始化存储（其他工作进程可能同时启动，创建集合和重建索引需持有写锁）
+        with self.coordinator.write_lock():
+            # 初始化ChromaDB
+            self._setup_chroma()
+            
+            # 初始化BM25关键词索引
+            self._setup_keyword_index()
+            
+            # 初始化文档注册表
+            self._setup_document_registry()
+            
+            self._generation = self.coordinator.generation()
+        
+        # 初始化批量写入管线（可选嵌入缓存）
+        embedding_cache = None
+        if settings.embedding_cache_enabled:
+            embedding_cache = EmbeddingCache(
+                str(Path(settings.storage_dir) / settings.embedding_cache_file),
+                max_entries=settings.embedding_cache_max_entries
+            )
+        self.ingestion = IngestionPipeline(
+            collection=self.collection,
+            keyword_index=self.keyword_index,
+            embed_model=Settings.embed_model,
+            text_splitter=Settings.node_parser,
+            batch_size=settings.embed_batch_size,
+            concurrency=settings.embed_concurrency,
+            embedding_cache=embedding_cache,
+            window_chars=settings.ingest_window_chars,
+            registry=self.registry,
+            chunk_processes=settings.chunk_processes,
+            parallel_min_bytes=settings.parallel_chunking_min_bytes
+        )
+        
+        # 初始化问答缓存
+        if settings.answer_cache_enabled:
+            self.answer_cache = AnswerCache(
+                max_entries=settings.answer_cache_max_entries,
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                similarity_threshold=(
+                    settings.answer_cache_similarity_threshold
+                    if settings.answer_cache_semantic else None
+                )
+            )
         
         # 加载现有索引或创建新索引
         self._load_or_create_index()
+        
+        # 初始化状态计数和后台存储统计
+        self._refresh_counters()
+        self.storage_monitor = StorageMonitor(
+            settings.chroma_persist_directory,
+            interval=settings.status_refresh_interval
+        )
     
     def _setup_llama_index(self):
         """配置LlamaIndex全局设置"""
+        if settings.llm_backend == "fake":
+            self._setup_fake_backend()
+            return
+
+        if not settings.openai_api_key:
+            raise ValueError("未配置OPENAI_API_KEY（离线测试可设置LLM_BACKEND=fake）")
+
         # 强制设置环境变量
         os.environ['OPENAI_API_KEY'] = settings.openai_api_key
         os.environ['OPENAI_BASE_URL'] = settings.openai_base_url
@@ -71,24 +196,55 @@ class RAGService:
         Settings.embed_model = OpenAIEmbedding(
             api_key=settings.openai_api_key,
             base_url=settings.openai_base_url,
-            model=settings.embedding_model
+            model=settings.embedding_model,
+            embed_batch_size=settings.embed_batch_size
         )
         
         # 设置文本分块器
-        Settings.node_parser = SentenceSplitter(
-            chunk_size=512,
-            chunk_overlap=50
-        )
+        Settings.node_parser = self.make_text_splitter()
         
         logger.info("LlamaIndex设置完成")
     
-    def _setup_chroma(self):
-        """初始化ChromaDB客户端和集合"""
-        try:
-            # 创建ChromaDB客户端 - 使用新的配置方式
-            self.chroma_client = chromadb.PersistentClient(
-                path=settings.chroma_persist_directory
+    def _setup_fake_backend(self):
+        """使用离线模拟后端（哈希嵌入 + 固定速率的模拟LLM），不访问外部接口"""
+        Settings.llm = FakeLLM(
+            latency_ms=settings.fake_llm_latency_ms,
+            tokens_per_second=settings.fake_llm_tokens_per_second,
+            response_tokens=settings.fake_llm_response_tokens
+        )
+        Settings.embed_model = HashEmbedding(
+            embed_dim=settings.fake_embedding_dim,
+            embed_batch_size=settings.embed_batch_size
+        )
+        Settings.node_parser = self.make_text_splitter()
+        logger.info(f"LlamaIndex设置完成（离线模拟后端，向量维度: {settings.fake_embedding_dim}）")
+    
+    @staticmethod
+    def make_text_splitter(
+        profile: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None
+    ) -> TextSplitter:
+        """
+        按分块方案创建分块器，chunk_size / chunk_overlap 覆盖方案中的值
+        方案不存在或参数无效时抛出ValueError
+        """
+        name = profile or settings.chunk_profile
+        if name not in settings.chunk_profiles:
+            raise ValueError(
+                f"未知的分块方案: {name}（可选: {', '.join(settings.chunk_profiles)}）"
             )
+        values = settings.chunk_profiles[name]
+        return make_splitter(
+            settings.chunker,
+            chunk_size=chunk_size if chunk_size is not None else values["chunk_size"],
+            chunk_overlap=chunk_overlap if chunk_overlap is not None else values["chunk_overlap"]
+        )
+    
+    def _setup_chroma(self, refresh: bool = False):
+        """初始化ChromaDB客户端（embedded/http模式见 chroma_client）和集合"""
+        try:
+            self.chroma_client = get_chroma_client(refresh)
             
             # 获取或创建集合
             try:
@@ -106,6 +262,73 @@ class RAGService:
             logger.error(f"ChromaDB初始化失败: {e}")
             raise
     
+    def _setup_keyword_index(self):
+        """初始化持久化BM25索引，与Chroma集合不一致或分词方式已更新时一次性重建"""
+        index_path = Path(settings.chroma_persist_directory) / settings.keyword_index_file
+        self.keyword_index = KeywordIndex(str(index_path))
+
+        chroma_count = self.collection.count()
+        if self.keyword_index.count() != chroma_count:
+            logger.info(
+                f"关键词索引与向量集合不一致({self.keyword_index.count()}/{chroma_count})，开始重建"
+            )
+            self._rebuild_keyword_index()
+        elif not self.keyword_index.tokenizer_current():
+            logger.info("关键词索引的分词方式已更新，开始重建")
+            self._rebuild_keyword_index()
+
+    def _rebuild_keyword_index(self, batch_size: int = 1000):
+        """从Chroma分页读取全部文档块重建关键词索引（仅用于迁移/修复）"""
+        self.keyword_index.clear()
+        offset = 0
+        while True:
+            result = self.collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["documents", "metadatas"]
+            )
+            ids = result["ids"]
+            if not ids:
+                break
+            self.keyword_index.add(
+                (chunk_id, (metadata or {}).get("filename", ""), text or "")
+                for chunk_id, text, metadata in zip(ids, result["documents"], result["metadatas"])
+            )
+            offset += len(ids)
+        logger.info(f"关键词索引重建完成，文档块数量: {self.keyword_index.count()}")
+
+    def _setup_document_registry(self):
+        """初始化文档注册表，与Chroma集合不一致时（如首次升级）一次性重建"""
+        registry_path = Path(settings.chroma_persist_directory) / settings.document_registry_file
+        self.registry = DocumentRegistry(str(registry_path))
+
+        chroma_count = self.collection.count()
+        if self.registry.chunk_count() != chroma_count:
+            logger.info(
+                f"文档注册表与向量集合不一致({self.registry.chunk_count()}/{chroma_count})，开始重建"
+            )
+            self._rebuild_document_registry()
+
+    def _rebuild_document_registry(self, batch_size: int = 5000):
+        """从Chroma分页读取元数据重建文档注册表（仅用于迁移/修复）"""
+        self.registry.clear()
+        offset = 0
+        while True:
+            result = self.collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["metadatas"]
+            )
+            ids = result["ids"]
+            if not ids:
+                break
+            self.registry.add_chunks(
+                (chunk_id, metadata or {})
+                for chunk_id, metadata in zip(ids, result["metadatas"])
+            )
+            offset += len(ids)
+        logger.info(f"文档注册表重建完成，文件数量: {self.registry.document_count()}")
+
     def _load_or_create_index(self):
         """加载现有索引或创建新索引"""
         try:
@@ -137,26 +360,163 @@ class RAGService:
             raise
     
     def _create_query_engine(self):
-        """创建混合检索查询引擎"""
+        """
+        创建混合检索查询引擎
+        检索器直接读取Chroma集合和关键词索引，文档增删后无需重建，
+        引擎在进程生命周期内只创建一次
+        """
         if not self.index:
             raise ValueError("索引未初始化")
         
         try:
-            # 暂时只使用向量检索，避免混合模式的配置问题
-            self.query_engine = self.index.as_query_engine(
-                similarity_top_k=5
+            retriever = self._build_retriever(
+                settings.similarity_top_k, settings.similarity_threshold
+            )
+
+            # 构建完成后整体替换，查询不会看到构建到一半的引擎
+            self.streaming_synthesizer = self._make_synthesizer(streaming=True)
+            self.query_engine = RetrieverQueryEngine(
+                retriever=retriever,
+                response_synthesizer=self._make_synthesizer(streaming=False)
             )
 
-            logger.info("向量检索查询引擎创建完成")
+            logger.info(
+                f"查询引擎创建完成，检索模式: {settings.retrieval_mode}，"
+                f"回答生成模式: {settings.synthesis_mode}"
+            )
 
         except Exception as e:
             logger.error(f"查询引擎创建失败: {e}")
             raise
     
-    def load_documents(self) -> Dict[str, Any]:
+    def _build_retriever(self, top_k: int, similarity_cutoff: float,
+                         filenames: Optional[List[str]] = None) -> BaseRetriever:
+        """
+        按检索模式构造检索器；各路候选数不少于配置值，最终返回 top_k 个
+        filenames 不为None时只检索这些文件：向量检索转为Chroma的where条件，关键词检索同样按文件过滤
+        自适应top-k在每一路按该路自身的分数截断，混合模式下再对截断后的结果做RRF融合
+        检索器只持有索引和集合的引用，构造开销很小，每次查询按请求参数构造
+        """
+        metadata_filters = None
+        if filenames is not None:
+            metadata_filters = MetadataFilters(filters=[
+                MetadataFilter(key="filename", operator=FilterOperator.IN, value=filenames)
+            ])
+        vector_retriever = AdaptiveTopKRetriever(
+            SimilarityCutoffRetriever(
+                TimedRetriever(
+                    VectorIndexRetriever(
+                        index=self.index,
+                        similarity_top_k=max(top_k, settings.similarity_top_k),
+                        filters=metadata_filters
+                    ),
+                    stage="vector_retrieval"
+                ),
+                similarity_cutoff=similarity_cutoff
+            ),
+            drop_ratio=settings.adaptive_top_k_drop_ratio
+        )
+        keyword_retriever = AdaptiveTopKRetriever(
+            TimedRetriever(
+                KeywordRetriever(
+                    keyword_index=self.keyword_index,
+                    collection=self.collection,
+                    similarity_top_k=max(top_k, settings.keyword_top_k),
+                    filenames=set(filenames) if filenames is not None else None
+                ),
+                stage="keyword_retrieval"
+            ),
+            drop_ratio=settings.adaptive_top_k_drop_ratio
+        )
+
+        if settings.retrieval_mode == "vector":
+            return vector_retriever
+        if settings.retrieval_mode == "keyword":
+            return keyword_retriever
+        return HybridRetriever(
+            vector_retriever=vector_retriever,
+            keyword_retriever=keyword_retriever,
+            similarity_top_k=top_k,
+            rrf_k=settings.rrf_k
+        )
+    
+    @staticmethod
+    def _make_synthesizer(streaming: bool) -> BaseSynthesizer:
+        """packed 模式下上下文已按预算打包，用单次调用的合成器"""
+        if settings.synthesis_mode == "packed":
+            return SimpleSummarize(streaming=streaming)
+        return CompactAndRefine(streaming=streaming)
+    
+    def _prepare_context(self, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        """packed 模式下合并重叠/相邻的块并按词元预算打包，其他模式原样返回"""
+        if settings.synthesis_mode != "packed":
+            return nodes
+        with tracing.span("context_packing") as span:
+            packed = pack_context(nodes, settings.context_token_budget, get_tokenizer())
+            if span is not None:
+                span.attributes["passages"] = len(packed)
+        return packed
+    
+    def _resolve_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        """
+        通过文档注册表将筛选条件（filenames / filename_prefix / modified_after / modified_before）
+        解析为文件名列表；未指定任何条件时返回None，表示检索全部文档
+        前缀和修改时间条件同样展开为全部匹配的文件名，列表长度没有上限，
+        会原样成为Chroma的 $in 条件，匹配文件很多时过滤条件和检索开销随之增大
+        """
+        if not filters or not any(value is not None and value != "" for value in filters.values()):
+            return None
+        return self.registry.filter_filenames(
+            filenames=filters.get("filenames"),
+            prefix=filters.get("filename_prefix") or "",
+            modified_after=filters.get("modified_after"),
+            modified_before=filters.get("modified_before")
+        )
+    
+    @staticmethod
+    def _filter_key(filters: Optional[Dict[str, Any]]) -> Tuple:
+        """筛选条件在问答缓存键中的表示"""
+        filters = filters or {}
+        filenames = filters.get("filenames")
+        return (
+            tuple(sorted(filenames)) if filenames is not None else None,
+            filters.get("filename_prefix") or "",
+            filters.get("modified_after"),
+            filters.get("modified_before")
+        )
+    
+    def _retrieve_nodes(self, query_bundle: QueryBundle, max_results: int,
+                        similarity_threshold: float,
+                        filters: Optional[Dict[str, Any]] = None) -> List[NodeWithScore]:
+        """
+        在生成回答前应用筛选条件、相似度阈值、自适应top-k 和 max_results，减少进入提示词的片段
+        自适应top-k已在各路检索器内按原始分数截断（见 _build_retriever），这里只按 max_results 截断
+        """
+        with tracing.span("retrieve", similarity_threshold=similarity_threshold) as span, \
+                self._chroma_lease():
+            filenames = self._resolve_filters(filters)
+            if span is not None and filenames is not None:
+                span.attributes["filtered_files"] = len(filenames)
+            if filenames is not None and not filenames:
+                # 没有符合筛选条件的文件
+                return []
+            retriever = self._build_retriever(max_results, similarity_threshold, filenames)
+            candidates = retriever.retrieve(query_bundle)
+            nodes = candidates[:max_results]
+            if span is not None:
+                span.attributes["candidates"] = len(candidates)
+                span.attributes["nodes"] = len(nodes)
+        return nodes
+    
+    @write_operation
+    def load_documents(
+        self, mode: str = "sync", progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
         """
         加载data目录中的所有TXT文档
-        实现同名文件完全替换机制
+        mode="sync": 增量同步，只处理新增/变更的文件，并清理磁盘上已删除的文件
+        mode="full": 全量重建，同名文件完全替换
+        progress: 可选的逐文件进度回调
         """
         try:
             data_path = Path(settings.data_dir)
@@ -169,6 +529,9 @@ class RAGService:
             
             # 读取所有TXT文件
             txt_files = list(data_path.glob("*.txt"))
+            if mode == "sync":
+                return self._sync_documents(txt_files, progress)
+
             if not txt_files:
                 return {
                     "success": False,
@@ -183,35 +546,32 @@ class RAGService:
             for txt_file in txt_files:
                 filename = txt_file.name
                 
-                # 检查是否为同名文件（需要替换）
-                existing_ids = self._get_document_ids_by_filename(filename)
-                if existing_ids:
-                    # 删除旧文件的所有相关数据
-                    self._delete_document_by_filename(filename)
+                # 检查是否为同名文件（需要替换），删除旧文件的所有相关数据
+                old_chunks = self._delete_document_by_filename(filename)
+                if old_chunks:
                     replaced_files.append({
                         "filename": filename,
-                        "old_chunks": len(existing_ids)
+                        "old_chunks": old_chunks
                     })
-                    logger.info(f"删除同名文件的旧数据: {filename}, 块数: {len(existing_ids)}")
+                    logger.info(f"删除同名文件的旧数据: {filename}, 块数: {old_chunks}")
                 else:
                     new_files.append(filename)
                 
-                # 处理新文件
-                self._process_single_file(txt_file)
                 processed_files.append(filename)
             
-            # 重新创建查询引擎
-            self._create_query_engine()
+            # 所有文件统一分块、批量嵌入和写入
+            chunk_counts = self._ingest_files(
+                [(txt_file, txt_file.name) for txt_file in txt_files], progress
+            )
             
             # 更新replaced_files中的new_chunks信息
             for replaced_file in replaced_files:
-                filename = replaced_file["filename"]
-                new_ids = self._get_document_ids_by_filename(filename)
-                replaced_file["new_chunks"] = len(new_ids)
+                replaced_file["new_chunks"] = chunk_counts.get(replaced_file["filename"], 0)
             
             return {
                 "success": True,
                 "message": f"成功处理 {len(processed_files)} 个文件",
+                "mode": mode,
                 "documents_processed": len(processed_files),
                 "replaced_files": replaced_files,
                 "new_files": new_files,
@@ -226,76 +586,171 @@ class RAGService:
                 "documents_processed": 0
             }
     
+    def _sync_documents(
+        self, txt_files: List[Path], progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        增量同步data目录与索引
+        大小和修改时间一致的文件直接跳过；不一致时再比较内容哈希
+        """
+        stored_files = self.registry.all_documents()
+        
+        new_files = []
+        replaced_files = []
+        unchanged_files = []
+        pending = []
+        stale_files = []
+        
+        for txt_file in txt_files:
+            filename = txt_file.name
+            stored = stored_files.pop(filename, None)
+            if stored is None:
+                new_files.append(filename)
+                pending.append((txt_file, filename))
+                continue
+            
+            stat = txt_file.stat()
+            if stored["file_size"] == stat.st_size and stored["file_modified"] == str(stat.st_mtime):
+                unchanged_files.append(filename)
+                continue
+            
+            if stored["file_hash"] and stored["file_hash"] == file_sha256(txt_file):
+                # 内容未变（如文件被touch或重新复制），记录新的大小和修改时间，下次同步不再计算哈希
+                self.registry.update_stat(filename, stat.st_size, str(stat.st_mtime))
+                unchanged_files.append(filename)
+                continue
+            
+            replaced_files.append({
+                "filename": filename,
+                "old_chunks": stored["chunks_count"]
+            })
+            stale_files.append(filename)
+            pending.append((txt_file, filename))
+        
+        # 剩余的是磁盘上已不存在的文件
+        removed_files = [
+            {"filename": filename, "chunks": stored["chunks_count"]}
+            for filename, stored in stored_files.items()
+        ]
+        stale_files.extend(stored_files)
+        
+        if not pending and not removed_files and not unchanged_files:
+            return {
+                "success": False,
+                "message": "未找到TXT文件",
+                "documents_processed": 0
+            }
+        
+        self._delete_documents(stale_files)
+        chunk_counts = self._ingest_files(pending, progress) if pending else {}
+        for replaced_file in replaced_files:
+            replaced_file["new_chunks"] = chunk_counts.get(replaced_file["filename"], 0)
+        
+        logger.info(
+            f"增量同步完成: 新增 {len(new_files)}，更新 {len(replaced_files)}，"
+            f"删除 {len(removed_files)}，未变化 {len(unchanged_files)}"
+        )
+        
+        return {
+            "success": True,
+            "message": (
+                f"同步完成: 新增 {len(new_files)} 个，更新 {len(replaced_files)} 个，"
+                f"删除 {len(removed_files)} 个，未变化 {len(unchanged_files)} 个"
+            ),
+            "mode": "sync",
+            "documents_processed": len(pending),
+            "replaced_files": replaced_files,
+            "new_files": new_files,
+            "removed_files": removed_files,
+            "unchanged_files": len(unchanged_files),
+            "total_chunks": self.collection.count()
+        }
+    
     def _get_document_ids_by_filename(self, filename: str) -> List[str]:
         """根据文件名获取所有相关的文档ID"""
-        try:
-            result = self.collection.get(
-                where={"filename": filename}
-            )
-            return result["ids"] if result["ids"] else []
-        except Exception as e:
-            logger.warning(f"查询文档ID失败: {e}")
-            return []
+        return self.registry.get_chunk_ids(filename)
+    
+    def _delete_document_by_filename(self, filename: str) -> int:
+        """删除指定文件名的所有相关数据，返回删除的文档块数量"""
+        return self._delete_documents([filename])
     
-    def _delete_document_by_filename(self, filename: str):
-        """删除指定文件名的所有相关数据"""
+    def _delete_documents(self, filenames: List[str]) -> int:
+        """从ChromaDB、关键词索引和文档注册表中删除多个文件的全部数据，返回删除的文档块数量"""
         try:
-            # 获取所有相关ID
-            existing_ids = self._get_document_ids_by_filename(filename)
+            chunk_ids = []
+            for filename in filenames:
+                chunk_ids.extend(self._get_document_ids_by_filename(filename))
             
-            if existing_ids:
-                # 从ChromaDB删除
-                self.collection.delete(ids=existing_ids)
-                
-                # 从docstore删除
-                for doc_id in existing_ids:
-                    if self.index.docstore.document_exists(doc_id):
-                        self.index.docstore.delete_document(doc_id)
-                
-                logger.info(f"删除文件 {filename} 的 {len(existing_ids)} 个文档块")
+            self._delete_chunks(chunk_ids)
+            self.registry.remove(filenames)
+            self._invalidate_answers(filenames)
+            
+            if chunk_ids:
+                logger.info(f"删除 {len(filenames)} 个文件的 {len(chunk_ids)} 个文档块")
+            return len(chunk_ids)
                 
         except Exception as e:
             logger.error(f"删除文档失败: {e}")
             raise
     
-    def _process_single_file(self, file_path: Path, custom_filename: str = None):
-        """处理单个文件，添加到索引中"""
-        try:
-            # 读取文档
-            reader = SimpleDirectoryReader(
-                input_files=[str(file_path)]
-            )
-            documents = reader.load_data()
-
-            if not documents:
-                logger.warning(f"文件为空或读取失败: {file_path}")
-                return
-
-            # 使用自定义文件名或原文件名
-            filename = custom_filename or file_path.name
-
-            # 为文档添加元数据
-            for doc in documents:
-                doc.metadata.update({
-                    "filename": filename,
-                    "file_path": str(file_path),
-                    "file_size": file_path.stat().st_size,
-                    "file_modified": str(file_path.stat().st_mtime)
-                })
+    def _delete_chunks(self, chunk_ids: List[str], batch_size: int = 5000):
+        """按块ID从ChromaDB和关键词索引中分批删除"""
+        for i in range(0, len(chunk_ids), batch_size):
+            batch = chunk_ids[i:i + batch_size]
+            self.collection.delete(ids=batch)
+            self.keyword_index.delete(batch)
+    
+    def _ingest_files(
+        self,
+        files: List[Tuple[Path, str]],
+        progress: Optional[ProgressCallback] = None,
+        text_splitter: Optional[TextSplitter] = None
+    ) -> Dict[str, int]:
+        """
+        通过批量写入管线处理文件，返回成功处理的每个文件的文档块数量
+        处理失败的文件会清除已写入的部分数据；写入中途出错（如嵌入接口或Chroma报错）时，
+        同样清除尚未全部写入的文件，下次同步会重新处理；text_splitter 未指定时使用默认分块器
+        """
+        completed = set()
 
-            # 添加到索引
-            for doc in documents:
-                self.index.insert(doc)
+        def track(filename: str, update: Dict[str, Any]):
+            if update.get("status") == "done":
+                completed.add(filename)
+            if progress is not None:
+                progress(filename, update)
 
-            logger.info(f"成功处理文件: {filename}")
+        try:
+            chunk_counts = self.ingestion.run(files, track, text_splitter)
+            self._invalidate_answers(filename for _, filename in files)
+            for _, filename in files:
+                if filename not in chunk_counts:
+                    self._delete_document_by_filename(filename)
+            for filename, count in chunk_counts.items():
+                logger.info(f"成功处理文件: {filename}, 块数: {count}")
+            return chunk_counts
 
         except Exception as e:
-            logger.error(f"处理文件失败 {file_path}: {e}")
+            logger.error(f"处理文件失败: {e}")
+            self._invalidate_answers(filename for _, filename in files)
+            for _, filename in files:
+                if filename in completed:
+                    continue
+                try:
+                    self._delete_document_by_filename(filename)
+                except Exception as cleanup_error:
+                    logger.warning(f"清除未写完的文件数据失败 {filename}: {cleanup_error}")
             raise
     
-    def query(self, question: str, max_results: int = 5) -> Dict[str, Any]:
+    def query(self, question: str, max_results: int = 5,
+              similarity_threshold: Optional[float] = None,
+              filters: Optional[Dict[str, Any]] = None,
+              debug_timings: bool = False) -> Dict[str, Any]:
         """
         执行混合检索查询
+        similarity_threshold 为向量相似度下限，未指定时使用配置值
+        filters 为元数据筛选条件：filenames（文件名列表）、filename_prefix（文件名前缀）、
+        modified_after / modified_before（修改时间戳范围），只在符合条件的文件中检索
+        debug_timings 为真时在结果中附带本次查询的计时区间树
         """
         if not self.query_engine:
             return {
@@ -305,110 +760,345 @@ class RAGService:
                 "sources": []
             }
         
+        self._sync_generation()
+        trace = tracing.start_trace("query", max_results=max_results)
         try:
-            # 执行查询
-            response = self.query_engine.query(question)
-            
-            # 提取源文档信息
-            sources = []
-            if hasattr(response, 'source_nodes') and response.source_nodes:
-                for node in response.source_nodes[:max_results]:
-                    sources.append({
-                        "filename": node.metadata.get("filename", "未知"),
-                        "content": node.text[:200] + "..." if len(node.text) > 200 else node.text,
-                        "score": getattr(node, 'score', 0.0)
-                    })
-            
-            return {
-                "success": True,
-                "answer": str(response),
-                "sources": sources,
-                "total_sources": len(sources)
-            }
-            
+            with tracing.activate(trace):
+                result = self._run_query(question, max_results, similarity_threshold, filters)
+            trace.attributes["cached"] = result.get("cached", False)
         except Exception as e:
             logger.error(f"查询失败: {e}")
-            return {
+            trace.attributes["error"] = str(e)
+            result = {
                 "success": False,
                 "message": f"查询失败: {str(e)}",
                 "answer": "",
                 "sources": []
             }
+        finally:
+            tracing.finish_trace(trace)
+        
+        if debug_timings:
+            result["debug_timings"] = trace.to_dict()
+        return result
     
-    def get_status(self) -> Dict[str, Any]:
-        """获取系统状态"""
+    def _run_query(self, question: str, max_results: int,
+                   similarity_threshold: Optional[float],
+                   filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """查询主体，各阶段记录为当前追踪的子区间"""
+        if similarity_threshold is None:
+            similarity_threshold = settings.similarity_threshold
+        
+        # 先查问答缓存，命中时不调用LLM；记下缓存版本，检索期间文档变更时不缓存本次回答
+        cache_params = (max_results, similarity_threshold, self._filter_key(filters))
+        cache_version = self._answer_cache_version()
+        query_bundle = self._make_query_bundle(question)
+        with tracing.span("answer_cache"):
+            cached = self._get_cached_answer(query_bundle, cache_params)
+        if cached is not None:
+            return cached
+        
+        # 执行查询：检索不占用LLM并发额度，生成回答时受限
+        query_engine = self.query_engine
+        self._embed_query(query_bundle)
+        nodes = self._retrieve_nodes(query_bundle, max_results, similarity_threshold, filters)
+        if not nodes:
+            return {"success": True, "answer": NO_CONTEXT_ANSWER, "sources": [], "total_sources": 0}
+        context = self._prepare_context(nodes)
+        with tracing.span("synthesize", nodes=len(context)), self._llm_semaphore, \
+                metrics.LLM_IN_FLIGHT.track_in_progress(), metrics.stage_timer("llm_synthesis"):
+            response = query_engine.synthesize(query_bundle, context)
+        
+        # 提取源文档信息
+        with tracing.span("postprocess"):
+            sources = self._format_sources(nodes, max_results)
+            
+            result = {
+                "success": True,
+                "answer": str(response),
+                "sources": sources,
+                "total_sources": len(sources)
+            }
+            self._put_cached_answer(query_bundle, cache_params, result, nodes, cache_version)
+        return result
+    
+    def stream_query(self, question: str, max_results: int = 5,
+                     similarity_threshold: Optional[float] = None,
+                     filters: Optional[Dict[str, Any]] = None,
+                     debug_timings: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        流式查询：先返回检索到的来源，再逐段返回回答文本
+        依次产出 sources / token / done 事件，出错时产出 error 事件
+        debug_timings 为真时 done 事件附带本次查询的计时区间树
+        """
+        if not self.query_engine:
+            yield {"event": "error", "data": {"message": "查询引擎未初始化"}}
+            return
+        
+        self._sync_generation()
+        if similarity_threshold is None:
+            similarity_threshold = settings.similarity_threshold
+        
+        # 生成器每次恢复可能处于不同的上下文，只在不跨越yield的代码段内激活追踪
+        trace = tracing.start_trace("stream_query", max_results=max_results)
         try:
-            doc_count = self.collection.count() if self.collection else 0
+            cache_params = (max_results, similarity_threshold, self._filter_key(filters))
+            cache_version = self._answer_cache_version()
+            with tracing.activate(trace):
+                query_bundle = self._make_query_bundle(question)
+                with tracing.span("answer_cache"):
+                    cached = self._get_cached_answer(query_bundle, cache_params)
+            if cached is not None:
+                trace.attributes["cached"] = True
+                yield {
+                    "event": "sources",
+                    "data": {"sources": cached["sources"], "total_sources": cached["total_sources"]}
+                }
+                yield {"event": "token", "data": {"text": cached["answer"]}}
+                trace.finish()
+                yield {"event": "done", "data": self._done_data(True, trace, debug_timings)}
+                return
+            
+            with tracing.activate(trace):
+                self._embed_query(query_bundle)
+                nodes = self._retrieve_nodes(
+                    query_bundle, max_results, similarity_threshold, filters
+                )
+                sources = self._format_sources(nodes, max_results)
+                context = self._prepare_context(nodes)
+            yield {
+                "event": "sources",
+                "data": {"sources": sources, "total_sources": len(sources)}
+            }
+            if not nodes:
+                yield {"event": "token", "data": {"text": NO_CONTEXT_ANSWER}}
+                trace.attributes["cached"] = False
+                trace.finish()
+                yield {"event": "done", "data": self._done_data(False, trace, debug_timings)}
+                return
+            
+            answer_parts = []
+            synthesize_span = trace.child("synthesize", nodes=len(context))
+            with self._llm_semaphore, metrics.LLM_IN_FLIGHT.track_in_progress(), \
+                    metrics.stage_timer("llm_synthesis"):
+                with tracing.activate(synthesize_span):
+                    response = self.streaming_synthesizer.synthesize(query_bundle, context)
+                for text in response.response_gen:
+                    answer_parts.append(text)
+                    yield {"event": "token", "data": {"text": text}}
+            synthesize_span.finish()
+            
+            with tracing.activate(trace), tracing.span("postprocess"):
+                self._put_cached_answer(query_bundle, cache_params, {
+                    "success": True,
+                    "answer": "".join(answer_parts),
+                    "sources": sources,
+                    "total_sources": len(sources)
+                }, nodes, cache_version)
+            trace.attributes["cached"] = False
+            trace.finish()
+            yield {"event": "done", "data": self._done_data(False, trace, debug_timings)}
+            
+        except Exception as e:
+            logger.error(f"流式查询失败: {e}")
+            trace.attributes["error"] = str(e)
+            yield {"event": "error", "data": {"message": f"查询失败: {str(e)}"}}
+        finally:
+            tracing.finish_trace(trace)
+    
+    @staticmethod
+    def _done_data(cached: bool, trace: "tracing.Span", debug_timings: bool) -> Dict[str, Any]:
+        """流式查询 done 事件的数据"""
+        data: Dict[str, Any] = {"cached": cached}
+        if debug_timings:
+            data["debug_timings"] = trace.to_dict()
+        return data
+    
+    def _make_query_bundle(self, question: str) -> QueryBundle:
+        """构造查询；启用语义缓存时预先计算问题向量，检索时复用"""
+        query_bundle = QueryBundle(question)
+        if self.answer_cache is not None and self.answer_cache.semantic_enabled:
+            self._embed_query(query_bundle)
+        return query_bundle
+    
+    def _embed_query(self, query_bundle: QueryBundle):
+        """需要向量检索且尚未计算时，计算问题向量（单独计时，检索时复用）"""
+        if query_bundle.embedding is not None:
+            return
+        if settings.retrieval_mode == "keyword" and not (
+            self.answer_cache is not None and self.answer_cache.semantic_enabled
+        ):
+            return
+        with tracing.span("query_embedding"), metrics.stage_timer("query_embedding"):
+            query_bundle.embedding = Settings.embed_model.get_query_embedding(query_bundle.query_str)
+    
+    def _get_cached_answer(self, query_bundle: QueryBundle, params) -> Optional[Dict[str, Any]]:
+        """查询问答缓存，命中时返回带cached标记的结果副本"""
+        if self.answer_cache is None:
+            return None
+        cached = self.answer_cache.get(query_bundle.query_str, params, query_bundle.embedding)
+        metrics.record_cache("answer", cached is not None)
+        if cached is None:
+            return None
+        return {**cached, "cached": True}
+    
+    def _answer_cache_version(self) -> Optional[int]:
+        """检索前读取问答缓存的失效版本号"""
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.version
+    
+    def _put_cached_answer(self, query_bundle: QueryBundle, params, result: Dict[str, Any], nodes,
+                           version: Optional[int]):
+        """缓存回答，并记录其引用的文件用于失效；检索后发生过失效（version 已变化）时不缓存"""
+        if self.answer_cache is None:
+            return
+        filenames = {node.metadata.get("filename", "") for node in nodes}
+        self.answer_cache.put(
+            query_bundle.query_str, params, result,
+            filenames=filenames, embedding=query_bundle.embedding, version=version
+        )
+    
+    def _invalidate_answers(self, filenames):
+        """文件内容变化后，使引用它们的缓存回答失效"""
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_files(filenames)
+    
+    @staticmethod
+    def _format_sources(nodes, max_results: int) -> List[Dict[str, Any]]:
+        """提取源文档信息"""
+        sources = []
+        for node in (nodes or [])[:max_results]:
+            sources.append({
+                "filename": node.metadata.get("filename", "未知"),
+                "content": node.text[:200] + "..." if len(node.text) > 200 else node.text,
+                "score": getattr(node, 'score', 0.0)
+            })
+        return sources
+    
+    def _sync_generation(self):
+        """存储代数变化（其他工作进程写入过）时重新加载存储，失败时继续使用当前状态"""
+        if self.coordinator.generation() == self._generation:
+            return
+        with self._reload_lock:
+            generation = self.coordinator.generation()
+            if generation == self._generation:
+                return
+            logger.info(f"检测到其他工作进程的写入（代数 {self._generation} -> {generation}），重新加载存储")
+            try:
+                self._reload_storage()
+                self._generation = generation
+            except Exception as e:
+                logger.error(f"重新加载存储失败: {e}")
 
-            # 计算存储大小
-            storage_path = Path(settings.chroma_persist_directory)
-            storage_size = 0
-            if storage_path.exists():
-                for file_path in storage_path.rglob("*"):
-                    if file_path.is_file():
-                        storage_size += file_path.stat().st_size
+    def _reload_storage(self):
+        """
+        重新打开Chroma并重建查询引擎：embedded 模式的客户端在进程内缓存向量索引，看不到其他进程的写入
+        （http 模式下索引由服务端统一维护，只重新获取集合）；
+        关键词索引和文档注册表为SQLite，其他进程提交的数据直接可见，只需清空问答缓存和刷新计数
+        进行中的查询继续使用旧的客户端和引擎，最后一个查询结束后关闭旧客户端（见 _chroma_lease）
+        """
+        previous_client = self.chroma_client
+        self._setup_chroma(refresh=True)
+        self.ingestion.collection = self.collection
+        self._load_or_create_index()
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+        self._refresh_counters()
+        if previous_client is not None and previous_client is not self.chroma_client:
+            # 旧客户端的向量索引仍占用内存：没有查询在用时立即关闭，否则等最后一个查询结束
+            if self._client_leases.get(id(previous_client)):
+                self._retired_clients[id(previous_client)] = previous_client
+            else:
+                close_chroma_client(previous_client)
 
-            storage_size_mb = storage_size / (1024 * 1024)
+    @contextmanager
+    def _chroma_lease(self) -> Iterator[None]:
+        """
+        检索期间登记正在使用当前Chroma客户端；重新加载存储时持有 _reload_lock，
+        登记之后读到的索引和集合一定属于已登记的客户端或更新的客户端
+        """
+        with self._reload_lock:
+            client = self.chroma_client
+            key = id(client)
+            self._client_leases[key] = self._client_leases.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            retired = None
+            with self._reload_lock:
+                self._client_leases[key] -= 1
+                if not self._client_leases[key]:
+                    del self._client_leases[key]
+                    retired = self._retired_clients.pop(key, None)
+            if retired is not None:
+                close_chroma_client(retired)
 
-            return {
-                "status": "ok",
-                "documents_count": doc_count,
-                "storage_size": f"{storage_size_mb:.2f}MB",
-                "collection_name": settings.collection_name,
-                "data_directory": settings.data_dir
+    def _refresh_counters(self):
+        """从文档注册表刷新文档块和文件数量，并请求后台重新统计存储大小"""
+        self._counters_generation = self.coordinator.generation()
+        try:
+            self._counters = {
+                "chunks": self.registry.chunk_count(),
+                "files": self.registry.document_count()
             }
-
         except Exception as e:
-            logger.error(f"获取状态失败: {e}")
-            return {
-                "status": "error",
-                "message": str(e)
-            }
+            logger.warning(f"刷新状态计数失败: {e}")
+        if self.storage_monitor is not None:
+            self.storage_monitor.request_refresh()
 
-    def get_documents_list(self) -> Dict[str, Any]:
-        """获取所有文档列表"""
-        try:
-            if not self.collection:
-                return {
-                    "success": False,
-                    "message": "集合未初始化",
-                    "documents": []
-                }
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取系统状态（读取内存中的计数，只在其他工作进程写入后重新统计）
+        每次都会读取写入代数文件，重新统计时还要查询注册表，需在线程池中调用
+        """
+        if self.coordinator.generation() != self._counters_generation:
+            self._refresh_counters()
+        counters = self._counters
+        monitor = self.storage_monitor
+        storage_bytes = monitor.size_bytes if monitor else 0
+        updated_at = monitor.updated_at if monitor else None
 
-            # 获取所有文档的元数据
-            result = self.collection.get(include=["metadatas"])
+        return {
+            "status": "ok",
+            "documents_count": counters["chunks"],
+            "files_count": counters["files"],
+            "storage_size": f"{storage_bytes / (1024 * 1024):.2f}MB",
+            "storage_bytes": storage_bytes,
+            "last_updated": datetime.fromtimestamp(updated_at).isoformat() if updated_at else None,
+            "collection_name": settings.collection_name,
+            "data_directory": settings.data_dir
+        }
 
-            if not result["ids"]:
+    def get_documents_list(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        sort: str = "name",
+        order: str = "asc",
+        prefix: str = ""
+    ) -> Dict[str, Any]:
+        """分页获取文档列表，直接读取文档注册表中按文件维护的汇总信息"""
+        try:
+            if not self.registry:
                 return {
-                    "success": True,
-                    "message": "暂无文档",
+                    "success": False,
+                    "message": "文档注册表未初始化",
                     "documents": []
                 }
 
-            # 按文件名分组统计
-            file_stats = {}
-            for i, _ in enumerate(result["ids"]):
-                metadata = result["metadatas"][i] if result["metadatas"] else {}
-                filename = metadata.get("filename", "未知文件")
-
-                if filename not in file_stats:
-                    file_stats[filename] = {
-                        "filename": filename,
-                        "chunks_count": 0,
-                        "file_size": metadata.get("file_size", 0),
-                        "file_modified": metadata.get("file_modified", ""),
-                        "file_path": metadata.get("file_path", "")
-                    }
-
-                file_stats[filename]["chunks_count"] += 1
-
-            documents = list(file_stats.values())
+            documents, total = self.registry.list_documents(
+                offset=offset, limit=limit, sort=sort, order=order, prefix=prefix
+            )
 
             return {
                 "success": True,
-                "message": f"找到 {len(documents)} 个文档",
+                "message": f"找到 {total} 个文档" if total else "暂无文档",
                 "documents": documents,
-                "total_chunks": len(result["ids"])
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "total_chunks": self.registry.chunk_count()
             }
 
         except Exception as e:
@@ -419,19 +1109,44 @@ class RAGService:
                 "documents": []
             }
 
+    @write_operation
     def upload_document(self, file_content: str, filename: str) -> Dict[str, Any]:
         """上传单个文档"""
+        def save(file_path: Path):
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(file_content)
+
+        return self._store_and_ingest(filename, save)
+
+    @write_operation
+    def upload_file(
+        self,
+        source_path: Path,
+        filename: str,
+        progress: Optional[ProgressCallback] = None,
+        text_splitter: Optional[TextSplitter] = None
+    ) -> Dict[str, Any]:
+        """
+        上传已流式写入磁盘的文档（位于data目录下的临时文件），移动到目标位置后处理
+        text_splitter 为本次上传使用的分块器（见 make_text_splitter），未指定时使用默认分块器
+        """
+        return self._store_and_ingest(
+            filename, lambda file_path: os.replace(source_path, file_path), progress, text_splitter
+        )
+
+    def _store_and_ingest(
+        self,
+        filename: str,
+        save: Callable[[Path], None],
+        progress: Optional[ProgressCallback] = None,
+        text_splitter: Optional[TextSplitter] = None
+    ) -> Dict[str, Any]:
+        """替换同名文档：删除旧数据，保存新文件到data目录并写入索引"""
         try:
-            # 检查文件名是否已存在
-            existing_ids = self._get_document_ids_by_filename(filename)
-            replaced = False
-            old_chunks_count = 0
-
-            if existing_ids:
-                # 删除旧文件的所有相关数据
-                old_chunks_count = len(existing_ids)
-                self._delete_document_by_filename(filename)
-                replaced = True
+            # 同名文件已存在时删除旧文件的所有相关数据
+            old_chunks_count = self._delete_document_by_filename(filename)
+            replaced = old_chunks_count > 0
+            if replaced:
                 logger.info(f"删除同名文件的旧数据: {filename}, 块数: {old_chunks_count}")
 
             # 确保data目录存在
@@ -440,20 +1155,15 @@ class RAGService:
 
             # 保存文件到data目录
             file_path = data_path / filename
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(file_content)
+            save(file_path)
 
             logger.info(f"文件已保存到: {file_path}")
 
             # 处理文件
-            self._process_single_file(file_path)
-
-            # 获取新的块数量
-            new_ids = self._get_document_ids_by_filename(filename)
-            new_chunks_count = len(new_ids)
-
-            # 重新创建查询引擎
-            self._create_query_engine()
+            chunk_counts = self._ingest_files([(file_path, filename)], progress, text_splitter)
+            if filename not in chunk_counts:
+                raise ValueError(f"文件处理失败: {filename}")
+            new_chunks_count = chunk_counts.get(filename, 0)
 
             return {
                 "success": True,
@@ -474,13 +1184,136 @@ class RAGService:
                 "filename": filename
             }
 
+    @write_operation
+    def upload_files(
+        self,
+        files: List[Tuple[Path, str]],
+        progress: Optional[ProgressCallback] = None,
+        text_splitter: Optional[TextSplitter] = None
+    ) -> Dict[str, Any]:
+        """
+        批量上传已流式写入磁盘的文档（data目录下的临时文件）
+        旧数据一次性删除，所有文件在同一次写入管线中分块、嵌入和写入
+        text_splitter 为本批文件使用的分块器，未指定时使用默认分块器
+        """
+        try:
+            # 同一批次中的同名文件以最后一个为准
+            latest: Dict[str, Path] = {}
+            for source_path, filename in files:
+                latest[filename] = source_path
+            if not latest:
+                return {
+                    "success": False,
+                    "message": "没有可上传的TXT文件",
+                    "uploaded": [],
+                    "failed": []
+                }
+
+            filenames = list(latest)
+            old_chunks = {
+                filename: (self.registry.get(filename) or {}).get("chunks_count", 0)
+                for filename in filenames
+            }
+            self._delete_documents(filenames)
+
+            data_path = Path(settings.data_dir)
+            data_path.mkdir(exist_ok=True)
+            pending = []
+            for filename, source_path in latest.items():
+                file_path = data_path / filename
+                os.replace(source_path, file_path)
+                pending.append((file_path, filename))
+
+            chunk_counts = self._ingest_files(pending, progress, text_splitter)
+
+            uploaded = []
+            failed = []
+            for filename in filenames:
+                if filename not in chunk_counts:
+                    failed.append({"filename": filename, "error": "文件处理失败"})
+                    continue
+                uploaded.append({
+                    "filename": filename,
+                    "replaced": old_chunks[filename] > 0,
+                    "old_chunks": old_chunks[filename],
+                    "new_chunks": chunk_counts[filename]
+                })
+
+            logger.info(f"批量上传完成: 成功 {len(uploaded)} 个，失败 {len(failed)} 个")
+            return {
+                "success": True,
+                "message": f"批量上传完成: 成功 {len(uploaded)} 个，失败 {len(failed)} 个",
+                "uploaded": uploaded,
+                "failed": failed,
+                "total_chunks": self.registry.chunk_count()
+            }
+
+        except Exception as e:
+            logger.error(f"批量上传失败: {e}")
+            return {
+                "success": False,
+                "message": f"批量上传失败: {str(e)}",
+                "uploaded": [],
+                "failed": []
+            }
+
+    @write_operation
+    def delete_documents(
+        self, filenames: Optional[List[str]] = None, pattern: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """批量删除文档：按文件名列表和/或通配符匹配，一次性从所有存储中删除"""
+        try:
+            targets = []
+            missing_files = []
+            for filename in filenames or []:
+                if self.registry.get(filename) is None:
+                    missing_files.append(filename)
+                elif filename not in targets:
+                    targets.append(filename)
+            if pattern:
+                targets.extend(name for name in self.registry.match(pattern) if name not in targets)
+
+            if not targets:
+                return {
+                    "success": False,
+                    "message": "没有匹配的文档",
+                    "deleted_files": [],
+                    "missing_files": missing_files
+                }
+
+            deleted_chunks = self._delete_documents(targets)
+
+            # 删除data目录中的文件
+            data_path = Path(settings.data_dir)
+            for filename in targets:
+                try:
+                    (data_path / filename).unlink(missing_ok=True)
+                except Exception as e:
+                    logger.warning(f"删除磁盘文件失败 {filename}: {e}")
+
+            return {
+                "success": True,
+                "message": f"批量删除完成: 删除 {len(targets)} 个文档，{deleted_chunks} 个文档块",
+                "deleted_files": targets,
+                "missing_files": missing_files,
+                "deleted_chunks": deleted_chunks,
+                "total_chunks": self.registry.chunk_count()
+            }
+
+        except Exception as e:
+            logger.error(f"批量删除失败: {e}")
+            return {
+                "success": False,
+                "message": f"批量删除失败: {str(e)}",
+                "deleted_files": [],
+                "missing_files": []
+            }
+
+    @write_operation
     def delete_document(self, filename: str) -> Dict[str, Any]:
         """删除指定文档"""
         try:
-            # 获取文档ID
-            existing_ids = self._get_document_ids_by_filename(filename)
-
-            if not existing_ids:
+            if self.registry.get(filename) is None:
                 return {
                     "success": False,
                     "message": f"文档不存在: {filename}",
@@ -488,8 +1321,7 @@ class RAGService:
                 }
 
             # 删除数据库中的文档
-            chunks_count = len(existing_ids)
-            self._delete_document_by_filename(filename)
+            chunks_count = self._delete_document_by_filename(filename)
 
             # 删除data目录中的文件
             data_path = Path(settings.data_dir)
@@ -504,9 +1336,6 @@ class RAGService:
                 except Exception as e:
                     logger.warning(f"删除磁盘文件失败: {e}")
 
-            # 重新创建查询引擎
-            self._create_query_engine()
-
             message = f"文档删除成功: {filename}"
             if file_deleted_from_disk:
                 message += " (包括磁盘文件)"
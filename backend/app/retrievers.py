@@ -0,0 +1,164 @@
+"""
+检索器
+关键词检索器（基于持久化BM25索引）与向量/关键词混合检索器，
+以及相似度阈值过滤和（融合前按各路分数的）自适应top-k截断
+"""
+import logging
+from typing import Collection, Dict, List, Optional, Sequence
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+from backend.app import metrics, tracing
+from backend.app.keyword_index import KeywordIndex
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[List[NodeWithScore]], k: int = 60
+) -> List[NodeWithScore]:
+    """
+    倒数排名融合（RRF）：score = Σ 1 / (k + rank)
+    分数按各路均排第一时的最大值归一化到 [0, 1]
+    """
+    fused_scores: Dict[str, float] = {}
+    nodes: Dict[str, NodeWithScore] = {}
+    for results in result_lists:
+        for rank, node_with_score in enumerate(results):
+            node_id = node_with_score.node.node_id
+            fused_scores[node_id] = fused_scores.get(node_id, 0.0) + 1.0 / (k + rank + 1)
+            nodes.setdefault(node_id, node_with_score)
+
+    max_score = len(result_lists) / (k + 1) or 1.0
+    ranked_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)
+    return [
+        NodeWithScore(node=nodes[node_id].node, score=fused_scores[node_id] / max_score)
+        for node_id in ranked_ids
+    ]
+
+
+def adaptive_top_k(
+    nodes: List[NodeWithScore], max_results: int, drop_ratio: float, min_results: int = 1
+) -> List[NodeWithScore]:
+    """
+    自适应top-k：先按 max_results 截断，再在分数相对前一个骤降
+    （低于前一个的 drop_ratio 倍）处丢弃其后的长尾；drop_ratio 为0时不做自适应截断
+    """
+    selected = nodes[:max_results]
+    if drop_ratio <= 0:
+        return selected
+    for i in range(max(min_results, 1), len(selected)):
+        previous = selected[i - 1].score or 0.0
+        if previous > 0 and (selected[i].score or 0.0) < previous * drop_ratio:
+            return selected[:i]
+    return selected
+
+
+class SimilarityCutoffRetriever(BaseRetriever):
+    """包装向量检索器，丢弃相似度低于阈值的结果"""
+
+    def __init__(self, retriever: BaseRetriever, similarity_cutoff: float):
+        super().__init__()
+        self._retriever = retriever
+        self._similarity_cutoff = similarity_cutoff
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return [
+            node for node in self._retriever.retrieve(query_bundle)
+            if (node.score or 0.0) >= self._similarity_cutoff
+        ]
+
+
+class AdaptiveTopKRetriever(BaseRetriever):
+    """
+    包装单路检索器，按该路自身的相关性分数（向量相似度或BM25分数）做自适应top-k截断
+    需在RRF融合之前应用：融合后的分数只反映排名，不能据此判断相关性骤降
+    """
+
+    def __init__(self, retriever: BaseRetriever, drop_ratio: float,
+                 max_results: Optional[int] = None):
+        super().__init__()
+        self._retriever = retriever
+        self._drop_ratio = drop_ratio
+        self._max_results = max_results
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        nodes = self._retriever.retrieve(query_bundle)
+        max_results = self._max_results if self._max_results is not None else len(nodes)
+        return adaptive_top_k(nodes, max_results, self._drop_ratio)
+
+
+class TimedRetriever(BaseRetriever):
+    """包装检索器，将检索耗时记录为指定阶段的指标"""
+
+    def __init__(self, retriever: BaseRetriever, stage: str):
+        super().__init__()
+        self._retriever = retriever
+        self._stage = stage
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        with tracing.span(self._stage), metrics.stage_timer(self._stage):
+            return self._retriever.retrieve(query_bundle)
+
+
+class KeywordRetriever(BaseRetriever):
+    """基于持久化BM25索引的关键词检索器，文本从Chroma按ID取回"""
+
+    def __init__(self, keyword_index: KeywordIndex, collection, similarity_top_k: int = 5,
+                 filenames: Optional[Collection[str]] = None):
+        super().__init__()
+        self._keyword_index = keyword_index
+        self._collection = collection
+        self._similarity_top_k = similarity_top_k
+        self._filenames = filenames
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        hits = self._keyword_index.search(
+            query_bundle.query_str, top_k=self._similarity_top_k, filenames=self._filenames
+        )
+        if not hits:
+            return []
+
+        result = self._collection.get(
+            ids=[chunk_id for chunk_id, _ in hits],
+            include=["documents", "metadatas"]
+        )
+        nodes_by_id = {}
+        for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"]):
+            try:
+                node = metadata_dict_to_node(metadata)
+                node.set_content(text)
+            except Exception:
+                node = TextNode(id_=chunk_id, text=text, metadata=metadata or {})
+            nodes_by_id[chunk_id] = node
+
+        return [
+            NodeWithScore(node=nodes_by_id[chunk_id], score=score)
+            for chunk_id, score in hits
+            if chunk_id in nodes_by_id
+        ]
+
+
+class HybridRetriever(BaseRetriever):
+    """向量检索与关键词检索的RRF融合检索器"""
+
+    def __init__(
+        self,
+        vector_retriever: BaseRetriever,
+        keyword_retriever: BaseRetriever,
+        similarity_top_k: int = 5,
+        rrf_k: int = 60
+    ):
+        super().__init__()
+        self._vector_retriever = vector_retriever
+        self._keyword_retriever = keyword_retriever
+        self._similarity_top_k = similarity_top_k
+        self._rrf_k = rrf_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        vector_nodes = self._vector_retriever.retrieve(query_bundle)
+        keyword_nodes = self._keyword_retriever.retrieve(query_bundle)
+        fused = reciprocal_rank_fusion([vector_nodes, keyword_nodes], k=self._rrf_k)
+        return fused[:self._similarity_top_k]
@@ -0,0 +1,74 @@
+"""
+存储占用统计
+在后台线程中按固定间隔统计目录占用空间，状态接口直接读取内存中的最近结果；
+写操作完成后可请求提前刷新
+"""
+import os
+import threading
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def directory_size(path: str) -> int:
+    """递归统计目录下所有文件的字节数"""
+    total = 0
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        # 统计期间文件被删除
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+class StorageMonitor:
+    """后台定期统计存储目录大小"""
+
+    def __init__(self, path: str, interval: float = 60.0):
+        self.path = path
+        self.interval = interval
+        self.size_bytes = 0
+        self.updated_at: Optional[float] = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="storage-monitor", daemon=True)
+        self._thread.start()
+
+    def request_refresh(self):
+        """请求尽快重新统计（如写操作之后）"""
+        self._wake.set()
+
+    def refresh(self):
+        """立即统计一次"""
+        started = time.time()
+        self.size_bytes = directory_size(self.path)
+        self.updated_at = time.time()
+        logger.debug(f"存储统计完成: {self.size_bytes} 字节，耗时 {self.updated_at - started:.3f}s")
+
+    def stop(self):
+        """停止后台统计线程"""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"存储统计失败: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,258 @@
+"""
+请求级追踪
+每次查询记录一棵嵌套的计时区间树：检索、每次嵌入调用、合成器发出的每次LLM调用、后处理等，
+结束后交给导出器（如写入本地JSONL文件），也可以在查询响应中直接返回
+"""
+import json
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.embedding import (
+    EmbeddingEndEvent,
+    EmbeddingStartEvent,
+)
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """一个计时区间"""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.children: List["Span"] = []
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+
+    def child(self, name: str, **attributes: Any) -> "Span":
+        span = Span(name, parent=self, attributes=attributes)
+        self.children.append(span)
+        return span
+
+    def finish(self):
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self._end is None:
+            return None
+        return (self._end - self._start) * 1000
+
+    def walk(self) -> Iterator["Span"]:
+        """深度优先遍历自身和所有子区间"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        """嵌套结构，offset_ms 为相对根区间开始的偏移"""
+        origin = self._start if origin is None else origin
+        duration = self.duration_ms
+        return {
+            "name": self.name,
+            "offset_ms": round((self._start - origin) * 1000, 3),
+            "duration_ms": round(duration, 3) if duration is not None else None,
+            "attributes": self.attributes,
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+    def to_record(self) -> Dict[str, Any]:
+        """导出用的扁平记录"""
+        duration = self.duration_ms
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(duration, 3) if duration is not None else None,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("rag_current_span", default=None)
+
+Exporter = Callable[[Span], None]
+_exporters: List[Exporter] = []
+
+
+def start_trace(name: str, **attributes: Any) -> Span:
+    """开始一次请求的追踪，返回根区间"""
+    return Span(name, attributes=attributes)
+
+
+@contextmanager
+def activate(span: Span) -> Iterator[Span]:
+    """将区间设为当前区间，期间创建的子区间挂在它下面"""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """在当前区间下记录一个子区间；没有进行中的追踪时不做任何事"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, **attributes)
+    try:
+        with activate(child):
+            yield child
+    finally:
+        child.finish()
+
+
+def finish_trace(root: Span):
+    """结束追踪并交给导出器"""
+    root.finish()
+    _handler.discard(root.trace_id)
+    for exporter in list(_exporters):
+        try:
+            exporter(root)
+        except Exception as e:
+            logger.warning(f"导出追踪失败: {e}")
+
+
+class JsonlExporter:
+    """每个区间一行JSON，追加写入本地文件"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __call__(self, root: Span):
+        lines = "".join(
+            json.dumps(span.to_record(), ensure_ascii=False) + "\n" for span in root.walk()
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def add_exporter(exporter: Exporter):
+    """注册导出器（如发送到追踪收集服务的函数）"""
+    _exporters.append(exporter)
+
+
+def configure(export_file: str = ""):
+    """按配置重置导出器：export_file 非空时写入本地JSONL文件"""
+    _exporters.clear()
+    if export_file:
+        add_exporter(JsonlExporter(export_file))
+        logger.info(f"查询追踪写入: {export_file}")
+
+
+class TraceEventHandler(BaseEventHandler):
+    """
+    将LlamaIndex的嵌入和LLM调用事件记录为当前追踪的子区间
+    开始/结束事件按LlamaIndex的span_id配对；流式LLM的结束事件在生成器耗尽时才到达，
+    可能已不在原来的上下文中，因此开始时就确定父区间
+    """
+
+    chat_model: bool = True
+    _pending: Dict[Tuple[Optional[str], str], List[Span]] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TraceEventHandler"
+
+    def _kind(self, event: BaseEvent) -> Optional[Tuple[str, bool]]:
+        """返回 (区间名, 是否为开始事件)；聊天模型只记chat事件，补全模型只记completion事件"""
+        if isinstance(event, EmbeddingStartEvent):
+            return "embedding", True
+        if isinstance(event, EmbeddingEndEvent):
+            return "embedding", False
+        if self.chat_model:
+            if isinstance(event, LLMChatStartEvent):
+                return "llm", True
+            if isinstance(event, LLMChatEndEvent):
+                return "llm", False
+        else:
+            if isinstance(event, LLMCompletionStartEvent):
+                return "llm", True
+            if isinstance(event, LLMCompletionEndEvent):
+                return "llm", False
+        return None
+
+    def handle(self, event: BaseEvent, **kwargs: Any):
+        kind = self._kind(event)
+        if kind is None:
+            return
+        name, is_start = kind
+        key = (event.span_id, name)
+
+        if is_start:
+            parent = _current_span.get()
+            if parent is None:
+                return
+            with self._lock:
+                self._pending.setdefault(key, []).append(parent.child(name))
+            return
+
+        with self._lock:
+            stack = self._pending.get(key)
+            if not stack:
+                return
+            span = stack.pop()
+            if not stack:
+                del self._pending[key]
+        span.finish()
+        if isinstance(event, EmbeddingEndEvent):
+            span.attributes["texts"] = len(event.chunks)
+        else:
+            response = event.response
+            text = getattr(getattr(response, "message", None), "content", None)
+            if text is None:
+                text = getattr(response, "text", "")
+            span.attributes["response_chars"] = len(text or "")
+
+    def discard(self, trace_id: str):
+        """丢弃某次追踪中未收到结束事件的区间（如调用出错）"""
+        with self._lock:
+            for key in list(self._pending):
+                stack = [span for span in self._pending[key] if span.trace_id != trace_id]
+                if stack:
+                    self._pending[key] = stack
+                else:
+                    del self._pending[key]
+
+
+_handler = TraceEventHandler()
+_handler_installed = False
+
+
+def install_event_handler(chat_model: bool):
+    """在LlamaIndex根调度器上注册追踪事件处理（每个进程只注册一次）"""
+    global _handler_installed
+    _handler.chat_model = chat_model
+    if not _handler_installed:
+        get_dispatcher().add_event_handler(_handler)
+        _handler_installed = True
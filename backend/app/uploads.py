@@ -0,0 +1,153 @@
+"""
+批量上传辅助函数
+将上传的TXT文件或zip/tar压缩包按块流式写入data目录下的临时文件，
+压缩包边读取边解压，内存中只保留一个块；解压时限制成员数量、单个成员和总的解压大小，防止压缩炸弹
+"""
+import codecs
+import tarfile
+import tempfile
+import zipfile
+import logging
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 支持的压缩包格式
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+class ArchiveLimitError(ValueError):
+    """压缩包超出解压限制（成员数量、单个成员大小或解压后总大小）"""
+
+
+def is_archive(filename: str) -> bool:
+    """是否为支持的压缩包"""
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def member_filename(name: str) -> str:
+    """
+    压缩包内成员对应的入库文件名：只保留文件名部分，
+    非TXT文件、隐藏文件和系统生成的文件返回空字符串
+    """
+    path = PurePosixPath(name.replace("\\", "/"))
+    if "__MACOSX" in path.parts:
+        return ""
+    filename = path.name
+    if not filename.endswith(".txt") or filename.startswith("."):
+        return ""
+    return filename
+
+
+def write_text_stream(read: Callable[[int], bytes], dest_dir: Path,
+                      chunk_bytes: int = 1024 * 1024) -> Path:
+    """
+    按块读取并写入dest_dir下的临时文件，同时校验UTF-8编码
+    校验失败时删除临时文件并抛出 UnicodeDecodeError
+    """
+    temp_file = tempfile.NamedTemporaryFile(
+        dir=dest_dir, prefix=".upload-", suffix=".part", delete=False
+    )
+    temp_path = Path(temp_file.name)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with temp_file:
+            while True:
+                chunk = read(chunk_bytes)
+                if not chunk:
+                    break
+                decoder.decode(chunk)
+                temp_file.write(chunk)
+            decoder.decode(b"", final=True)
+    except Exception:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return temp_path
+
+
+def extract_archive(
+    fileobj: BinaryIO, archive_name: str, dest_dir: Path, chunk_bytes: int = 1024 * 1024,
+    max_members: int = 10000, max_member_bytes: int = 100 * 1024 * 1024,
+    max_total_bytes: int = 1024 * 1024 * 1024
+) -> Tuple[List[Tuple[Path, str]], List[Dict[str, str]]]:
+    """
+    流式解压压缩包中的TXT文件到临时文件
+    返回 ((临时文件路径, 入库文件名) 列表, 失败条目列表)
+    成员数量（max_members）、单个成员解压大小（max_member_bytes）或解压总大小（max_total_bytes）
+    超出限制时整个压缩包被拒绝：删除已解压的临时文件，只返回该压缩包的失败条目
+    大小按实际解压出的字节数边读边统计，不依赖压缩包头中声明的大小
+    """
+    files: List[Tuple[Path, str]] = []
+    failed: List[Dict[str, str]] = []
+    members = 0
+    total_bytes = 0
+
+    def count_member():
+        nonlocal members
+        members += 1
+        if members > max_members:
+            raise ArchiveLimitError(f"成员数量超过 {max_members} 个")
+
+    def extract(read: Callable[[int], bytes], filename: str):
+        member_bytes = 0
+
+        def limited_read(size: int) -> bytes:
+            nonlocal member_bytes, total_bytes
+            chunk = read(size)
+            member_bytes += len(chunk)
+            total_bytes += len(chunk)
+            if member_bytes > max_member_bytes:
+                raise ArchiveLimitError(f"{filename} 解压后超过 {max_member_bytes} 字节")
+            if total_bytes > max_total_bytes:
+                raise ArchiveLimitError(f"解压后总大小超过 {max_total_bytes} 字节")
+            return chunk
+
+        try:
+            files.append((write_text_stream(limited_read, dest_dir, chunk_bytes), filename))
+        except UnicodeDecodeError:
+            failed.append({"filename": filename, "error": "文件不是有效的UTF-8文本"})
+
+    try:
+        if archive_name.lower().endswith(".zip"):
+            # zip的目录位于文件末尾，需要可随机访问的文件对象（上传文件已缓存在磁盘）
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    count_member()
+                    filename = member_filename(info.filename)
+                    if not filename:
+                        continue
+                    if info.file_size > max_member_bytes:
+                        # 声明的大小已超出限制时不必解压；声明值可能被伪造，解压时仍按实际字节数检查
+                        raise ArchiveLimitError(f"{filename} 解压后超过 {max_member_bytes} 字节")
+                    with archive.open(info) as member:
+                        extract(member.read, filename)
+        else:
+            # tar按顺序流式读取，不需要回退
+            with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    count_member()
+                    filename = member_filename(info.name)
+                    if not filename:
+                        continue
+                    member = archive.extractfile(info)
+                    if member is not None:
+                        extract(member.read, filename)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        logger.warning(f"解压失败 {archive_name}: {e}")
+        failed.append({"filename": archive_name, "error": f"无法解压: {e}"})
+    except ArchiveLimitError as e:
+        logger.warning(f"压缩包超出解压限制 {archive_name}: {e}")
+        for temp_path, _ in files:
+            temp_path.unlink(missing_ok=True)
+        return [], [{"filename": archive_name, "error": f"压缩包超出解压限制: {e}"}]
+    except Exception:
+        for temp_path, _ in files:
+            temp_path.unlink(missing_ok=True)
+        raise
+
+    return files, failed
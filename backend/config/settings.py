@@ -2,7 +2,7 @@
 应用配置设置
 """
 import os
-from typing import List
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 
 
@@ -10,14 +10,23 @@ class Settings(BaseSettings):
     """应用配置类"""
     
     # OpenAI API配置
-    openai_api_key: str
+    openai_api_key: str = ""
     openai_base_url: str = "https://api.openai.com/v1"
     openai_model: str = "gpt-4o-mini"
     embedding_model: str = "text-embedding-3-small"
     
+    # 模型后端配置：openai 调用OpenAI兼容接口，fake 使用离线模拟后端
+    llm_backend: str = "openai"
+    fake_embedding_dim: int = 1536
+    fake_llm_latency_ms: float = 200.0
+    fake_llm_tokens_per_second: float = 50.0
+    fake_llm_response_tokens: int = 100
+    
     # 应用配置
     app_host: str = "0.0.0.0"
     app_port: int = 8000
+    worker_threads: int = 16
+    max_concurrent_llm_calls: int = 4
     data_dir: str = "./data"
     storage_dir: str = "./storage"
     collection_name: str = "documents"
@@ -25,6 +34,83 @@ class Settings(BaseSettings):
     # ChromaDB配置
     chroma_db_impl: str = "duckdb+parquet"
     chroma_persist_directory: str = "./storage"
+    # embedded 在进程内打开持久化目录；http 连接本地运行的Chroma服务，多个工作进程共享同一份向量索引
+    chroma_mode: str = "embedded"
+    chroma_server_host: str = "localhost"
+    chroma_server_port: int = 8001
+    chroma_server_ssl: bool = False
+    
+    # 检索配置
+    retrieval_mode: str = "hybrid"  # hybrid / vector / keyword
+    similarity_top_k: int = 5
+    keyword_top_k: int = 5
+    rrf_k: int = 60
+    # 向量相似度下限（Chroma返回的 exp(-L2距离) 分数），请求未指定时使用；关键词命中不受此限制
+    similarity_threshold: float = 0.3
+    # 自适应top-k：在融合前对每一路，分数低于前一个结果的该倍数时丢弃其后的结果，0表示关闭
+    adaptive_top_k_drop_ratio: float = 0.5
+    keyword_index_file: str = "keyword_index.db"
+    
+    # 回答生成配置：compact_refine 上下文超出窗口时多次调用LLM逐步完善；
+    # packed 合并重叠/相邻的块并按词元预算打包，每个回答只调用一次LLM
+    synthesis_mode: str = "compact_refine"
+    context_token_budget: int = 3000
+    
+    # 分块配置：cjk 按中文标点和段落切分，sentence 使用LlamaIndex的SentenceSplitter；
+    # 上传时可按名称选择分块方案，或直接指定块大小和重叠（词元数）
+    chunker: str = "cjk"
+    chunk_profile: str = "default"
+    chunk_profiles: Dict[str, Dict[str, int]] = {
+        "default": {"chunk_size": 512, "chunk_overlap": 50},
+        "fine": {"chunk_size": 256, "chunk_overlap": 32},
+        "coarse": {"chunk_size": 1024, "chunk_overlap": 100},
+    }
+    
+    # 写入管线配置
+    embed_batch_size: int = 256
+    embed_concurrency: int = 4
+    ingest_window_chars: int = 1000000
+    # 批量加载时的分块进程数：0 表示CPU核数，1 表示不使用进程池；
+    # 一批文件总大小达到 parallel_chunking_min_bytes 时才启用
+    chunk_processes: int = 0
+    parallel_chunking_min_bytes: int = 16 * 1024 * 1024
+    upload_chunk_bytes: int = 1024 * 1024
+    # 批量上传的压缩包解压限制（成员数量、单个成员和总的解压后大小），超出时拒绝整个压缩包
+    archive_max_members: int = 10000
+    archive_max_member_bytes: int = 100 * 1024 * 1024
+    archive_max_total_bytes: int = 1024 * 1024 * 1024
+    document_registry_file: str = "documents.db"
+    
+    # 后台任务配置
+    ingest_workers: int = 1
+    max_finished_jobs: int = 200
+    # 任务状态表（位于 storage_dir 下），多工作进程共享
+    job_store_file: str = "jobs.db"
+    # 执行中任务的逐文件进度写入任务表的最短间隔（毫秒），状态变化和任务结束时总会写入
+    job_progress_save_interval_ms: int = 500
+    
+    # 嵌入缓存配置
+    embedding_cache_enabled: bool = True
+    embedding_cache_file: str = "embedding_cache.db"
+    embedding_cache_max_entries: int = 200000
+    
+    # 问答缓存配置
+    answer_cache_enabled: bool = True
+    answer_cache_max_entries: int = 1000
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_semantic: bool = False
+    answer_cache_similarity_threshold: float = 0.95
+    
+    # 状态统计配置
+    status_refresh_interval: int = 60
+    
+    # 查询追踪配置：非空时每次查询的计时区间追加写入该JSONL文件
+    trace_export_file: str = ""
+    
+    # 多工作进程配置：写操作通过存储目录下的文件锁串行执行，
+    # 每次写入后递增代数文件，其他工作进程据此重新加载索引并清空缓存
+    write_lock_file: str = "write.lock"
+    generation_file: str = "generation"
     
     # CORS配置
     allowed_origins: List[str] = [
@@ -105,8 +105,12 @@ class ChatApp {
     // 显示加载状态
     this.showLoading("正在思考中...");
 
+    let answer = "";
+    let sources = null;
+    let streamingMessage = null;
+
     try {
-      const response = await fetch(`${this.apiBase}/query`, {
+      const response = await fetch(`${this.apiBase}/query/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -114,7 +118,6 @@ class ChatApp {
         body: JSON.stringify({
           query: message,
           max_results: 5,
-          similarity_threshold: 0.7,
         }),
       });
 
@@ -122,17 +125,38 @@ class ChatApp {
         throw new Error(`HTTP ${response.status}: ${response.statusText}`);
       }
 
-      const data = await response.json();
-      console.log("收到回复:", data);
+      // 逐个处理服务器推送事件
+      await this.readEventStream(response, (event, data) => {
+        if (event === "sources") {
+          sources = data.sources;
+          this.hideLoading();
+          this.isLoading = true;
+          streamingMessage = this.createStreamingMessage(sources);
+        } else if (event === "token") {
+          answer += data.text;
+          if (!streamingMessage) {
+            streamingMessage = this.createStreamingMessage(null);
+          }
+          streamingMessage.textDiv.innerHTML = this.formatMessage(answer);
+          this.scrollToBottom();
+        } else if (event === "done") {
+          console.log("收到回复，耗时:", data.processing_time);
+        } else if (event === "error") {
+          throw new Error(data.message || "服务器返回错误");
+        }
+      });
 
-      if (data.error) {
-        throw new Error(data.message || "服务器返回错误");
+      if (streamingMessage) {
+        // 流式消息已渲染，只保存到历史记录
+        this.saveMessageToHistory("assistant", answer, sources);
+      } else {
+        this.addMessage("assistant", answer, sources);
       }
-
-      // 添加助手回复到界面
-      this.addMessage("assistant", data.answer, data.sources);
     } catch (error) {
       console.error("发送消息失败:", error);
+      if (streamingMessage) {
+        streamingMessage.messageDiv.remove();
+      }
       this.addMessage(
         "assistant",
         `抱歉，发生了错误：${error.message}`,
@@ -144,6 +168,67 @@ class ChatApp {
     }
   }
 
+  async readEventStream(response, onEvent) {
+    // 解析 text/event-stream 响应体
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder("utf-8");
+    let buffer = "";
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = "message";
+        const dataLines = [];
+        rawEvent.split("\n").forEach((line) => {
+          if (line.startsWith("event:")) {
+            event = line.slice(6).trim();
+          } else if (line.startsWith("data:")) {
+            dataLines.push(line.slice(5).trim());
+          }
+        });
+        if (dataLines.length > 0) {
+          onEvent(event, JSON.parse(dataLines.join("\n")));
+        }
+      }
+    }
+  }
+
+  createStreamingMessage(sources) {
+    // 创建一条随回答到达而更新的助手消息
+    const messageDiv = document.createElement("div");
+    messageDiv.className = "message assistant-message";
+
+    const avatarDiv = document.createElement("div");
+    avatarDiv.className = "message-avatar";
+    avatarDiv.innerHTML = '<i class="fas fa-robot"></i>';
+
+    const contentDiv = document.createElement("div");
+    contentDiv.className = "message-content";
+
+    const textDiv = document.createElement("div");
+    textDiv.className = "message-text";
+    contentDiv.appendChild(textDiv);
+
+    if (sources && sources.length > 0) {
+      contentDiv.appendChild(this.createSourcesDiv(sources));
+    }
+
+    messageDiv.appendChild(avatarDiv);
+    messageDiv.appendChild(contentDiv);
+
+    this.elements.chatMessages.appendChild(messageDiv);
+    this.scrollToBottom();
+
+    return { messageDiv, textDiv };
+  }
+
   addMessage(type, content, sources = null, isError = false) {
     const messageDiv = document.createElement("div");
     messageDiv.className = `message ${type}-message`;
@@ -180,6 +265,10 @@ class ChatApp {
     this.scrollToBottom();
 
     // 保存到历史记录
+    this.saveMessageToHistory(type, content, sources);
+  }
+
+  saveMessageToHistory(type, content, sources = null) {
     this.chatHistory.push({
       id: Date.now().toString(),
       type,
@@ -241,25 +330,35 @@ class ChatApp {
     this.showLoading("正在加载文档...");
 
     try {
-      const response = await fetch(`${this.apiBase}/load-documents`, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({}),
-      });
+      const response = await fetch(
+        `${this.apiBase}/load-documents?background=true`,
+        {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({}),
+        }
+      );
 
       if (!response.ok) {
         throw new Error(`HTTP ${response.status}: ${response.statusText}`);
       }
 
-      const data = await response.json();
-      console.log("文档加载结果:", data);
+      // 后台任务：轮询进度直到结束
+      const job = await this.waitForJob(await response.json(), (progress) => {
+        this.elements.loadingText.textContent =
+          `正在加载文档... ${progress.files_done}/${progress.files_total} 个文件，` +
+          `${progress.chunks} 个文本块`;
+      });
+      console.log("文档加载结果:", job);
 
-      if (data.error) {
-        throw new Error(data.message || "加载文档失败");
+      if (job.status !== "succeeded") {
+        throw new Error(job.error || "加载文档失败");
       }
 
+      const data = { ...job.result, processing_time: job.elapsed };
+
       // 显示加载结果
       this.showModal("文档加载完成", this.formatLoadResult(data));
 
@@ -276,6 +375,20 @@ class ChatApp {
     }
   }
 
+  async waitForJob(job, onProgress, interval = 1000) {
+    // 轮询后台任务状态，直到成功或失败
+    while (job.status === "queued" || job.status === "running") {
+      onProgress(job);
+      await new Promise((resolve) => setTimeout(resolve, interval));
+      const response = await fetch(`${this.apiBase}/jobs/${job.job_id}`);
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+      }
+      job = await response.json();
+    }
+    return job;
+  }
+
   formatLoadResult(data) {
     let html = `
             <div class="text-center">
@@ -283,7 +396,8 @@ class ChatApp {
                 <p>处理了 <strong>${
                   data.documents_processed
                 }</strong> 个文档</p>
-                <p>创建了 <strong>${data.chunks_created}</strong> 个文本块</p>
+                <p>未变化跳过 <strong>${data.unchanged_files || 0}</strong> 个文档</p>
+                <p>当前共 <strong>${data.total_chunks}</strong> 个文本块</p>
                 <p>处理时间: <strong>${data.processing_time.toFixed(
                   2
                 )}</strong> 秒</p>
@@ -306,6 +420,22 @@ class ChatApp {
             `;
     }
 
+    if (data.removed_files && data.removed_files.length > 0) {
+      html += `
+                <div style="margin-top: 1rem;">
+                    <h4>🗑️ 移除的文件:</h4>
+                    <ul>
+                        ${data.removed_files
+                          .map(
+                            (file) =>
+                              `<li>${file.filename} (${file.chunks} 块)</li>`
+                          )
+                          .join("")}
+                    </ul>
+                </div>
+            `;
+    }
+
     if (data.new_files && data.new_files.length > 0) {
       html += `
                 <div style="margin-top: 1rem;">
@@ -347,13 +477,16 @@ class ChatApp {
                         <p><strong>状态:</strong> <span class="text-success">${
                           data.status
                         }</span></p>
-                        <p><strong>文档数量:</strong> ${
+                        <p><strong>文件数量:</strong> ${data.files_count}</p>
+                        <p><strong>文档块数量:</strong> ${
                           data.documents_count
                         }</p>
                         <p><strong>存储大小:</strong> ${data.storage_size}</p>
-                        <p><strong>最后更新:</strong> ${new Date(
+                        <p><strong>最后更新:</strong> ${
                           data.last_updated
-                        ).toLocaleString()}</p>
+                            ? new Date(data.last_updated).toLocaleString()
+                            : "统计中"
+                        }</p>
                     </div>
                 </div>
             `;
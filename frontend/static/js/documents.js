@@ -5,6 +5,13 @@
 class DocumentManager {
   constructor() {
     this.documents = [];
+    // 分页、排序和前缀筛选状态
+    this.pageSize = 50;
+    this.offset = 0;
+    this.total = 0;
+    this.sort = "name";
+    this.order = "asc";
+    this.prefix = "";
     this.init();
   }
 
@@ -22,6 +29,26 @@ class DocumentManager {
     const refreshBtn = document.getElementById("refreshBtn");
     refreshBtn.addEventListener("click", () => this.loadDocuments());
 
+    // 前缀筛选（输入停顿后查询）
+    const prefixInput = document.getElementById("prefixInput");
+    let prefixTimer = null;
+    prefixInput.addEventListener("input", () => {
+      clearTimeout(prefixTimer);
+      prefixTimer = setTimeout(() => {
+        this.prefix = prefixInput.value.trim();
+        this.offset = 0;
+        this.loadDocuments();
+      }, 300);
+    });
+
+    // 翻页
+    document
+      .getElementById("prevPageBtn")
+      .addEventListener("click", () => this.changePage(-1));
+    document
+      .getElementById("nextPageBtn")
+      .addEventListener("click", () => this.changePage(1));
+
     // 拖拽上传
     const uploadSection = document.getElementById("uploadSection");
     uploadSection.addEventListener("dragover", (e) => this.handleDragOver(e));
@@ -29,21 +56,29 @@ class DocumentManager {
     uploadSection.addEventListener("drop", (e) => this.handleDrop(e));
   }
 
-  // 显示提示信息
+  // 显示提示信息（消息按纯文本显示，换行符处换行）
   showAlert(message, type = "info") {
     const alertContainer = document.getElementById("alertContainer");
     const alertDiv = document.createElement("div");
     alertDiv.className = `alert ${type}`;
-    alertDiv.innerHTML = `
-            <i class="fas fa-${
-              type === "success"
-                ? "check-circle"
-                : type === "error"
-                ? "exclamation-circle"
-                : "info-circle"
-            }"></i>
-            ${message}
-        `;
+    const icon = document.createElement("i");
+    icon.className = `fas fa-${
+      type === "success"
+        ? "check-circle"
+        : type === "error"
+        ? "exclamation-circle"
+        : "info-circle"
+    }`;
+    alertDiv.appendChild(icon);
+    // 消息中含有文件名和服务端错误（可能来自压缩包成员名），用文本节点写入，避免被当作HTML解析
+    String(message)
+      .split("\n")
+      .forEach((line, index) => {
+        if (index > 0) {
+          alertDiv.appendChild(document.createElement("br"));
+        }
+        alertDiv.appendChild(document.createTextNode(` ${line}`));
+      });
     alertDiv.style.display = "block";
 
     alertContainer.innerHTML = "";
@@ -55,15 +90,30 @@ class DocumentManager {
     }, 3000);
   }
 
-  // 加载文档列表
+  // 加载当前页文档列表
   async loadDocuments() {
     try {
-      const response = await fetch("/api/documents");
+      const params = new URLSearchParams({
+        offset: this.offset,
+        limit: this.pageSize,
+        sort: this.sort,
+        order: this.order,
+        prefix: this.prefix,
+      });
+      const response = await fetch(`/api/documents?${params}`);
       const data = await response.json();
 
       if (data.success) {
+        // 删除后当前页可能已越界，回到最后一页
+        if (data.documents.length === 0 && data.total > 0 && this.offset > 0) {
+          this.offset =
+            Math.floor((data.total - 1) / this.pageSize) * this.pageSize;
+          return this.loadDocuments();
+        }
         this.documents = data.documents;
+        this.total = data.total;
         this.renderDocuments();
+        this.renderPagination();
         this.updateStats(data);
       } else {
         this.showAlert(data.message, "error");
@@ -80,7 +130,14 @@ class DocumentManager {
     const statsBar = document.getElementById("statsBar");
 
     if (this.documents.length === 0) {
-      container.innerHTML = `
+      container.innerHTML = this.prefix
+        ? `
+                <div class="empty-state">
+                    <h3>没有匹配的文档</h3>
+                    <p class="empty-prefix"></p>
+                </div>
+            `
+        : `
                 <div class="empty-state">
                     <div class="empty-icon">
                         <i class="fas fa-folder-open"></i>
@@ -89,6 +146,10 @@ class DocumentManager {
                     <p>请上传TXT文件开始使用</p>
                 </div>
             `;
+      if (this.prefix) {
+        // 前缀来自用户输入，用textContent写入，避免被当作HTML解析
+        container.querySelector(".empty-prefix").textContent = `没有以 "${this.prefix}" 开头的文件`;
+      }
       statsBar.style.display = "none";
       return;
     }
@@ -97,10 +158,10 @@ class DocumentManager {
             <table class="documents-table">
                 <thead>
                     <tr>
-                        <th>文件名</th>
-                        <th>文档块数</th>
-                        <th>文件大小</th>
-                        <th>修改时间</th>
+                        ${this.sortHeader("name", "文件名")}
+                        ${this.sortHeader("chunks", "文档块数")}
+                        ${this.sortHeader("size", "文件大小")}
+                        ${this.sortHeader("mtime", "修改时间")}
                         <th>操作</th>
                     </tr>
                 </thead>
@@ -133,11 +194,62 @@ class DocumentManager {
 
     container.innerHTML = tableHTML;
     statsBar.style.display = "flex";
+
+    container.querySelectorAll("th.sortable").forEach((th) => {
+      th.addEventListener("click", () => this.changeSort(th.dataset.sort));
+    });
+  }
+
+  // 可排序的表头
+  sortHeader(field, label) {
+    const icon =
+      this.sort === field
+        ? this.order === "asc"
+          ? "fa-sort-up"
+          : "fa-sort-down"
+        : "fa-sort";
+    return `<th class="sortable" data-sort="${field}">${label} <i class="fas ${icon}"></i></th>`;
+  }
+
+  // 切换排序字段，再次点击同一字段时切换方向
+  changeSort(field) {
+    if (this.sort === field) {
+      this.order = this.order === "asc" ? "desc" : "asc";
+    } else {
+      this.sort = field;
+      this.order = "asc";
+    }
+    this.offset = 0;
+    this.loadDocuments();
+  }
+
+  // 渲染分页栏
+  renderPagination() {
+    const pagination = document.getElementById("pagination");
+    if (this.total <= this.pageSize) {
+      pagination.style.display = "none";
+      return;
+    }
+
+    const page = Math.floor(this.offset / this.pageSize) + 1;
+    const pages = Math.ceil(this.total / this.pageSize);
+    document.getElementById("pageInfo").textContent = `第 ${page} / ${pages} 页，共 ${this.total} 个文档`;
+    document.getElementById("prevPageBtn").disabled = page <= 1;
+    document.getElementById("nextPageBtn").disabled = page >= pages;
+    pagination.style.display = "flex";
+  }
+
+  // 翻页
+  changePage(step) {
+    const offset = this.offset + step * this.pageSize;
+    if (offset < 0 || offset >= this.total) return;
+    this.offset = offset;
+    this.loadDocuments();
   }
 
   // 更新统计信息
   updateStats(data) {
-    document.getElementById("docCount").textContent = data.documents.length;
+    document.getElementById("docCount").textContent = data.total;
     document.getElementById("chunkCount").textContent = data.total_chunks;
     document.getElementById("lastUpdate").textContent =
       new Date().toLocaleString();
@@ -183,43 +295,110 @@ class DocumentManager {
     this.uploadFiles(files);
   }
 
-  // 上传文件
+  // 上传文件：单个TXT文件单独上传，多个文件或压缩包合并为一次批量上传
   async uploadFiles(files) {
+    const archivePattern = /\.(zip|tar|tar\.gz|tgz|tar\.bz2|tar\.xz)$/i;
+    const accepted = [];
     for (let file of files) {
-      if (!file.name.endsWith(".txt")) {
-        this.showAlert(`文件 ${file.name} 不是TXT格式，已跳过`, "error");
+      if (!file.name.endsWith(".txt") && !archivePattern.test(file.name)) {
+        this.showAlert(`文件 ${file.name} 不是TXT格式或压缩包，已跳过`, "error");
         continue;
       }
+      accepted.push(file);
+    }
 
-      await this.uploadSingleFile(file);
+    if (accepted.length === 1 && accepted[0].name.endsWith(".txt")) {
+      await this.uploadSingleFile(accepted[0]);
+    } else if (accepted.length > 0) {
+      await this.uploadBatch(accepted);
     }
 
     // 重新加载文档列表
     this.loadDocuments();
   }
 
+  // 批量上传多个文件和压缩包
+  async uploadBatch(files) {
+    try {
+      const formData = new FormData();
+      for (let file of files) {
+        formData.append("files", file);
+      }
+
+      const response = await fetch(
+        "/api/documents/upload-batch?background=true",
+        {
+          method: "POST",
+          body: formData,
+        }
+      );
+
+      const accepted = await response.json();
+      if (!response.ok) {
+        this.showAlert(`上传失败: ${accepted.detail || accepted.message}`, "error");
+        return;
+      }
+
+      const job = await this.waitForJob(accepted, (progress) => {
+        this.showAlert(
+          `正在处理：${progress.files_done}/${progress.files_total} 个文件，已写入 ${progress.chunks} 个文档块`,
+          "info"
+        );
+      });
+      const data = job.result || { success: false, message: job.error };
+
+      if (data.success) {
+        let message = `批量上传完成！成功 ${data.uploaded.length} 个文件`;
+        if (data.failed.length > 0) {
+          message += `\n失败 ${data.failed.length} 个: ${data.failed
+            .map((item) => `${item.filename}（${item.error}）`)
+            .join("，")}`;
+        }
+        this.showAlert(message, data.failed.length > 0 ? "info" : "success");
+      } else {
+        this.showAlert(`上传失败: ${data.message}`, "error");
+      }
+    } catch (error) {
+      console.error("批量上传失败:", error);
+      this.showAlert("批量上传失败", "error");
+    }
+  }
+
   // 上传单个文件
   async uploadSingleFile(file) {
     try {
       const formData = new FormData();
       formData.append("file", file);
 
-      const response = await fetch("/api/documents/upload", {
+      const response = await fetch("/api/documents/upload?background=true", {
         method: "POST",
         body: formData,
       });
 
-      const data = await response.json();
+      const accepted = await response.json();
+      if (!response.ok) {
+        this.showAlert(`上传失败: ${accepted.detail || accepted.message}`, "error");
+        return;
+      }
+
+      // 文件已保存，等待后台任务完成分块和写入
+      const job = await this.waitForJob(accepted, (progress) => {
+        this.showAlert(
+          `正在处理 ${file.name}：已写入 ${progress.chunks} 个文档块`,
+          "info"
+        );
+      });
+      const data = job.result || { success: false, message: job.error };
 
       if (data.success) {
         if (data.replaced) {
           this.showAlert(
-            `文件 ${data.filename} 上传成功！替换了同名文件（旧: ${data.old_chunks}块 → 新: ${data.new_chunks}块）<br>已保存到 data 目录`,
+            `文件 ${data.filename} 上传成功！替换了同名文件（旧: ${data.old_chunks}块 → 新: ${data.new_chunks}块）\n已保存到 data 目录`,
             "success"
           );
         } else {
           this.showAlert(
-            `文件 ${data.filename} 上传成功！生成了 ${data.new_chunks} 个文档块<br>已保存到 data 目录`,
+            `文件 ${data.filename} 上传成功！生成了 ${data.new_chunks} 个文档块\n已保存到 data 目录`,
             "success"
           );
         }
@@ -232,6 +411,20 @@ class DocumentManager {
     }
   }
 
+  // 轮询后台任务状态，直到成功或失败
+  async waitForJob(job, onProgress, interval = 1000) {
+    while (job.status === "queued" || job.status === "running") {
+      onProgress(job);
+      await new Promise((resolve) => setTimeout(resolve, interval));
+      const response = await fetch(`/api/jobs/${job.job_id}`);
+      if (!response.ok) {
+        throw new Error(`查询任务状态失败: HTTP ${response.status}`);
+      }
+      job = await response.json();
+    }
+    return job;
+  }
+
   // 删除文档
   async deleteDocument(filename) {
     if (
@@ -255,9 +448,9 @@ class DocumentManager {
       if (data.success) {
         let message = `文档 ${data.filename} 删除成功！删除了 ${data.deleted_chunks} 个文档块`;
         if (data.file_deleted_from_disk) {
-          message += "<br>已从 data 目录删除文件";
+          message += "\n已从 data 目录删除文件";
         } else {
-          message += "<br>仅删除了数据库记录";
+          message += "\n仅删除了数据库记录";
         }
         this.showAlert(message, "success");
         this.loadDocuments();
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+端到端性能基准测试脚本
+测量分块速度、嵌入批次吞吐、Chroma写入吞吐、不同规模下的检索延迟、
+并发 /api/query 的延迟分位数和峰值内存，结果输出为JSON便于不同版本之间对比
+
+默认使用离线模拟后端（LLM_BACKEND=fake）和临时工作目录，不访问外部接口：
+    python scripts/benchmark.py --output benchmark.json
+    python scripts/benchmark.py --scales 1000,10000 --clients 16 --requests 400
+    python scripts/benchmark.py --base-url http://127.0.0.1:8000   # 对已运行的服务压测
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+# 合成语料使用的词表（中英文混合）
+CJK_WORDS = [
+    "文档", "检索", "向量", "索引", "贵阳", "美食", "历史", "文化", "系统", "性能",
+    "数据", "模型", "查询", "回答", "存储", "分块", "嵌入", "缓存", "并发", "延迟",
+]
+LATIN_WORDS = [
+    "vector", "index", "query", "latency", "chunk", "embedding", "storage", "cache",
+    "throughput", "benchmark", "retrieval", "document", "server", "client", "token",
+]
+
+
+def peak_rss_mb() -> float:
+    """进程峰值常驻内存（MB）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return usage / 1024 if sys.platform != "darwin" else usage / (1024 * 1024)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """延迟样本（秒）的分位数统计，单位毫秒"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def synthetic_sentence(rng: random.Random) -> str:
+    """生成一句中英文混合的合成文本"""
+    words = [rng.choice(CJK_WORDS) for _ in range(rng.randint(6, 14))]
+    words.insert(rng.randrange(len(words)), rng.choice(LATIN_WORDS))
+    return "".join(words) + rng.choice("。！？") + ("\n" if rng.random() < 0.2 else "")
+
+
+def synthetic_text(rng: random.Random, target_chars: int) -> str:
+    """生成指定长度的合成文档"""
+    parts = []
+    size = 0
+    while size < target_chars:
+        sentence = synthetic_sentence(rng)
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts)
+
+
+def git_commit() -> str:
+    """当前代码版本"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, text=True
+        ).strip()
+    except Exception:
+        return ""
+
+
+class Benchmark:
+    """基准测试执行器"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.results: Dict[str, Any] = {}
+        self.rag_service = None
+        self.server = None
+        self.base_url = args.base_url
+
+    # ---------- 环境 ----------
+
+    def start_server(self):
+        """在后台线程中启动应用（使用临时目录和配置的模型后端）"""
+        import uvicorn
+        from backend.app import main
+
+        # 请求日志会影响吞吐测量
+        if not self.args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+        self.rag_service = main.rag_service
+        self.base_url = f"http://127.0.0.1:{port}"
+        print(f"✓ 服务已启动: {self.base_url}")
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.should_exit = True
+
+    # ---------- 写入链路 ----------
+
+    def bench_chunking(self, corpus: List[str]):
+        """分块速度"""
+        from backend.app.ingestion import iter_text_chunks
+
+        splitter = self.rag_service.ingestion.text_splitter
+        directory = Path(self.args.workdir) / "chunking"
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for i, text in enumerate(corpus):
+            path = directory / f"chunk_{i}.txt"
+            path.write_text(text, encoding="utf-8")
+            paths.append(path)
+
+        chunks: List[str] = []
+        start = time.perf_counter()
+        for path in paths:
+            chunks.extend(text for text, _, _ in iter_text_chunks(path, splitter))
+        elapsed = time.perf_counter() - start
+
+        total_chars = sum(len(text) for text in corpus)
+        self.results["chunking"] = {
+            "documents": len(corpus),
+            "chars": total_chars,
+            "chunks": len(chunks),
+            "seconds": elapsed,
+            "chars_per_second": total_chars / elapsed,
+            "chunks_per_second": len(chunks) / elapsed,
+        }
+        print(f"✓ 分块: {len(chunks)} 块，{total_chars / elapsed:,.0f} 字符/秒")
+        return chunks
+
+    def bench_embedding(self, chunks: List[str]):
+        """嵌入批次吞吐（不经过嵌入缓存）"""
+        from llama_index.core import Settings
+
+        embed_model = Settings.embed_model
+        batch_size = self.rag_service.ingestion.batch_size
+        batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+
+        vectors: List[List[float]] = []
+        start = time.perf_counter()
+        for batch in batches:
+            vectors.extend(embed_model.get_text_embedding_batch(batch))
+        elapsed = time.perf_counter() - start
+
+        self.results["embedding"] = {
+            "model": embed_model.model_name,
+            "batch_size": batch_size,
+            "batches": len(batches),
+            "texts": len(chunks),
+            "seconds": elapsed,
+            "batches_per_second": len(batches) / elapsed,
+            "texts_per_second": len(chunks) / elapsed,
+        }
+        print(f"✓ 嵌入: {len(batches) / elapsed:.1f} 批/秒，{len(chunks) / elapsed:,.0f} 块/秒")
+        return vectors
+
+    def bench_chroma_write(self, chunks: List[str], vectors: List[List[float]]):
+        """Chroma批量写入吞吐（临时集合）"""
+        client = self.rag_service.chroma_client
+        name = "benchmark_write"
+        collection = client.get_or_create_collection(name)
+        batch_size = self.rag_service.ingestion.batch_size
+        try:
+            start = time.perf_counter()
+            for i in range(0, len(chunks), batch_size):
+                collection.upsert(
+                    ids=[f"w{j}" for j in range(i, min(i + batch_size, len(chunks)))],
+                    embeddings=vectors[i:i + batch_size],
+                    documents=chunks[i:i + batch_size],
+                    metadatas=[{"filename": "benchmark.txt"}] * len(chunks[i:i + batch_size]),
+                )
+            elapsed = time.perf_counter() - start
+        finally:
+            client.delete_collection(name)
+
+        self.results["chroma_write"] = {
+            "chunks": len(chunks),
+            "batch_size": batch_size,
+            "seconds": elapsed,
+            "chunks_per_second": len(chunks) / elapsed,
+        }
+        print(f"✓ Chroma写入: {len(chunks) / elapsed:,.0f} 块/秒")
+
+    def bench_ingest(self, corpus: List[str]):
+        """完整写入链路：文件 → 分块 → 嵌入 → Chroma/关键词索引/注册表"""
+        data_path = Path(self.args.workdir) / "data"
+        data_path.mkdir(parents=True, exist_ok=True)
+        for i, text in enumerate(corpus):
+            (data_path / f"doc_{i:05d}.txt").write_text(text, encoding="utf-8")
+
+        start = time.perf_counter()
+        result = self.rag_service.load_documents(mode="full")
+        elapsed = time.perf_counter() - start
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+
+        chunks = result["total_chunks"]
+        self.results["ingest"] = {
+            "documents": result["documents_processed"],
+            "chunks": chunks,
+            "seconds": elapsed,
+            "chunks_per_second": chunks / elapsed,
+        }
+        print(f"✓ 完整写入: {chunks} 块，{chunks / elapsed:,.0f} 块/秒")
+
+    # ---------- 查询链路 ----------
+
+    def bench_retrieval_scales(self, dim: int):
+        """不同规模下的向量检索和关键词检索延迟（临时集合和临时关键词索引）"""
+        import numpy as np
+        from backend.app.keyword_index import KeywordIndex
+
+        client = self.rag_service.chroma_client
+        name = "benchmark_retrieval"
+        collection = client.get_or_create_collection(name, metadata={"hnsw:space": "l2"})
+        keyword_index = KeywordIndex(str(Path(self.args.workdir) / "benchmark_keyword.db"))
+        np_rng = np.random.default_rng(self.args.seed)
+        batch_size = 5000
+        queries = [synthetic_sentence(self.rng) for _ in range(self.args.queries)]
+        query_vectors = np_rng.standard_normal((self.args.queries, dim)).astype(np.float32)
+
+        scales = []
+        size = 0
+        try:
+            for target in self.args.scales:
+                fill_start = time.perf_counter()
+                while size < target:
+                    count = min(batch_size, target - size)
+                    ids = [f"r{size + j}" for j in range(count)]
+                    texts = [synthetic_sentence(self.rng) for _ in range(count)]
+                    vectors = np_rng.standard_normal((count, dim)).astype(np.float32)
+                    collection.add(ids=ids, embeddings=vectors, documents=texts)
+                    keyword_index.add(zip(ids, ["benchmark.txt"] * count, texts))
+                    size += count
+                fill_seconds = time.perf_counter() - fill_start
+
+                vector_samples = []
+                for vector in query_vectors:
+                    start = time.perf_counter()
+                    collection.query(query_embeddings=[vector], n_results=5)
+                    vector_samples.append(time.perf_counter() - start)
+
+                keyword_samples = []
+                for query in queries:
+                    start = time.perf_counter()
+                    keyword_index.search(query, top_k=5)
+                    keyword_samples.append(time.perf_counter() - start)
+
+                scales.append({
+                    "chunks": size,
+                    "fill_seconds": fill_seconds,
+                    "vector": percentiles(vector_samples),
+                    "keyword": percentiles(keyword_samples),
+                    "peak_rss_mb": peak_rss_mb(),
+                })
+                print(
+                    f"✓ 检索 @ {size:,} 块: 向量 p50 {scales[-1]['vector']['p50_ms']:.2f}ms，"
+                    f"关键词 p50 {scales[-1]['keyword']['p50_ms']:.2f}ms"
+                )
+        finally:
+            client.delete_collection(name)
+            keyword_index.close()
+
+        self.results["retrieval"] = {"dimension": dim, "top_k": 5, "scales": scales}
+
+    def bench_query_load(self):
+        """并发 /api/query 端到端延迟"""
+        url = f"{self.base_url}/api/query"
+        # 每个请求使用不同的问题，避免命中问答缓存
+        questions = [
+            f"{synthetic_sentence(self.rng)} #{i}" for i in range(self.args.requests)
+        ]
+        errors = 0
+        lock = threading.Lock()
+
+        def send(question: str) -> float:
+            nonlocal errors
+            body = json.dumps({"query": question, "max_results": 5}).encode("utf-8")
+            request = urllib.request.Request(
+                url, data=body, headers={"Content-Type": "application/json"}
+            )
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=self.args.timeout) as response:
+                    response.read()
+            except Exception:
+                with lock:
+                    errors += 1
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.clients) as executor:
+            samples = list(executor.map(send, questions))
+        elapsed = time.perf_counter() - start
+
+        self.results["query_load"] = {
+            "url": url,
+            "clients": self.args.clients,
+            "requests": len(questions),
+            "errors": errors,
+            "seconds": elapsed,
+            "requests_per_second": len(questions) / elapsed,
+            "latency": percentiles(samples),
+        }
+        latency = self.results["query_load"]["latency"]
+        print(
+            f"✓ /api/query x{self.args.clients} 并发: p50 {latency['p50_ms']:.0f}ms，"
+            f"p95 {latency['p95_ms']:.0f}ms，p99 {latency['p99_ms']:.0f}ms，错误 {errors}"
+        )
+
+    # ---------- 汇总 ----------
+
+    def metadata(self) -> Dict[str, Any]:
+        from backend.config import settings
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "llm_backend": settings.llm_backend,
+            "base_url": self.base_url,
+            "settings": {
+                "retrieval_mode": settings.retrieval_mode,
+                "embed_batch_size": settings.embed_batch_size,
+                "embed_concurrency": settings.embed_concurrency,
+                "worker_threads": settings.worker_threads,
+                "max_concurrent_llm_calls": settings.max_concurrent_llm_calls,
+                "fake_embedding_dim": settings.fake_embedding_dim,
+            },
+            "args": {
+                key: value for key, value in vars(self.args).items()
+                if key not in ("output",)
+            },
+        }
+
+    def run(self) -> Dict[str, Any]:
+        if self.base_url:
+            # 只对外部服务压测查询链路
+            self.bench_query_load()
+        else:
+            self.start_server()
+            try:
+                corpus = [
+                    synthetic_text(self.rng, self.args.doc_chars)
+                    for _ in range(self.args.documents)
+                ]
+                chunks = self.bench_chunking(corpus)
+                vectors = self.bench_embedding(chunks)
+                self.bench_chroma_write(chunks, vectors)
+                self.bench_ingest(corpus)
+                self.bench_query_load()
+                if self.args.scales:
+                    self.bench_retrieval_scales(self.args.retrieval_dim)
+            finally:
+                self.stop_server()
+
+        self.results["peak_rss_mb"] = peak_rss_mb()
+        return {"meta": self.metadata(), "results": self.results}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="RAG服务性能基准测试")
+    parser.add_argument("--output", default="", help="结果JSON文件路径（默认只输出到标准输出）")
+    parser.add_argument("--backend", default="fake", choices=["fake", "openai"], help="模型后端")
+    parser.add_argument("--workdir", default="", help="工作目录（默认创建临时目录）")
+    parser.add_argument("--base-url", default="", help="对已运行的服务压测，只测量查询链路")
+    parser.add_argument("--documents", type=int, default=20, help="写入测试的合成文档数量")
+    parser.add_argument("--doc-chars", type=int, default=50000, help="每个合成文档的字符数")
+    parser.add_argument(
+        "--scales", default="1000,10000,100000,1000000",
+        help="检索延迟测试的集合规模（逗号分隔，留空跳过）"
+    )
+    parser.add_argument("--retrieval-dim", type=int, default=384, help="检索规模测试的向量维度")
+    parser.add_argument("--queries", type=int, default=100, help="每个规模的检索次数")
+    parser.add_argument("--clients", type=int, default=8, help="并发客户端数量")
+    parser.add_argument("--requests", type=int, default=200, help="查询请求总数")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单个请求超时（秒）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--verbose", action="store_true", help="保留应用的INFO日志")
+    args = parser.parse_args()
+    args.scales = [int(value) for value in args.scales.split(",") if value.strip()]
+    return args
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+
+    # 应用使用相对路径挂载前端静态文件
+    os.chdir(project_root)
+
+    if not args.base_url:
+        # 必须在导入应用配置之前设置环境变量
+        args.workdir = args.workdir or tempfile.mkdtemp(prefix="rag-benchmark-")
+        os.environ["LLM_BACKEND"] = args.backend
+        os.environ["DATA_DIR"] = str(Path(args.workdir) / "data")
+        os.environ["STORAGE_DIR"] = str(Path(args.workdir) / "storage")
+        os.environ["CHROMA_PERSIST_DIRECTORY"] = str(Path(args.workdir) / "storage")
+        os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+        os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+        print(f"🔧 工作目录: {args.workdir}")
+
+    report = Benchmark(args).run()
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"📄 结果已写入: {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+分块器微基准测试
+在单核上比较 cjk（中文友好分块器）和 sentence（LlamaIndex SentenceSplitter）的分块吞吐，
+并统计块大小分布，结果输出为JSON：
+    python scripts/benchmark_chunker.py
+    python scripts/benchmark_chunker.py --mb 50 --chunk-size 256 --chunk-overlap 32
+    python scripts/benchmark_chunker.py --file data/贵阳人文.txt --repeat 200
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from benchmark import synthetic_text  # noqa: E402
+
+
+def bench_splitter(kind: str, corpus: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """按文档窗口大小切分语料并计时（与写入管线一致，每个窗口单独切分）"""
+    from llama_index.core.utils import get_tokenizer
+    from backend.app.chunker import make_splitter
+
+    splitter = make_splitter(kind, args.chunk_size, args.chunk_overlap)
+    windows = [corpus[i:i + args.window_chars] for i in range(0, len(corpus), args.window_chars)]
+
+    # 预热：加载分词器和分句模型
+    splitter.split_text(windows[0][:10000])
+
+    chunks = []
+    start = time.perf_counter()
+    for window in windows:
+        chunks.extend(splitter.split_text(window))
+    elapsed = time.perf_counter() - start
+
+    tokenizer = get_tokenizer()
+    sizes = [len(tokenizer(chunk)) for chunk in chunks[:args.sample_chunks]]
+    total_bytes = len(corpus.encode("utf-8"))
+    return {
+        "chunks": len(chunks),
+        "seconds": elapsed,
+        "chars_per_second": len(corpus) / elapsed,
+        "mb_per_minute": total_bytes / (1024 * 1024) / elapsed * 60,
+        "chunk_tokens": {
+            "min": min(sizes),
+            "mean": statistics.mean(sizes),
+            "max": max(sizes),
+            "stdev": statistics.pstdev(sizes),
+        },
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="分块器微基准测试")
+    parser.add_argument("--chunkers", default="cjk,sentence", help="参与比较的分块器（逗号分隔）")
+    parser.add_argument("--mb", type=float, default=20.0, help="合成语料大小（MB，UTF-8）")
+    parser.add_argument("--file", default="", help="使用指定文本文件作为语料（重复 --repeat 次）")
+    parser.add_argument("--repeat", type=int, default=1, help="--file 语料的重复次数")
+    parser.add_argument("--chunk-size", type=int, default=512, help="块大小（词元数）")
+    parser.add_argument("--chunk-overlap", type=int, default=50, help="块重叠（词元数）")
+    parser.add_argument("--window-chars", type=int, default=1000000, help="每次切分的窗口字符数")
+    parser.add_argument("--sample-chunks", type=int, default=5000, help="统计块大小分布的块数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", default="", help="结果JSON文件路径（默认只输出到标准输出）")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+
+    if args.file:
+        corpus = Path(args.file).read_text(encoding="utf-8") * max(1, args.repeat)
+    else:
+        # 合成的中英文混合文本平均每字符约2.5字节
+        corpus = synthetic_text(random.Random(args.seed), int(args.mb * 1024 * 1024 / 2.5))
+    print(f"🔧 语料: {len(corpus):,} 字符，{len(corpus.encode('utf-8')) / (1024 * 1024):.1f} MB")
+
+    results: Dict[str, Any] = {}
+    for kind in [value.strip() for value in args.chunkers.split(",") if value.strip()]:
+        try:
+            results[kind] = bench_splitter(kind, corpus, args)
+        except Exception as e:
+            # SentenceSplitter首次使用需要下载NLTK数据，离线环境可能失败
+            results[kind] = {"error": str(e)}
+            print(f"❌ {kind}: {e}")
+            continue
+        result = results[kind]
+        print(
+            f"✓ {kind}: {result['mb_per_minute']:.0f} MB/分钟，{result['chunks']} 块，"
+            f"平均 {result['chunk_tokens']['mean']:.0f} 词元/块"
+        )
+
+    report = {
+        "params": {
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "window_chars": args.window_chars,
+            "chars": len(corpus),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"📄 结果已写入: {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,8 +15,8 @@ from typing import Dict, List, Any
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
-import chromadb
 from backend.config import settings
+from backend.app.chroma_client import get_chroma_client
 
 
 class DatabaseChecker:
@@ -31,10 +31,8 @@ class DatabaseChecker:
     def setup_connections(self):
         """建立数据库连接"""
         try:
-            # 连接ChromaDB
-            self.chroma_client = chromadb.PersistentClient(
-                path=settings.chroma_persist_directory
-            )
+            # 连接ChromaDB（按CHROMA_MODE使用本地持久化目录或Chroma服务）
+            self.chroma_client = get_chroma_client()
             
             # 获取集合
             try:
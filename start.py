@@ -240,14 +240,24 @@ def start_server():
                         env['OPENAI_API_KEY'] = line.split('=', 1)[1]
                     elif line.startswith('OPENAI_BASE_URL='):
                         env['OPENAI_BASE_URL'] = line.split('=', 1)[1]
+                    elif line.startswith('APP_WORKERS=') and 'APP_WORKERS' not in os.environ:
+                        env['APP_WORKERS'] = line.split('=', 1)[1]
 
-        subprocess.run([
+        command = [
             sys.executable, "-m", "uvicorn",
             "backend.app.main:app",
             "--host", "0.0.0.0",
-            "--port", str(port),
-            "--reload"
-        ], check=True, env=env)
+            "--port", str(port)
+        ]
+        # 多个工作进程共享存储目录，写操作由文件锁串行化；多进程模式不支持自动重载
+        workers = int(env.get('APP_WORKERS') or 1)
+        if workers > 1:
+            print(f"👥 工作进程数: {workers}")
+            command += ["--workers", str(workers)]
+        else:
+            command.append("--reload")
+
+        subprocess.run(command, check=True, env=env)
     except KeyboardInterrupt:
         print("\n👋 服务器已停止")
     except Exception as e:
@@ -0,0 +1,92 @@
+"""
+测试公共配置
+在导入 backend.config 之前把数据和存储目录指向临时目录，并使用离线模拟后端，
+测试不会读写项目自身的 data/storage，也不会调用外部接口
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_TEST_ROOT = Path(tempfile.mkdtemp(prefix="rag-tests-"))
+os.environ.update({
+    "LLM_BACKEND": "fake",
+    "FAKE_EMBEDDING_DIM": "64",
+    "FAKE_LLM_LATENCY_MS": "0",
+    "FAKE_LLM_TOKENS_PER_SECOND": "100000",
+    "DATA_DIR": str(_TEST_ROOT / "data"),
+    "STORAGE_DIR": str(_TEST_ROOT / "storage"),
+    "CHROMA_PERSIST_DIRECTORY": str(_TEST_ROOT / "storage"),
+    "CHROMA_MODE": "embedded",
+    "APP_WORKERS": "1",
+})
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def _session_service():
+    from backend.app.rag_service import RAGService
+    return RAGService()
+
+
+@pytest.fixture
+def rag_service(_session_service):
+    """共享的RAG服务（离线模拟后端）；每个测试开始前清空data目录并同步，索引中不留其他测试的文档"""
+    from backend.config import settings
+
+    data_dir = Path(settings.data_dir)
+    for path in data_dir.glob("*.txt"):
+        path.unlink()
+    _session_service.load_documents(mode="sync")
+    return _session_service
+
+
+@pytest.fixture
+def data_dir():
+    """测试使用的data目录"""
+    from backend.config import settings
+    return Path(settings.data_dir)
+
+
+@pytest.fixture
+def job_store_path(tmp_path):
+    """共享任务表的路径"""
+    return str(tmp_path / "jobs.db")
+
+
+@pytest.fixture
+def client(rag_service, job_store_path, monkeypatch):
+    """使用共享RAG服务的接口测试客户端（不触发启动事件，避免再创建一个服务实例）"""
+    from fastapi.testclient import TestClient
+
+    from backend.app import main
+    from backend.app.jobs import JobQueue, JobStore
+
+    queue = JobQueue(workers=1, store=JobStore(job_store_path))
+    monkeypatch.setattr(main, "rag_service", rag_service)
+    monkeypatch.setattr(main, "job_queue", queue)
+    yield TestClient(main.app)
+    queue.shutdown()
+
+
+@pytest.fixture
+def wait_for_job(client):
+    """轮询任务接口直到任务结束，返回最终状态"""
+    import time
+
+    def wait(job_id, timeout=30.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = client.get(f"/api/jobs/{job_id}")
+            assert response.status_code == 200
+            job = response.json()
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.05)
+        raise AssertionError(f"任务未在 {timeout} 秒内结束: {job_id}")
+
+    return wait
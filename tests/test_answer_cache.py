@@ -0,0 +1,82 @@
+"""问答缓存测试"""
+from backend.app.answer_cache import AnswerCache, normalize_question
+
+RESULT = {"success": True, "answer": "回答", "sources": [], "total_sources": 0}
+
+
+def test_normalize_question():
+    assert normalize_question("  贵阳 的 美食？ ") == normalize_question("贵阳 的 美食")
+    assert normalize_question("ＡＢＣ  def!") == "abc def"
+
+
+def test_hit_after_put_and_invalidation_by_file():
+    cache = AnswerCache()
+    cache.put("贵阳有什么美食？", ("p",), RESULT, filenames=["a.txt"])
+    assert cache.get("贵阳有什么美食", ("p",)) == RESULT
+    assert cache.get("贵阳有什么美食", ("other",)) is None
+
+    assert cache.invalidate_files(["b.txt"]) == 0
+    assert cache.get("贵阳有什么美食", ("p",)) == RESULT
+    assert cache.invalidate_files(["a.txt"]) == 1
+    assert cache.get("贵阳有什么美食", ("p",)) is None
+
+
+def test_put_skipped_when_invalidated_during_query():
+    cache = AnswerCache()
+    # 查询在检索前记下版本号，检索期间有文件被更新
+    version = cache.version
+    cache.invalidate_files(["a.txt"])
+    assert cache.put("问题", ("p",), RESULT, filenames=["a.txt"], version=version) is False
+    assert cache.get("问题", ("p",)) is None
+
+    version = cache.version
+    assert cache.put("问题", ("p",), RESULT, filenames=["a.txt"], version=version) is True
+    assert cache.get("问题", ("p",)) == RESULT
+
+    version = cache.version
+    cache.clear()
+    assert cache.put("问题", ("p",), RESULT, filenames=["a.txt"], version=version) is False
+
+
+def test_lru_eviction_and_ttl():
+    cache = AnswerCache(max_entries=2)
+    for question in ("一", "二", "三"):
+        cache.put(question, (), RESULT, filenames=[])
+    assert cache.get("一", ()) is None
+    assert len(cache) == 2
+
+    expired = AnswerCache(ttl_seconds=-1)
+    expired.put("问题", (), RESULT, filenames=[])
+    assert expired.get("问题", ()) is None
+
+
+def test_semantic_match():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.put("贵阳美食", (), RESULT, filenames=[], embedding=[1.0, 0.0])
+    assert cache.get("贵阳的美食有哪些", (), embedding=[0.99, 0.05]) == RESULT
+    assert cache.get("贵阳的历史", (), embedding=[0.0, 1.0]) is None
+
+
+def test_cached_answer_invalidated_by_upload(client):
+    def upload(text):
+        response = client.post(
+            "/api/documents/upload",
+            files={"file": ("park.txt", text.encode("utf-8"), "text/plain")}
+        )
+        assert response.status_code == 200
+
+    def ask():
+        response = client.post("/api/query", json={"query": "黔灵山公园有什么"})
+        assert response.status_code == 200
+        return response.json()
+
+    upload("黔灵山公园里有很多猕猴。")
+    first = ask()
+    assert first["sources"] and not first["cached"]
+    assert ask()["cached"]
+
+    # 重新上传被引用的文件后，缓存的回答失效
+    upload("黔灵山公园里有弘福寺和很多猕猴。")
+    after = ask()
+    assert not after["cached"]
+    assert "弘福寺" in after["sources"][0]["content"]
@@ -0,0 +1,56 @@
+"""分块器与块位置测试"""
+from typing import List
+
+import pytest
+from llama_index.core.node_parser import TextSplitter
+
+from backend.app.chunker import CJKTextSplitter, make_splitter
+from backend.app.ingestion import chunk_spans
+
+TEXT = (
+    "贵阳是贵州省的省会。" * 10
+    + "\n\n"
+    + "花溪公园位于南郊，青岩古镇有很多明清建筑。" * 8
+)
+
+
+class FixedSplitter(TextSplitter):
+    """不提供 split_spans 的分块器：按固定字符数切分并去掉首尾空白"""
+
+    size: int = 30
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[i:i + self.size].strip() for i in range(0, len(text), self.size)]
+
+
+def test_cjk_spans_match_chunk_text():
+    splitter = make_splitter("cjk", chunk_size=64, chunk_overlap=16)
+    assert isinstance(splitter, CJKTextSplitter)
+    spans = chunk_spans(splitter, TEXT)
+    chunks = splitter.split_text(TEXT)
+    assert len(spans) == len(chunks) > 1
+    assert [TEXT[start:end] for start, end in spans] == chunks
+    # 相邻块有重叠或首尾相接，覆盖全文
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT.rstrip())
+    for (_, previous_end), (start, _) in zip(spans, spans[1:]):
+        assert start <= previous_end + 2
+
+
+def test_cjk_chunks_respect_token_budget():
+    splitter = make_splitter("cjk", chunk_size=64, chunk_overlap=16)
+    tokenizer = splitter._count
+    assert all(tokenizer(chunk) <= 64 for chunk in splitter.split_text(TEXT))
+
+
+def test_chunk_spans_fallback_finds_positions():
+    splitter = FixedSplitter()
+    spans = chunk_spans(splitter, TEXT)
+    assert [TEXT[start:end] for start, end in spans] == splitter.split_text(TEXT)
+
+
+def test_make_splitter_validation():
+    with pytest.raises(ValueError):
+        make_splitter("unknown", 512, 50)
+    with pytest.raises(ValueError):
+        make_splitter("cjk", 64, 64)
+
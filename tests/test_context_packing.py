@@ -0,0 +1,86 @@
+"""上下文打包测试"""
+from llama_index.core.schema import MetadataMode, NodeWithScore, TextNode
+
+from backend.app.context_packing import merge_passages, pack_context
+
+DOCUMENT = "甲秀楼位于南明河上。" + "黔灵山公园有很多猕猴。" + "青岩古镇是明代军事重镇。"
+
+
+def char_tokenizer(text):
+    """每个字符计为一个词元"""
+    return list(text)
+
+
+def span_node(filename, start, end, score, text=DOCUMENT):
+    node = TextNode(
+        text=text[start:end], metadata={"filename": filename},
+        start_char_idx=start, end_char_idx=end
+    )
+    return NodeWithScore(node=node, score=score)
+
+
+def texts(nodes):
+    return [node.node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes]
+
+
+def test_overlapping_chunks_merge_without_duplicating_text():
+    nodes = [span_node("a.txt", 8, 25, 0.9), span_node("a.txt", 0, 12, 0.6)]
+    passages = merge_passages(nodes)
+    assert len(passages) == 1
+    assert passages[0].text == DOCUMENT[0:25]
+    assert passages[0].score == 0.9
+
+
+def test_adjacent_chunks_merge_and_distant_chunks_stay_apart():
+    assert [p.text for p in merge_passages([
+        span_node("a.txt", 0, 10, 0.5), span_node("a.txt", 10, 21, 0.4)
+    ])] == [DOCUMENT[0:21]]
+
+    passages = merge_passages([span_node("a.txt", 0, 5, 0.5), span_node("a.txt", 21, 30, 0.8)])
+    assert [p.text for p in passages] == [DOCUMENT[21:30], DOCUMENT[0:5]]
+
+
+def test_same_span_in_different_files_not_merged():
+    passages = merge_passages([span_node("a.txt", 0, 10, 0.5), span_node("b.txt", 5, 15, 0.4)])
+    assert len(passages) == 2
+
+
+def test_duplicate_chunks_without_positions_deduplicated():
+    node = NodeWithScore(node=TextNode(text="重复的块", metadata={"filename": "a.txt"}), score=0.5)
+    copy = NodeWithScore(node=TextNode(text="重复的块", metadata={"filename": "a.txt"}), score=0.4)
+    assert len(merge_passages([node, copy])) == 1
+
+
+def test_pack_respects_budget_and_truncates_last_passage():
+    nodes = [
+        span_node("a.txt", 0, 10, 0.9),
+        span_node("b.txt", 0, 30, 0.8, text="x" * 60),
+        span_node("c.txt", 0, 10, 0.1),
+    ]
+    budget = 300
+    packed = pack_context(nodes, budget, char_tokenizer)
+    used = sum(len(n.node.get_content(metadata_mode=MetadataMode.LLM)) for n in packed)
+    assert used <= budget
+    assert texts(packed)[0] == DOCUMENT[0:10]
+
+    # 预算只够第一段和第二段的一部分
+    first = len(packed[0].node.get_content(metadata_mode=MetadataMode.LLM))
+    small = pack_context(nodes, first + 40, char_tokenizer)
+    assert len(small) == 2
+    assert 0 < len(texts(small)[1]) < 30
+    assert sum(len(n.node.get_content(metadata_mode=MetadataMode.LLM)) for n in small) <= first + 40
+
+
+def test_ingested_chunks_record_positions_in_source(rag_service, data_dir):
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+    # 打包时按块的字符位置合并，写入的块需要记录其在原文中的位置
+    text = "\n\n".join([DOCUMENT * 8] * 12)
+    (data_dir / "guiyang.txt").write_text(text, encoding="utf-8")
+    rag_service.load_documents(mode="sync")
+    ids = rag_service.registry.get_chunk_ids("guiyang.txt")
+    result = rag_service.collection.get(ids=ids, include=["documents", "metadatas"])
+    assert len(result["ids"]) > 1
+    for chunk, metadata in zip(result["documents"], result["metadatas"]):
+        node = metadata_dict_to_node(metadata)
+        assert text[node.start_char_idx:node.end_char_idx] == chunk
@@ -0,0 +1,126 @@
+"""文档注册表与增量同步测试"""
+import os
+
+from backend.app import rag_service as rag_service_module
+from backend.app.document_registry import DocumentRegistry
+
+TEXT_A = "贵阳是贵州省的省会，气候凉爽，被称为避暑之都。\n\n甲秀楼是贵阳的标志性建筑。"
+TEXT_B = "花溪公园位于贵阳南郊。青岩古镇以明清建筑和卤猪脚闻名。"
+
+
+def test_registry_add_filter_and_remove(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "documents.db"))
+    registry.add_chunks([
+        ("a-1", {"filename": "a.txt", "file_size": 10, "file_modified": "100.0", "file_hash": "h1"}),
+        ("a-2", {"filename": "a.txt", "file_size": 10, "file_modified": "100.0", "file_hash": "h1"}),
+        ("b-1", {"filename": "notes-b.txt", "file_size": 5, "file_modified": "200.0", "file_hash": "h2"}),
+    ])
+    assert registry.document_count() == 2
+    assert registry.chunk_count() == 3
+    assert sorted(registry.get_chunk_ids("a.txt")) == ["a-1", "a-2"]
+    assert registry.filter_filenames(prefix="notes") == ["notes-b.txt"]
+    assert registry.filter_filenames(modified_after=150) == ["notes-b.txt"]
+
+    registry.update_stat("a.txt", 12, "300.0")
+    assert registry.get("a.txt")["file_size"] == 12
+    assert registry.get("a.txt")["file_modified"] == "300.0"
+    assert registry.get("a.txt")["chunks_count"] == 2
+
+    assert sorted(registry.remove(["a.txt"])) == ["a-1", "a-2"]
+    assert registry.get("a.txt") is None
+    assert registry.chunk_count() == 1
+
+
+def test_sync_detects_new_changed_and_removed_files(rag_service, data_dir):
+    (data_dir / "a.txt").write_text(TEXT_A, encoding="utf-8")
+    (data_dir / "b.txt").write_text(TEXT_B, encoding="utf-8")
+    result = rag_service.load_documents(mode="sync")
+    assert result["success"]
+    assert sorted(result["new_files"]) == ["a.txt", "b.txt"]
+
+    result = rag_service.load_documents(mode="sync")
+    assert result["documents_processed"] == 0
+    assert result["unchanged_files"] == 2
+
+    (data_dir / "a.txt").write_text(TEXT_A + "\n\n新增一段关于黔灵山的介绍。", encoding="utf-8")
+    (data_dir / "b.txt").unlink()
+    result = rag_service.load_documents(mode="sync")
+    assert [item["filename"] for item in result["replaced_files"]] == ["a.txt"]
+    assert [item["filename"] for item in result["removed_files"]] == ["b.txt"]
+    assert rag_service.registry.get("b.txt") is None
+    assert rag_service.collection.count() == rag_service.registry.chunk_count()
+
+
+def test_sync_refreshes_stat_when_content_unchanged(rag_service, data_dir, monkeypatch):
+    path = data_dir / "a.txt"
+    path.write_text(TEXT_A, encoding="utf-8")
+    rag_service.load_documents(mode="sync")
+
+    # 只改修改时间，内容不变
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 100))
+
+    hashed = []
+    original = rag_service_module.file_sha256
+
+    def counting_sha256(file_path, *args, **kwargs):
+        hashed.append(file_path.name)
+        return original(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(rag_service_module, "file_sha256", counting_sha256)
+    result = rag_service.load_documents(mode="sync")
+    assert result["unchanged_files"] == 1
+    assert hashed == ["a.txt"]
+    assert rag_service.registry.get("a.txt")["file_modified"] == str(path.stat().st_mtime)
+
+    # 登记信息已更新，再次同步按大小和修改时间直接跳过，不再计算哈希
+    result = rag_service.load_documents(mode="sync")
+    assert result["unchanged_files"] == 1
+    assert hashed == ["a.txt"]
+
+
+def test_sync_reingests_file_after_partial_write_failure(rag_service, data_dir, monkeypatch):
+    path = data_dir / "long.txt"
+    path.write_text("\n\n".join(f"第{i}段：" + TEXT_A * 6 for i in range(12)), encoding="utf-8")
+    monkeypatch.setattr(rag_service.ingestion, "batch_size", 2)
+
+    original = rag_service.ingestion._embed_batch
+    calls = []
+
+    def failing_embed(batch):
+        calls.append(len(batch))
+        if len(calls) > 1:
+            raise RuntimeError("嵌入接口不可用")
+        return original(batch)
+
+    monkeypatch.setattr(rag_service.ingestion, "_embed_batch", failing_embed)
+    result = rag_service.load_documents(mode="sync")
+    assert not result["success"]
+    # 已写入的第一批数据被清除，注册表中也没有该文件
+    assert rag_service.registry.get("long.txt") is None
+    assert rag_service.collection.count() == rag_service.registry.chunk_count() == 0
+
+    monkeypatch.setattr(rag_service.ingestion, "_embed_batch", original)
+    result = rag_service.load_documents(mode="sync")
+    assert result["new_files"] == ["long.txt"]
+    stored = rag_service.registry.get("long.txt")
+    assert stored["chunks_count"] > 2
+    assert stored["file_size"] == path.stat().st_size
+    assert stored["file_hash"]
+    assert rag_service.collection.count() == stored["chunks_count"]
+
+    result = rag_service.load_documents(mode="sync")
+    assert result["unchanged_files"] == 1
+
+
+def test_registry_skips_stat_until_file_complete(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "documents.db"))
+    metadata = {"filename": "a.txt", "file_size": 10, "file_modified": "100.0", "file_hash": "h1"}
+    registry.add_chunks([("a-1", metadata)], record_stat=False)
+    stored = registry.get("a.txt")
+    assert (stored["file_size"], stored["file_modified"], stored["file_hash"]) == (0, "", "")
+    assert stored["chunks_count"] == 1
+
+    registry.update_stat("a.txt", 10, "100.0", "h1")
+    stored = registry.get("a.txt")
+    assert (stored["file_size"], stored["file_modified"], stored["file_hash"]) == (10, "100.0", "h1")
@@ -0,0 +1,26 @@
+"""嵌入缓存测试"""
+from backend.app.embedding_cache import EmbeddingCache
+
+
+def test_get_and_put(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.db"))
+    cache.put_many("m", ["甲", "乙"], [[1.0, 2.0], [3.0, 4.0]])
+    assert cache.get_many("m", ["乙", "丙", "甲"]) == [[3.0, 4.0], None, [1.0, 2.0]]
+    assert cache.get_many("other", ["甲"]) == [None]
+    assert len(cache) == 2
+
+
+def test_eviction_counts_entries_written_by_other_workers(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    # 两个实例模拟共享同一缓存文件的两个工作进程
+    first = EmbeddingCache(db_path, max_entries=3)
+    second = EmbeddingCache(db_path, max_entries=3)
+    first.put_many("m", ["a", "b"], [[1.0], [2.0]])
+    second.put_many("m", ["c", "d"], [[3.0], [4.0]])
+    assert len(second) == 3
+
+    first.put_many("m", ["e"], [[5.0]])
+    assert len(first) == 3
+    count = first._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    assert count == 3
+    assert first.get_many("m", ["e"]) == [[5.0]]
@@ -0,0 +1,47 @@
+"""混合检索测试：持久化BM25索引与Chroma向量检索"""
+import pytest
+
+from backend.config import settings
+
+DOCUMENTS = {
+    "food.txt": "贵阳的酸汤鱼和丝娃娃很有名。",
+    "tea.txt": "都匀毛尖是贵州的名茶，茶汤清澈。",
+    "park.txt": "黔灵山公园里有很多猕猴。",
+}
+
+
+@pytest.fixture
+def loaded_service(rag_service, data_dir):
+    for filename, text in DOCUMENTS.items():
+        (data_dir / filename).write_text(text, encoding="utf-8")
+    rag_service.load_documents(mode="sync")
+    return rag_service
+
+
+def source_files(result):
+    return [source["filename"] for source in result["sources"]]
+
+
+@pytest.mark.parametrize("mode", ["hybrid", "keyword", "vector"])
+def test_query_finds_matching_document(loaded_service, monkeypatch, mode):
+    monkeypatch.setattr(settings, "retrieval_mode", mode)
+    result = loaded_service.query("酸汤鱼", similarity_threshold=0.0)
+    assert result["success"]
+    assert source_files(result)[0] == "food.txt"
+
+
+def test_keyword_index_follows_writes(loaded_service):
+    assert loaded_service.keyword_index.count() == loaded_service.collection.count()
+    hits = loaded_service.keyword_index.search("猕猴")
+    assert hits and hits[0][0] in loaded_service.registry.get_chunk_ids("park.txt")
+
+    assert loaded_service.delete_document("park.txt")["success"]
+    assert loaded_service.keyword_index.search("猕猴") == []
+    assert loaded_service.keyword_index.count() == loaded_service.collection.count()
+
+
+def test_keyword_hits_bypass_similarity_threshold(loaded_service, monkeypatch):
+    # 相似度阈值只作用于向量结果，关键词命中仍可进入融合结果
+    monkeypatch.setattr(settings, "retrieval_mode", "hybrid")
+    result = loaded_service.query("茶", similarity_threshold=1.0)
+    assert source_files(result) == ["tea.txt"]
@@ -0,0 +1,95 @@
+"""后台任务队列与共享任务表测试"""
+import json
+import threading
+
+from backend.app.jobs import JobQueue, JobStore
+
+
+def test_job_visible_from_other_queue_sharing_store(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    release = threading.Event()
+
+    def work(progress):
+        progress("a.txt", {"status": "processing"})
+        release.wait(5)
+        progress("a.txt", {"status": "done", "chunks": 3})
+        return {"success": True, "message": "完成"}
+
+    submitter = JobQueue(workers=1, store=JobStore(db_path))
+    # 模拟另一个工作进程：独立的队列和数据库连接
+    other = JobQueue(workers=1, store=JobStore(db_path))
+    try:
+        job = submitter.submit("upload", work)
+        state = other.get(job.id)
+        assert state is not None
+        assert state["kind"] == "upload"
+        assert state["status"] in ("queued", "running")
+
+        release.set()
+        submitter.shutdown()
+        state = other.get(job.id)
+        assert state["status"] == "succeeded"
+        assert state["chunks"] == 3
+        assert state["files_done"] == 1
+        assert state["result"]["message"] == "完成"
+    finally:
+        release.set()
+        other.shutdown()
+
+
+def test_unknown_job_returns_none(tmp_path):
+    queue = JobQueue(workers=1, store=JobStore(str(tmp_path / "jobs.db")))
+    try:
+        assert queue.get("missing") is None
+    finally:
+        queue.shutdown()
+
+
+def test_unfinished_job_of_exited_process_reported_failed(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    state = {"job_id": "j1", "kind": "load", "status": "running", "created_at": 1.0,
+             "finished_at": None, "error": None}
+    store.save(state)
+    # 改写为一个不存在的进程号
+    store._conn.execute("UPDATE jobs SET pid = ? WHERE job_id = ?", (2 ** 22 + 1, "j1"))
+    loaded = store.load("j1")
+    assert loaded["status"] == "failed"
+    assert loaded["error"]
+
+
+def test_store_keeps_only_recent_finished_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), max_finished=2)
+    for i in range(4):
+        store.save({"job_id": f"j{i}", "status": "succeeded", "created_at": float(i),
+                    "finished_at": float(i), "error": None})
+    assert store.load("j0") is None
+    assert store.load("j1") is None
+    assert json.dumps(store.load("j3"))
+
+
+def test_progress_saves_are_throttled(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), progress_interval=60)
+    saved = []
+    original = store.save
+
+    def counting_save(state):
+        saved.append(state["status"])
+        original(state)
+
+    store.save = counting_save
+
+    def work(progress):
+        for i in range(500):
+            progress(f"{i}.txt", {"status": "done", "chunks": 1})
+        return {"success": True, "message": "完成"}
+
+    queue = JobQueue(workers=1, store=store)
+    try:
+        job = queue.submit("load", work)
+    finally:
+        queue.shutdown()
+    # 只在提交、开始和结束时写入，间隔内的进度更新都被跳过
+    assert saved == ["queued", "running", "succeeded"]
+    state = JobStore(str(tmp_path / "jobs.db")).load(job.id)
+    assert state["files_done"] == 500
+    assert state["chunks"] == 500
@@ -0,0 +1,66 @@
+"""后台任务接口测试"""
+
+
+def test_background_upload_job(client, wait_for_job):
+    response = client.post(
+        "/api/documents/upload", params={"background": "true"},
+        files={"file": ("tea.txt", "都匀毛尖是贵州的名茶。".encode("utf-8"), "text/plain")}
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["kind"] == "upload"
+
+    job = wait_for_job(job["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["files_done"] == 1
+    assert job["chunks"] >= 1
+    assert job["files"][0]["filename"] == "tea.txt"
+    assert job["result"]["success"]
+
+    status = client.get("/api/status").json()
+    assert status["files_count"] == 1
+    assert status["documents_count"] == job["chunks"]
+
+
+def test_background_load_job(client, data_dir, wait_for_job):
+    (data_dir / "a.txt").write_text("甲秀楼位于南明河上。", encoding="utf-8")
+    response = client.post("/api/load-documents", params={"background": "true"})
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+    assert job["kind"] == "load"
+    assert job["status"] == "succeeded"
+    assert job["result"]["new_files"] == ["a.txt"]
+
+
+def test_failed_job_reports_error(client, wait_for_job):
+    # data目录为空时加载失败
+    response = client.post("/api/load-documents", params={"background": "true"})
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "failed"
+    assert job["error"]
+
+
+def test_unknown_job_returns_404(client):
+    assert client.get("/api/jobs/does-not-exist").status_code == 404
+
+
+def test_job_visible_from_another_worker(client, data_dir, job_store_path, wait_for_job,
+                                         monkeypatch):
+    from backend.app import main
+    from backend.app.jobs import JobQueue, JobStore
+
+    (data_dir / "a.txt").write_text("甲秀楼位于南明河上。", encoding="utf-8")
+    response = client.post("/api/load-documents", params={"background": "true"})
+    job_id = response.json()["job_id"]
+    finished = wait_for_job(job_id)
+
+    # 查询请求落到另一个工作进程：该进程的队列中没有这个任务，从共享任务表读取
+    other = JobQueue(workers=1, store=JobStore(job_store_path))
+    monkeypatch.setattr(main, "job_queue", other)
+    try:
+        response = client.get(f"/api/jobs/{job_id}")
+        assert response.status_code == 200
+        assert response.json()["status"] == finished["status"] == "succeeded"
+        assert response.json()["result"] == finished["result"]
+    finally:
+        other.shutdown()
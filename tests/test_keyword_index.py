@@ -0,0 +1,66 @@
+"""中日韩分词与BM25关键词索引测试"""
+from backend.app.keyword_index import KeywordIndex, tokenize
+
+
+def test_tokenize_cjk_bigrams_and_words():
+    assert tokenize("贵阳美食") == ["贵阳", "阳美", "美食"]
+    assert tokenize("茶") == ["茶"]
+    assert tokenize("LlamaIndex检索v0.12版本") == ["llamaindex", "检索", "v0.12", "版本"]
+    # 全角字符规范化为半角
+    assert tokenize("ＲＡＧ应用") == ["rag", "应用"]
+
+
+def test_tokenize_index_terms_include_unigrams():
+    assert tokenize("贵阳美食", unigrams=True) == ["贵", "阳", "美", "食", "贵阳", "阳美", "美食"]
+    assert tokenize("茶", unigrams=True) == ["茶"]
+
+
+def make_index(tmp_path):
+    index = KeywordIndex(str(tmp_path / "keyword_index.db"))
+    index.add([
+        ("c1", "tea.txt", "都匀毛尖是贵州的名茶，茶汤清澈。"),
+        ("c2", "food.txt", "贵阳的酸汤鱼和丝娃娃很有名。"),
+        ("c3", "park.txt", "黔灵山公园里有很多猕猴。"),
+    ])
+    return index
+
+
+def test_search_ranks_matching_chunk(tmp_path):
+    index = make_index(tmp_path)
+    assert index.count() == 3
+    assert index.search("酸汤鱼")[0][0] == "c2"
+    assert index.search("黔灵山 猕猴")[0][0] == "c3"
+    assert index.search("完全无关") == []
+
+
+def test_single_character_query_matches(tmp_path):
+    index = make_index(tmp_path)
+    hits = index.search("茶")
+    assert [chunk_id for chunk_id, _ in hits] == ["c1"]
+
+
+def test_search_filter_and_delete(tmp_path):
+    index = make_index(tmp_path)
+    assert index.search("贵州 贵阳", filenames={"food.txt"})[0][0] == "c2"
+    assert all(chunk_id == "c2" for chunk_id, _ in index.search("贵阳", filenames={"food.txt"}))
+
+    index.delete(["c2"])
+    assert index.count() == 2
+    assert index.search("酸汤鱼") == []
+
+    # 覆盖写入同一块ID
+    index.add([("c1", "tea.txt", "遵义红是红茶。")])
+    assert index.count() == 2
+    assert index.search("毛尖") == []
+    assert index.search("红茶")[0][0] == "c1"
+
+
+def test_old_tokenizer_version_needs_rebuild(tmp_path):
+    index = make_index(tmp_path)
+    assert index.tokenizer_current()
+    index._conn.execute("UPDATE stats SET value = 1 WHERE key = 'tokenizer_version'")
+    reopened = KeywordIndex(str(tmp_path / "keyword_index.db"))
+    assert not reopened.tokenizer_current()
+    reopened.clear()
+    assert reopened.tokenizer_current()
+    assert reopened.count() == 0
@@ -0,0 +1,64 @@
+"""/metrics 接口测试：各阶段耗时、按路由模板统计的请求耗时和缓存计数"""
+import re
+
+import pytest
+
+from backend.config import settings
+
+
+def samples(text, name):
+    """返回指标名为 name 的全部样本：[(标签字典, 数值)]"""
+    result = []
+    for match in re.finditer(rf"^{name}(?:\{{(.*)\}})? (\S+)$", text, re.MULTILINE):
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', match.group(1) or ""))
+        result.append((labels, float(match.group(2))))
+    return result
+
+
+@pytest.fixture
+def exercised_client(client, monkeypatch):
+    """先上传一个文件并查询两次（第二次命中问答缓存），再删除该文件"""
+    monkeypatch.setattr(settings, "retrieval_mode", "hybrid")
+    response = client.post(
+        "/api/documents/upload",
+        files={"file": ("metrics.txt", "遵义会议会址位于遵义老城。".encode("utf-8"), "text/plain")}
+    )
+    assert response.status_code == 200
+    for _ in range(2):
+        response = client.post("/api/query", json={"query": "遵义会议会址", "similarity_threshold": 0.0})
+        assert response.status_code == 200
+    assert client.delete("/api/documents/metrics.txt").status_code == 200
+    return client
+
+
+def test_metrics_after_query_and_upload(exercised_client):
+    response = exercised_client.get("/metrics")
+    assert response.status_code == 200
+    text = response.text
+
+    stages = {
+        labels["stage"] for labels, value in samples(text, "rag_stage_duration_seconds_count")
+        if value > 0
+    }
+    assert {
+        "query_embedding", "vector_retrieval", "keyword_retrieval", "llm_synthesis",
+        "chunking", "embedding_batch", "chroma_write",
+    } <= stages
+
+    routes = {
+        (labels["method"], labels["route"], labels["status"])
+        for labels, _ in samples(text, "rag_http_request_duration_seconds_count")
+    }
+    assert ("POST", "/api/documents/upload", "200") in routes
+    assert ("POST", "/api/query", "200") in routes
+    # 路径参数按路由模板归并，不会出现具体文件名
+    assert ("DELETE", "/api/documents/{filename}", "200") in routes
+    assert not any("metrics.txt" in route for _, route, _ in routes)
+
+    cache = {
+        (labels["cache"], labels["result"]): value
+        for labels, value in samples(text, "rag_cache_requests_total")
+    }
+    assert cache[("answer", "miss")] >= 1
+    assert cache[("answer", "hit")] >= 1
+    assert cache[("embedding", "miss")] >= 1
@@ -0,0 +1,53 @@
+"""并行分块测试：多进程分块与单线程分块写入的结果一致"""
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+PARAGRAPH = "贵阳是贵州省的省会，气候凉爽。甲秀楼位于南明河上，是贵阳的标志性建筑。"
+FILES = {
+    f"city-{i}.txt": "\n\n".join(f"第{j}段：" + PARAGRAPH * (i + 2) for j in range(10))
+    for i in range(4)
+}
+
+
+def ingested_chunks(service):
+    """按文件返回已写入的块：{文件名: [(起始位置, 结束位置, 块文本)]}，并检查各处登记的块ID一致"""
+    chunks = {}
+    for filename in FILES:
+        ids = service.registry.get_chunk_ids(filename)
+        assert len(ids) == len(set(ids)) == service.registry.get(filename)["chunks_count"]
+        result = service.collection.get(ids=ids, include=["documents", "metadatas"])
+        assert sorted(result["ids"]) == sorted(ids)
+        spans = []
+        for text, metadata in zip(result["documents"], result["metadatas"]):
+            node = metadata_dict_to_node(metadata)
+            spans.append((node.start_char_idx, node.end_char_idx, text))
+        chunks[filename] = sorted(spans)
+    assert service.keyword_index.count() == service.collection.count()
+    return chunks
+
+
+def test_parallel_chunking_matches_serial(rag_service, data_dir, monkeypatch):
+    for filename, text in FILES.items():
+        (data_dir / filename).write_text(text, encoding="utf-8")
+    ingestion = rag_service.ingestion
+    monkeypatch.setattr(ingestion, "chunk_processes", 1)
+    rag_service.load_documents(mode="full")
+    serial = ingested_chunks(rag_service)
+    assert all(len(spans) > 1 for spans in serial.values())
+
+    monkeypatch.setattr(ingestion, "chunk_processes", 2)
+    monkeypatch.setattr(ingestion, "parallel_min_bytes", 0)
+    files = [(data_dir / filename, filename) for filename in FILES]
+    assert ingestion._chunk_process_count(files) == 2
+
+    calls = []
+    original = ingestion._iter_batches_parallel
+
+    def tracking_parallel(*args, **kwargs):
+        calls.append(args[-1])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(ingestion, "_iter_batches_parallel", tracking_parallel)
+    result = rag_service.load_documents(mode="full")
+    assert result["success"]
+    assert calls == [2]
+    assert ingested_chunks(rag_service) == serial
@@ -0,0 +1,80 @@
+"""查询元数据筛选测试：文件名、前缀和修改时间范围"""
+import os
+
+import pytest
+
+from backend.app.rag_service import NO_CONTEXT_ANSWER
+from backend.config import settings
+
+DOCUMENTS = {
+    "guiyang-food.txt": ("贵阳的酸汤鱼和丝娃娃很有名。", 1_000_000.0),
+    "guiyang-park.txt": ("黔灵山公园里有很多猕猴，酸汤鱼店就在公园附近。", 2_000_000.0),
+    "zunyi-food.txt": ("遵义的羊肉粉和酸汤鱼都很受欢迎。", 3_000_000.0),
+}
+
+
+@pytest.fixture
+def loaded_service(rag_service, data_dir, monkeypatch):
+    for filename, (text, mtime) in DOCUMENTS.items():
+        path = data_dir / filename
+        path.write_text(text, encoding="utf-8")
+        os.utime(path, (mtime, mtime))
+    rag_service.load_documents(mode="sync")
+    monkeypatch.setattr(settings, "retrieval_mode", "hybrid")
+    return rag_service
+
+
+def source_files(result):
+    return sorted({source["filename"] for source in result["sources"]})
+
+
+def test_filter_by_filenames(loaded_service):
+    result = loaded_service.query(
+        "酸汤鱼", similarity_threshold=0.0, filters={"filenames": ["zunyi-food.txt"]}
+    )
+    assert result["success"]
+    assert source_files(result) == ["zunyi-food.txt"]
+
+
+def test_filter_by_prefix(loaded_service):
+    result = loaded_service.query(
+        "酸汤鱼", similarity_threshold=0.0, filters={"filename_prefix": "guiyang"}
+    )
+    assert source_files(result) == ["guiyang-food.txt", "guiyang-park.txt"]
+
+
+def test_filter_by_modified_range(loaded_service):
+    result = loaded_service.query(
+        "酸汤鱼", similarity_threshold=0.0, filters={"modified_after": 1_500_000.0}
+    )
+    assert source_files(result) == ["guiyang-park.txt", "zunyi-food.txt"]
+
+    result = loaded_service.query(
+        "酸汤鱼", similarity_threshold=0.0,
+        filters={"modified_after": 1_500_000.0, "modified_before": 2_500_000.0}
+    )
+    assert source_files(result) == ["guiyang-park.txt"]
+
+
+def test_filters_are_combined(loaded_service):
+    result = loaded_service.query(
+        "酸汤鱼", similarity_threshold=0.0,
+        filters={"filename_prefix": "guiyang", "modified_before": 1_500_000.0}
+    )
+    assert source_files(result) == ["guiyang-food.txt"]
+
+
+def test_filter_matching_nothing_skips_llm(loaded_service, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("筛选结果为空时不应调用LLM")
+
+    monkeypatch.setattr(loaded_service.query_engine, "synthesize", fail)
+    monkeypatch.setattr(loaded_service.streaming_synthesizer, "synthesize", fail)
+    result = loaded_service.query("酸汤鱼", filters={"filename_prefix": "anshun"})
+    assert result["success"]
+    assert result["answer"] == NO_CONTEXT_ANSWER
+    assert result["sources"] == []
+
+    events = list(loaded_service.stream_query("酸汤鱼", filters={"modified_after": 9_000_000.0}))
+    assert [event["event"] for event in events] == ["sources", "token", "done"]
+    assert events[1]["data"]["text"] == NO_CONTEXT_ANSWER
@@ -0,0 +1,123 @@
+"""流式查询接口测试：SSE事件顺序、错误事件和客户端断开后的资源释放"""
+import json
+import threading
+
+import anyio
+import pytest
+
+from backend.app import main
+
+
+def parse_events(body):
+    """把SSE响应体解析为 (事件名, 数据) 列表"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def loaded_client(client, rag_service, data_dir):
+    (data_dir / "food.txt").write_text("贵阳的酸汤鱼和丝娃娃很有名。", encoding="utf-8")
+    rag_service.load_documents(mode="sync")
+    return client
+
+
+def test_stream_event_order(loaded_client):
+    response = loaded_client.post(
+        "/api/query/stream", json={"query": "酸汤鱼", "similarity_threshold": 0.0}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "sources"
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    assert events[0][1]["sources"][0]["filename"] == "food.txt"
+    assert "".join(data["text"] for name, data in events if name == "token")
+    assert events[-1][1]["cached"] is False
+    assert events[-1][1]["processing_time"] >= 0
+
+
+def test_stream_error_event(loaded_client, rag_service, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("检索失败")
+
+    monkeypatch.setattr(rag_service, "_retrieve_nodes", fail)
+    response = loaded_client.post("/api/query/stream", json={"query": "错误事件测试"})
+    assert response.status_code == 200
+    events = parse_events(response.text)
+    assert [name for name, _ in events] == ["error"]
+    assert "检索失败" in events[0][1]["message"]
+
+
+def test_closing_stream_releases_llm_slot(rag_service, data_dir):
+    (data_dir / "food.txt").write_text("贵阳的酸汤鱼和丝娃娃很有名。" * 20, encoding="utf-8")
+    rag_service.load_documents(mode="sync")
+    semaphore = rag_service._llm_semaphore
+    free = semaphore._value
+
+    events = rag_service.stream_query("丝娃娃", similarity_threshold=0.0)
+    for event in events:
+        if event["event"] == "token":
+            break
+    # 生成回答期间持有LLM并发额度，关闭生成器后归还
+    assert semaphore._value == free - 1
+    events.close()
+    assert semaphore._value == free
+
+
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+def test_client_disconnect_closes_stream(rag_service, monkeypatch, spec_version):
+    closed = threading.Event()
+    semaphore = rag_service._llm_semaphore
+    free = semaphore._value
+
+    def endless_stream(**kwargs):
+        with semaphore:
+            try:
+                yield {"event": "sources", "data": {"sources": [], "total_sources": 0}}
+                while True:
+                    yield {"event": "token", "data": {"text": "字"}}
+            finally:
+                closed.set()
+
+    monkeypatch.setattr(main, "rag_service", rag_service)
+    monkeypatch.setattr(rag_service, "stream_query", endless_stream)
+    body = json.dumps({"query": "断开测试"}).encode("utf-8")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": spec_version},
+        "http_version": "1.1", "method": "POST", "scheme": "http", "path": "/api/query/stream",
+        "raw_path": b"/api/query/stream", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 12345), "server": ("testserver", 80),
+    }
+
+    async def run():
+        first_chunk = anyio.Event()
+        requests = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                if first_chunk.is_set() and spec_version == "2.4":
+                    # ASGI 2.4：向已断开的客户端写入时服务器抛出 OSError
+                    raise OSError("客户端已断开")
+                first_chunk.set()
+
+        with anyio.fail_after(10):
+            try:
+                await main.app(scope, receive, send)
+            except Exception:
+                pass
+
+    anyio.run(run)
+    assert closed.wait(5)
+    assert semaphore._value == free
@@ -0,0 +1,75 @@
+"""RRF融合与自适应top-k测试"""
+from typing import List, Sequence, Tuple
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from backend.app.retrievers import (
+    AdaptiveTopKRetriever, HybridRetriever, adaptive_top_k, reciprocal_rank_fusion
+)
+
+
+def make_nodes(scored: Sequence[Tuple[str, float]]) -> List[NodeWithScore]:
+    return [NodeWithScore(node=TextNode(id_=node_id, text=node_id), score=score)
+            for node_id, score in scored]
+
+
+def ids(nodes: List[NodeWithScore]) -> List[str]:
+    return [node.node.node_id for node in nodes]
+
+
+class StaticRetriever(BaseRetriever):
+    """返回固定结果的检索器"""
+
+    def __init__(self, scored: Sequence[Tuple[str, float]]):
+        super().__init__()
+        self._scored = scored
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return make_nodes(self._scored)
+
+
+def test_rrf_ranks_shared_hit_first_and_normalizes():
+    fused = reciprocal_rank_fusion([
+        make_nodes([("A", 0.9), ("B", 0.8)]),
+        make_nodes([("A", 12.0), ("C", 9.0)]),
+    ], k=60)
+    assert ids(fused) == ["A", "B", "C"]
+    assert fused[0].score == 1.0
+    assert all(0 < node.score < 1.0 for node in fused[1:])
+
+
+def test_adaptive_top_k_cuts_at_score_drop():
+    nodes = make_nodes([("A", 0.9), ("B", 0.85), ("C", 0.3), ("D", 0.29)])
+    assert ids(adaptive_top_k(nodes, 10, 0.5)) == ["A", "B"]
+    assert ids(adaptive_top_k(nodes, 3, 0.0)) == ["A", "B", "C"]
+    assert ids(adaptive_top_k(nodes, 1, 0.5)) == ["A"]
+
+
+def test_hybrid_keeps_results_when_both_legs_agree_on_top_hit():
+    # 两路第一名相同时，融合后的其余分数都不超过约0.49；若在融合结果上做自适应截断只会剩下A
+    vector = StaticRetriever([("A", 0.82), ("B", 0.80), ("C", 0.78), ("F", 0.75), ("G", 0.74)])
+    keyword = StaticRetriever([("A", 11.0), ("D", 10.2), ("E", 9.8), ("H", 9.1), ("I", 8.7)])
+    retriever = HybridRetriever(
+        AdaptiveTopKRetriever(vector, drop_ratio=0.5),
+        AdaptiveTopKRetriever(keyword, drop_ratio=0.5),
+        similarity_top_k=5,
+        rrf_k=60
+    )
+    result = ids(retriever.retrieve("问题"))
+    assert result[0] == "A"
+    assert len(result) == 5
+    assert set(result) <= {"A", "B", "C", "D", "E", "F", "G", "H", "I"}
+
+
+def test_hybrid_drops_tail_by_leg_scores():
+    # 截断依据各路自身的分数：向量结果在C之后骤降，关键词结果在E之后骤降
+    vector = StaticRetriever([("A", 0.8), ("B", 0.75), ("C", 0.7), ("F", 0.2), ("G", 0.1)])
+    keyword = StaticRetriever([("D", 10.0), ("E", 9.0), ("H", 1.0)])
+    retriever = HybridRetriever(
+        AdaptiveTopKRetriever(vector, drop_ratio=0.5),
+        AdaptiveTopKRetriever(keyword, drop_ratio=0.5),
+        similarity_top_k=10,
+        rrf_k=60
+    )
+    assert set(ids(retriever.retrieve("问题"))) == {"A", "B", "C", "D", "E"}
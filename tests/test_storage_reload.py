@@ -0,0 +1,36 @@
+"""多工作进程：其他进程写入后的存储重新加载测试"""
+from backend.app import chroma_client
+
+
+def test_reload_closes_previous_chroma_client_after_queries_finish(rag_service, monkeypatch):
+    closed = []
+    monkeypatch.setattr(
+        "backend.app.rag_service.close_chroma_client", lambda client: closed.append(client)
+    )
+    first = rag_service.chroma_client
+
+    # 检索进行中时其他工作进程完成写入：旧客户端要等检索结束才关闭
+    with rag_service._chroma_lease():
+        rag_service.coordinator.bump()
+        rag_service._sync_generation()
+        assert rag_service.chroma_client is not first
+        assert closed == []
+    assert closed == [first]
+
+    # 没有进行中的检索时立即关闭
+    second = rag_service.chroma_client
+    rag_service.coordinator.bump()
+    rag_service._sync_generation()
+    assert closed == [first, second]
+    assert rag_service.chroma_client is chroma_client.get_chroma_client()
+
+
+def test_query_works_after_reload(rag_service, data_dir):
+    (data_dir / "a.txt").write_text("黔灵山公园里有很多猕猴。", encoding="utf-8")
+    rag_service.load_documents(mode="sync")
+    rag_service.coordinator.bump()
+
+    result = rag_service.query("黔灵山 猕猴")
+    assert result["success"]
+    assert result["sources"]
+    assert rag_service.collection.count() == rag_service.registry.chunk_count()
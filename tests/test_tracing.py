@@ -0,0 +1,85 @@
+"""查询追踪测试：debug_timings 返回的计时区间树"""
+import pytest
+
+from backend.config import settings
+
+
+def find(span, name):
+    """深度优先查找第一个名为 name 的区间"""
+    if span["name"] == name:
+        return span
+    for child in span["children"]:
+        found = find(child, name)
+        if found is not None:
+            return found
+    return None
+
+
+def child_names(span):
+    return [child["name"] for child in span["children"]]
+
+
+@pytest.fixture
+def loaded_service(rag_service, data_dir, monkeypatch):
+    (data_dir / "food.txt").write_text("贵阳的酸汤鱼和丝娃娃很有名。", encoding="utf-8")
+    rag_service.load_documents(mode="sync")
+    monkeypatch.setattr(settings, "retrieval_mode", "hybrid")
+    return rag_service
+
+
+def test_query_returns_span_tree(loaded_service):
+    result = loaded_service.query("酸汤鱼", similarity_threshold=0.0, debug_timings=True)
+    root = result["debug_timings"]
+    assert root["name"] == "query"
+    assert root["attributes"]["cached"] is False
+    assert child_names(root) == [
+        "answer_cache", "query_embedding", "retrieve", "synthesize", "postprocess"
+    ]
+    assert child_names(find(root, "query_embedding")) == ["embedding"]
+    assert child_names(find(root, "retrieve")) == ["vector_retrieval", "keyword_retrieval"]
+    assert find(root, "retrieve")["attributes"]["nodes"] == 1
+    assert child_names(find(root, "synthesize")) == ["llm"]
+
+    # 子区间按开始时间排列，且都已结束
+    offsets = [child["offset_ms"] for child in root["children"]]
+    assert offsets == sorted(offsets)
+    assert all(child["duration_ms"] is not None for child in root["children"])
+
+    # 再次查询命中问答缓存，不再检索和调用LLM
+    result = loaded_service.query("酸汤鱼", similarity_threshold=0.0, debug_timings=True)
+    root = result["debug_timings"]
+    assert root["attributes"]["cached"] is True
+    assert child_names(root) == ["answer_cache"]
+
+
+def test_stream_query_span_tree_includes_llm(loaded_service):
+    events = list(loaded_service.stream_query("丝娃娃", similarity_threshold=0.0, debug_timings=True))
+    done = events[-1]
+    assert done["event"] == "done"
+    root = done["data"]["debug_timings"]
+    assert root["name"] == "stream_query"
+    assert child_names(root) == [
+        "answer_cache", "query_embedding", "retrieve", "synthesize", "postprocess"
+    ]
+    # 流式生成的 llm 区间在生成器耗尽时结束，仍挂在 synthesize 下
+    llm = find(root, "synthesize")["children"]
+    assert [span["name"] for span in llm] == ["llm"]
+    assert llm[0]["duration_ms"] is not None
+    assert llm[0]["attributes"]["response_chars"] > 0
+
+
+def test_no_timings_without_flag(loaded_service, client):
+    result = loaded_service.query("酸汤鱼在哪里吃", similarity_threshold=0.0)
+    assert "debug_timings" not in result
+
+    events = list(loaded_service.stream_query("丝娃娃在哪里吃", similarity_threshold=0.0))
+    assert "debug_timings" not in events[-1]["data"]
+
+    response = client.post("/api/query", json={"query": "贵阳小吃", "similarity_threshold": 0.0})
+    assert response.status_code == 200
+    assert response.json()["debug_timings"] is None
+
+    response = client.post(
+        "/api/query", json={"query": "贵阳名菜", "similarity_threshold": 0.0, "debug_timings": True}
+    )
+    assert response.json()["debug_timings"]["name"] == "query"
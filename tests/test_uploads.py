@@ -0,0 +1,96 @@
+"""压缩包流式解压测试"""
+import io
+import tarfile
+import zipfile
+
+from backend.app.uploads import extract_archive, member_filename
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def make_tar(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+def test_member_filename():
+    assert member_filename("docs/贵阳.txt") == "贵阳.txt"
+    assert member_filename("__MACOSX/docs/._贵阳.txt") == ""
+    assert member_filename("docs/.hidden.txt") == ""
+    assert member_filename("docs/image.png") == ""
+
+
+def test_extract_txt_members(tmp_path):
+    archive = make_zip({
+        "a/一.txt": "第一篇".encode("utf-8"),
+        "b.png": b"\x89PNG",
+        "坏.txt": b"\xff\xfe\x00",
+    })
+    files, failed = extract_archive(archive, "docs.zip", tmp_path)
+    assert [name for _, name in files] == ["一.txt"]
+    assert files[0][0].read_text(encoding="utf-8") == "第一篇"
+    assert failed == [{"filename": "坏.txt", "error": "文件不是有效的UTF-8文本"}]
+
+
+def test_rejects_oversized_member_and_cleans_up(tmp_path):
+    # 高压缩比的成员：压缩后很小，解压后超过单个成员上限
+    archive = make_zip({"a.txt": b"ok", "bomb.txt": b"a" * 100000})
+    files, failed = extract_archive(archive, "bomb.zip", tmp_path, chunk_bytes=4096,
+                                    max_member_bytes=50000)
+    assert files == []
+    assert failed[0]["filename"] == "bomb.zip"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_rejects_total_size_and_member_count(tmp_path):
+    members = {f"{i}.txt": b"x" * 1000 for i in range(5)}
+    files, failed = extract_archive(make_tar(members), "docs.tar.gz", tmp_path,
+                                    max_total_bytes=3500)
+    assert files == [] and failed[0]["filename"] == "docs.tar.gz"
+
+    files, failed = extract_archive(make_tar(members), "docs.tar.gz", tmp_path, max_members=4)
+    assert files == [] and failed[0]["filename"] == "docs.tar.gz"
+    assert list(tmp_path.iterdir()) == []
+
+    files, failed = extract_archive(make_tar(members), "docs.tar.gz", tmp_path, max_members=5)
+    assert len(files) == 5 and failed == []
+
+
+def test_background_batch_upload_from_zip(client, wait_for_job):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("docs/a.txt", "花溪公园位于贵阳南郊。")
+        archive.writestr("docs/b.txt", "青岩古镇以明清建筑闻名。")
+    response = client.post(
+        "/api/documents/upload-batch", params={"background": "true"},
+        files=[("files", ("docs.zip", buffer.getvalue(), "application/zip"))]
+    )
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert sorted(f["filename"] for f in job["files"]) == ["a.txt", "b.txt"]
+
+
+def test_batch_upload_rejects_oversized_archive(client, monkeypatch):
+    from backend.config import settings
+
+    monkeypatch.setattr(settings, "archive_max_member_bytes", 10)
+    archive = make_zip({"a.txt": "这是一段超过十个字节的文本。".encode("utf-8")})
+    response = client.post(
+        "/api/documents/upload-batch",
+        files=[("files", ("docs.zip", archive.getvalue(), "application/zip"))]
+    )
+    assert response.status_code == 400